@@ -0,0 +1,286 @@
+# run_benchmarks.py
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import date, datetime
+
+import polars as pl
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+from forecast.base import (
+    expand_active_months,
+    add_year_column,
+    add_proration,
+    add_primary_role_column,
+    add_headcount_column,
+    add_headcount_change_column,
+    calculate_compensation,
+    calculate_ytd_compensation,
+)
+from forecast.calculations import (
+    rate_forecast,
+    capped_rate_forecast,
+    capped_cumulative_forecast,
+    per_head_forecast,
+)
+from forecast.profiling import profile_stage
+from forecast.register import apply_register_steps
+from forecast.roster_generator import write_roster
+from forecast.utilities import get_roster, generate_month_ranges
+
+console = Console()
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# One step of every calculation type, also replayed together as a compiled register
+REGISTER_STEPS = [
+    {
+        "type": "flat_rate",
+        "base_column": "compensation",
+        "new_column_name": "payroll_tax",
+        "applied_rate": 0.08,
+    },
+    {
+        "type": "capped_rate",
+        "base_column": "compensation",
+        "new_column_name": "ss_tax",
+        "applied_rate": 0.062,
+        "cap_base_column": "ytd_compensation",
+        "cap_amount": 168_600,
+    },
+    {
+        "type": "capped_cumulative",
+        "base_column": "compensation",
+        "new_column_name": "match",
+        "applied_rate": 0.04,
+        "cap_amount": 23_000,
+    },
+    {"type": "per_head", "new_column_name": "software", "amount": 150},
+]
+
+
+def measure(name, function, frame):
+    """
+    Run function(frame) and record wall time, memory and size of its output
+
+    Output -> output frame and dict of measurements
+    """
+    trace = []
+    output = profile_stage(trace, name, function, frame)
+    return output, trace[0]
+
+
+def run_size(n_roles, seed, start_date, end_date, work_dir):
+    """
+    Benchmark every stage of the forecast base and every calculation type for one roster size
+
+    Output -> dict with the roster size and one measurement per stage
+    """
+    roster_path = os.path.join(work_dir, f"roster_{n_roles}.csv")
+    console.log(f"Generating synthetic roster with {n_roles:,} roles...")
+    write_roster(n_roles, roster_path, seed)
+
+    stages = []
+    roster, result = measure("get_roster", get_roster, roster_path)
+    stages.append(result)
+    month_ranges, result = measure(
+        "generate_month_ranges",
+        lambda _: generate_month_ranges(
+            start_date, end_date, 0.03, date(start_date.year + 1, 1, 1), 12
+        ),
+        None,
+    )
+    stages.append(result)
+
+    # Stages of build_forecast_base, in order
+    base = roster
+    for name, function in [
+        (
+            "expand_active_months",
+            lambda frame: expand_active_months(month_ranges, frame),
+        ),
+        ("add_year_column", add_year_column),
+        ("add_proration", add_proration),
+        ("add_primary_role_column", add_primary_role_column),
+        ("add_headcount_column", add_headcount_column),
+        ("add_headcount_change_column", add_headcount_change_column),
+        ("calculate_compensation", calculate_compensation),
+        ("calculate_ytd_compensation", calculate_ytd_compensation),
+    ]:
+        base, result = measure(name, function, base)
+        stages.append(result)
+
+    # Each calculation type on its own, then all of them as one compiled register
+    flat, capped, cumulative, per_head = REGISTER_STEPS
+    for name, function in [
+        (
+            "rate_forecast",
+            lambda frame: rate_forecast(
+                frame,
+                flat["base_column"],
+                flat["new_column_name"],
+                flat["applied_rate"],
+            ),
+        ),
+        (
+            "capped_rate_forecast",
+            lambda frame: capped_rate_forecast(
+                frame,
+                capped["base_column"],
+                capped["new_column_name"],
+                capped["applied_rate"],
+                capped["cap_base_column"],
+                capped["cap_amount"],
+            ),
+        ),
+        (
+            "capped_cumulative_forecast",
+            lambda frame: capped_cumulative_forecast(frame, [cumulative]),
+        ),
+        (
+            "per_head_forecast",
+            lambda frame: per_head_forecast(
+                frame, per_head["new_column_name"], per_head["amount"]
+            ),
+        ),
+        (
+            "apply_register_steps",
+            lambda frame: apply_register_steps(frame, REGISTER_STEPS),
+        ),
+    ]:
+        _, result = measure(name, function, base)
+        stages.append(result)
+
+    os.remove(roster_path)
+    return {"roles": n_roles, "forecast_rows": base.height, "stages": stages}
+
+
+def run_benchmarks(sizes, seed=0, start_date=None, end_date=None):
+    """
+    Benchmark the forecast for each roster size in its own temporary directory
+
+    Output -> dict of run metadata and results, ready to be saved as json
+    """
+    start_date = start_date or date(2024, 1, 1)
+    end_date = end_date or date(2028, 12, 31)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_roles in sizes:
+            results.append(run_size(n_roles, seed, start_date, end_date, work_dir))
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "platform": platform.platform(),
+        "threads": pl.thread_pool_size(),
+        "seed": seed,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "results": results,
+    }
+
+
+def print_results(run, baseline=None):
+    """
+    Print one table per roster size, with the change in seconds against a baseline run
+    """
+    baseline_seconds = {}
+    if baseline is not None:
+        for result in baseline["results"]:
+            for stage in result["stages"]:
+                baseline_seconds[(result["roles"], stage["stage"])] = stage["seconds"]
+
+    for result in run["results"]:
+        table = Table(
+            title=f"{result['roles']:,} roles / {result['forecast_rows']:,} forecast rows",
+            box=box.ROUNDED,
+            style="bold cyan",
+        )
+        table.add_column("Stage", justify="left", style="white")
+        table.add_column("Seconds", justify="right", style="yellow")
+        table.add_column("Rows out", justify="right", style="yellow")
+        table.add_column("Size MB", justify="right", style="yellow")
+        table.add_column("Peak RSS MB", justify="right", style="yellow")
+        if baseline is not None:
+            table.add_column("vs baseline", justify="right", style="white")
+
+        for stage in result["stages"]:
+            row = [
+                stage["stage"],
+                f"{stage['seconds']:.3f}",
+                f"{stage['rows_out']:,}",
+                f"{stage['estimated_bytes'] / 1024**2:,.1f}",
+                (
+                    ""
+                    if stage["peak_rss_bytes"] is None
+                    else f"{stage['peak_rss_bytes'] / 1024**2:,.0f}"
+                ),
+            ]
+            if baseline is not None:
+                previous = baseline_seconds.get((result["roles"], stage["stage"]))
+                row.append(
+                    "" if not previous else f"{stage['seconds'] / previous:.2f}x"
+                )
+            table.add_row(*row)
+
+        console.print(table)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark forecast stages on synthetic rosters."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Roster sizes (number of roles) to benchmark, up to 5,000,000",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic roster seed")
+    parser.add_argument(
+        "--start", default="2024-01-01", help="Forecast start date (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--end", default="2028-12-31", help="Forecast end date (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--output", default="benchmark_results.json", help="Json file for the results"
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Earlier results json to compare against"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    run = run_benchmarks(
+        args.sizes,
+        seed=args.seed,
+        start_date=datetime.strptime(args.start, "%Y-%m-%d").date(),
+        end_date=datetime.strptime(args.end, "%Y-%m-%d").date(),
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(run, f, ensure_ascii=False, indent=4)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(run, baseline)
+    console.log(f"[green]Results written to {args.output}[/green]")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
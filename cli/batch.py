@@ -0,0 +1,446 @@
+# batch.py
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+from forecast.cache import DEFAULT_CACHE_DIR
+from forecast.export import write_forecast
+from forecast.profiling import profile_stage, write_trace
+from forecast.rollup import rollup_forecast, write_rollups
+from forecast.base import build_forecast_base
+from forecast.register import (
+    parse_base_inputs,
+    base_from_register,
+    apply_register_steps,
+    validate_register,
+)
+from forecast.utilities import get_roster, generate_month_ranges
+
+console = Console()
+
+
+def load_register(register_path):
+    """
+    Read an action register json file
+    """
+    with open(register_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def output_stems(register_paths, output_dir):
+    """
+    Output paths (without extension) for the registers of a batch, named after the
+    register files.
+
+    Registers sharing a file name are named after their path relative to the directory
+    all registers are in, a name that still clashes gets the register's position.
+
+    Output -> list of str, one per register in the order of register_paths
+    """
+    names = [os.path.splitext(os.path.basename(path))[0] for path in register_paths]
+    if register_paths:
+        root = os.path.commonpath(
+            [os.path.dirname(os.path.abspath(path)) for path in register_paths]
+        )
+        names = [
+            (
+                os.path.splitext(os.path.relpath(os.path.abspath(path), root))[
+                    0
+                ].replace(os.sep, "_")
+                if names.count(name) > 1
+                else name
+            )
+            for path, name in zip(register_paths, names)
+        ]
+    names = [
+        f"{name}_{position}" if names.count(name) > 1 else name
+        for position, name in enumerate(names, start=1)
+    ]
+
+    return [os.path.join(output_dir, f"{name}_forecast") for name in names]
+
+
+def duplicate_registers(register_paths):
+    """Register paths given more than once, compared as absolute paths"""
+    paths = [os.path.abspath(path) for path in register_paths]
+    return sorted(
+        {
+            path
+            for path, absolute in zip(register_paths, paths)
+            if paths.count(absolute) > 1
+        }
+    )
+
+
+def check_register(actions, roster_path=None):
+    """
+    Raise a ValueError with every error of an action register (see validate_register),
+    checking the batch's roster instead of the register's roster_file if one is given
+    """
+    if roster_path is not None and isinstance(actions.get("base_inputs"), dict):
+        actions = dict(
+            actions, base_inputs=dict(actions["base_inputs"], roster_file=roster_path)
+        )
+    errors = validate_register(actions)
+    if errors:
+        raise ValueError("\n" + "\n".join(errors) + "\n")
+
+
+def run_register(
+    register_path,
+    actions,
+    roster,
+    stem,
+    export_format="csv",
+    month_ranges=None,
+    rollups=False,
+    profile=False,
+):
+    """
+    Replay one action register against a loaded roster and write the forecast to stem
+    (an output path without extension, see output_stems).
+
+    The register is expected to be validated (see check_register), a step that still
+    fails raises and fails the whole register instead of being skipped.
+    Month ranges already generated for the register's base inputs can be passed in.
+    With rollups the rollup tables are written to a directory next to the forecast.
+    With profile the time, rows and memory of every base stage, register step and
+    export are recorded in the summary's "trace".
+
+    Output
+    dict summary of the run
+    """
+    start = time.perf_counter()
+    trace = [] if profile else None
+
+    if month_ranges is None:
+        forecast = base_from_register(actions, roster, trace=trace)
+    else:
+        forecast = build_forecast_base(
+            month_ranges,
+            roster,
+            compact=actions["base_inputs"].get("compact", False),
+            trace=trace,
+        )
+    forecast = apply_register_steps(forecast, actions["added_columns"], trace=trace)
+    output_path = profile_stage(
+        trace,
+        "write_forecast",
+        write_forecast,
+        forecast,
+        stem,
+        export_format,
+    )
+    rollup_path = None
+    if rollups:
+        rollup_path = stem + "_rollups"
+        profile_stage(
+            trace,
+            "write_rollups",
+            lambda forecast: write_rollups(
+                rollup_forecast(forecast), rollup_path, export_format
+            ),
+            forecast,
+        )
+
+    return {
+        "register": register_path,
+        "rows": forecast.height,
+        "columns": forecast.width,
+        "seconds": time.perf_counter() - start,
+        "output": output_path,
+        "rollups": rollup_path,
+        "error": None,
+        "trace": trace,
+    }
+
+
+def failed_result(register_path, error, seconds):
+    return {
+        "register": register_path,
+        "rows": None,
+        "columns": None,
+        "seconds": seconds,
+        "output": None,
+        "rollups": None,
+        "error": f"{type(error).__name__} - {str(error).strip()}",
+        "trace": None,
+    }
+
+
+def run_shared_register(
+    register_path,
+    actions,
+    roster_ipc,
+    month_ranges_ipc,
+    stem,
+    export_format,
+    rollups=False,
+    profile=False,
+):
+    """
+    Worker side of a parallel batch: memory-map the shared roster and month ranges
+    written by the parent process and replay one register against them.
+    """
+    start = time.perf_counter()
+    try:
+        return run_register(
+            register_path,
+            actions,
+            pl.read_ipc(roster_ipc, memory_map=True),
+            stem,
+            export_format,
+            month_ranges=pl.read_ipc(month_ranges_ipc, memory_map=True),
+            rollups=rollups,
+            profile=profile,
+        )
+    except Exception as e:
+        return failed_result(register_path, e, time.perf_counter() - start)
+
+
+def run_batch(
+    register_paths,
+    output_dir,
+    roster_path=None,
+    export_format="csv",
+    cache_dir=DEFAULT_CACHE_DIR,
+    workers=1,
+    rollups=False,
+    profile=False,
+):
+    """
+    Replay many action registers without any prompts.
+
+    Inputs
+    register_paths: list of str - action register json files
+    output_dir: str - directory the forecasts are written to
+    roster_path: str - roster used for every register instead of its own roster_file
+    export_format: str - "csv" or "parquet"
+    cache_dir: str - parsed roster cache directory, None to disable
+    workers: int - number of worker processes, 1 to replay in this process
+    rollups: bool - also write rollup tables next to each forecast
+    profile: bool - record a stage trace of each register, see run_register
+
+    Every register is validated (see validate_register) before any is replayed, a
+    register with errors fails with all of them and none of its steps are skipped. Each roster file is only loaded once
+    and shared by all registers that use it.
+    With several workers the parsed rosters and month ranges are written once as
+    Arrow IPC to a shared temporary directory (in memory where available) and
+    memory-mapped by the workers instead of being parsed again.
+    A failing register is reported and does not stop the batch. Outputs are named after
+    the register files, see output_stems.
+
+    Output
+    list of dict summaries, one per register, in the order of register_paths
+    """
+    duplicates = duplicate_registers(register_paths)
+    if duplicates:
+        raise ValueError(f"\nRegister(s) given more than once: {duplicates}\n")
+
+    os.makedirs(output_dir, exist_ok=True)
+    stems = dict(zip(register_paths, output_stems(register_paths, output_dir)))
+    rosters = {}
+    month_ranges = {}
+    results = {}
+    jobs = []
+
+    # Load every register and the inputs it needs once
+    for register_path in register_paths:
+        start = time.perf_counter()
+        try:
+            actions = load_register(register_path)
+            check_register(actions, roster_path)
+            register_roster = roster_path or actions["base_inputs"]["roster_file"]
+            if register_roster not in rosters:
+                rosters[register_roster] = get_roster(
+                    register_roster, cache_dir=cache_dir
+                )
+
+            base_inputs = parse_base_inputs(actions["base_inputs"])
+            months_key = tuple(
+                base_inputs[key]
+                for key in [
+                    "start_date",
+                    "end_date",
+                    "infl_rate",
+                    "infl_start",
+                    "infl_freq",
+                ]
+            )
+            if months_key not in month_ranges:
+                month_ranges[months_key] = generate_month_ranges(*months_key)
+
+            jobs.append((register_path, actions, register_roster, months_key))
+        except Exception as e:
+            results[register_path] = failed_result(
+                register_path, e, time.perf_counter() - start
+            )
+
+    if workers <= 1:
+        for register_path, actions, register_roster, months_key in jobs:
+            start = time.perf_counter()
+            try:
+                results[register_path] = run_register(
+                    register_path,
+                    actions,
+                    rosters[register_roster],
+                    stems[register_path],
+                    export_format,
+                    month_ranges=month_ranges[months_key],
+                    rollups=rollups,
+                    profile=profile,
+                )
+            except Exception as e:
+                results[register_path] = failed_result(
+                    register_path, e, time.perf_counter() - start
+                )
+    else:
+        results.update(
+            run_parallel(
+                jobs,
+                rosters,
+                month_ranges,
+                stems,
+                export_format,
+                workers,
+                rollups,
+                profile,
+            )
+        )
+
+    return [results[register_path] for register_path in register_paths]
+
+
+def run_parallel(
+    jobs,
+    rosters,
+    month_ranges,
+    stems,
+    export_format,
+    workers,
+    rollups=False,
+    profile=False,
+):
+    """
+    Spread register jobs over a process pool sharing rosters and month ranges as Arrow IPC,
+    stems maps every register to its output path
+    """
+    shared_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    results = {}
+
+    with tempfile.TemporaryDirectory(dir=shared_root) as shared_dir:
+        roster_files = {}
+        for index, (path, roster) in enumerate(rosters.items()):
+            roster_files[path] = os.path.join(shared_dir, f"roster_{index}.arrow")
+            roster.write_ipc(roster_files[path], compression="uncompressed")
+
+        month_files = {}
+        for index, (key, months) in enumerate(month_ranges.items()):
+            month_files[key] = os.path.join(shared_dir, f"months_{index}.arrow")
+            months.write_ipc(month_files[key], compression="uncompressed")
+
+        # Split the cores between workers. Spawned workers read this when importing polars,
+        # spawn is used because forking a process with a running polars thread pool can hang.
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        previous_threads = os.environ.get("POLARS_MAX_THREADS")
+        os.environ["POLARS_MAX_THREADS"] = str(threads)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        run_shared_register,
+                        register_path,
+                        actions,
+                        roster_files[register_roster],
+                        month_files[months_key],
+                        stems[register_path],
+                        export_format,
+                        rollups,
+                        profile,
+                    ): register_path
+                    for register_path, actions, register_roster, months_key in jobs
+                }
+                for future in as_completed(futures):
+                    register_path = futures[future]
+                    try:
+                        results[register_path] = future.result()
+                    except Exception as e:
+                        # Worker process itself failed (e.g. killed)
+                        results[register_path] = failed_result(register_path, e, 0.0)
+                    console.log(f"Finished [blue]{register_path}[/blue]")
+        finally:
+            if previous_threads is None:
+                os.environ.pop("POLARS_MAX_THREADS", None)
+            else:
+                os.environ["POLARS_MAX_THREADS"] = previous_threads
+
+    return results
+
+
+def write_summary(results, summary_path):
+    """
+    Write a consolidated json summary of a batch run with totals and one entry per register
+    """
+    succeeded = [result for result in results if result["error"] is None]
+    summary = {
+        "registers": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "total_rows": sum(result["rows"] for result in succeeded),
+        "total_seconds": sum(result["seconds"] for result in results),
+        "runs": results,
+    }
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+    return summary
+
+
+def write_batch_trace(results, trace_path):
+    """
+    Write the stage traces of a profiled batch run as json, one run per register
+    """
+    return write_trace(
+        {
+            result["register"]: result["trace"]
+            for result in results
+            if result["trace"] is not None
+        },
+        trace_path,
+    )
+
+
+def print_summary(results):
+    """
+    Print a table of batch results with wall time and row counts per register
+    """
+    table = Table(title="Batch Summary", box=box.ROUNDED, style="bold cyan")
+    table.add_column("Register", justify="left", style="white")
+    table.add_column("Rows", justify="right", style="yellow")
+    table.add_column("Seconds", justify="right", style="yellow")
+    table.add_column("Output / Error", justify="left", style="white")
+
+    for result in results:
+        if result["error"] is None:
+            outcome = f"[green]{result['output']}[/green]"
+        else:
+            outcome = f"[red]{result['error']}[/red]"
+        table.add_row(
+            os.path.basename(result["register"]),
+            "" if result["rows"] is None else f"{result['rows']:,}",
+            f"{result['seconds']:.2f}",
+            outcome,
+        )
+
+    console.print(table)
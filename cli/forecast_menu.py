@@ -7,8 +7,17 @@ from rich.text import Text
 from rich import box
 
 import cli.input_handlers as input_handlers
-from forecast.base import generate_forecast_base
-from forecast.calculations import rate_forecast, capped_rate_forecast, per_head_forecast
+from forecast.base import generate_forecast_base, compact_report
+from forecast.cache import DEFAULT_CACHE_DIR
+from forecast.calculations import (
+    rate_forecast,
+    capped_rate_forecast,
+    capped_cumulative_forecast,
+    per_head_forecast,
+)
+from forecast.export import write_forecast
+from forecast.profiling import profiling_enabled, print_trace
+from forecast.rollup import rollup_forecast, write_rollups
 from polars.exceptions import ComputeError, ColumnNotFoundError
 
 console = Console()
@@ -29,6 +38,14 @@ def create_forecast_base(action_register):
     inflation_freq = input_handlers.prompt_positive_integer(
         "Enter the inflation frequency in months: "
     )
+    compact = (
+        Prompt.ask(
+            "[bold cyan]Use compact data types to reduce memory?[/bold cyan]",
+            choices=["y", "n"],
+            default="n",
+        )
+        == "y"
+    )
 
     # TODO Comment out test inputs
     # roster_file = 'C:/Users/dunag/python_projects/Headcount-Model/data/Personnel forecast - Personnel List.csv'
@@ -39,6 +56,7 @@ def create_forecast_base(action_register):
     # inflation_freq = 12
 
     forecast_base = None
+    trace = [] if profiling_enabled() else None
 
     # Create forecast base using provided inputs
     try:
@@ -49,9 +67,26 @@ def create_forecast_base(action_register):
             infl_rate=inflation_rate,
             infl_start=inflation_start,
             infl_freq=inflation_freq,
+            cache_dir=DEFAULT_CACHE_DIR,
+            compact=compact,
+            trace=trace,
         )
         # Proceed with forecast logic if successful
         console.print("\n[green]New Forecast created successfully![/green]\n")
+        if trace is not None:
+            print_trace(trace)
+        if compact:
+            report = compact_report(forecast_base)
+            if report["saved_bytes"] > 0:
+                console.print(
+                    f"[green]Compact data types saved {report['saved_bytes'] / 1024**2:,.1f} MB "
+                    f"of {report['original_bytes'] / 1024**2:,.1f} MB.[/green]\n"
+                )
+            else:
+                console.print(
+                    "[yellow]Compact data types did not reduce memory, the forecast is "
+                    "too small for them to pay off.[/yellow]\n"
+                )
 
     # Handle errors and provide user feedback
     except ComputeError as e:
@@ -75,6 +110,8 @@ def create_forecast_base(action_register):
         "inflation_start": inflation_start.strftime("%Y-%m-%d"),
         "inflation_freq": inflation_freq,
     }
+    if compact:
+        action_register["base_inputs"]["compact"] = True
 
     return forecast_base
 
@@ -87,10 +124,11 @@ def add_forecast_options(forecast, action_register):
     table.add_row("1", "Add Flat Rate Forecast")
     table.add_row("2", "Add Capped Rate Forecast")
     table.add_row("3", "Add Per Head Forecast")
+    table.add_row("4", "Add Capped Cumulative Forecast (cap on year to date base)")
 
     console.print(table)
     choice = Prompt.ask(
-        "[bold cyan]Enter your choice[/bold cyan]", choices=["1", "2", "3"]
+        "[bold cyan]Enter your choice[/bold cyan]", choices=["1", "2", "3", "4"]
     )
 
     if choice == "1":
@@ -169,13 +207,63 @@ def add_forecast_options(forecast, action_register):
             }
         )
 
+    elif choice == "4":
+        print_cols(forecast)
+        base_column = input_handlers.prompt_string("Enter base column name: ")
+        new_column_name = input_handlers.prompt_string("Enter new column name: ")
+        applied_rate = input_handlers.prompt_float(
+            "Enter applicable rate (e.g., 0.03 for 3%): "
+        )
+        cap_amount = input_handlers.prompt_positive_integer(
+            "Enter maximum year to date base amount as integer: "
+        )
+        try:
+            forecast = capped_cumulative_forecast(
+                forecast,
+                [
+                    {
+                        "base_column": base_column,
+                        "new_column_name": new_column_name,
+                        "applied_rate": applied_rate,
+                        "cap_amount": cap_amount,
+                    }
+                ],
+            )
+        except ValueError as err:
+            console.print(
+                f"[red]Invalid inputs: Forecast could not be added.[/red] {err}"
+            )
+        else:
+            action_register["added_columns"].append(
+                {
+                    "type": "capped_cumulative",
+                    "base_column": base_column,
+                    "new_column_name": new_column_name,
+                    "applied_rate": applied_rate,
+                    "cap_amount": cap_amount,
+                }
+            )
+
     return forecast
 
 
 def export_forecast(forecast):
     """
-    Export the forecast to a selected location as a csv file
+    Export the forecast to a selected location as a csv file or a partitioned parquet dataset,
+    and/or rollup tables by department, location and employment type per month, quarter and year
+
+    A lazy forecast is computed only here, when it is written.
     """
+    export_format = Prompt.ask(
+        "[bold cyan]Enter export format[/bold cyan]",
+        choices=["csv", "parquet"],
+        default="csv",
+    )
+    export_content = Prompt.ask(
+        "[bold cyan]Export detail, rollups or both[/bold cyan]",
+        choices=["detail", "rollups", "both"],
+        default="detail",
+    )
     console.print(
         "\n[cyan bold]Please select directory to create forecast.[/cyan bold]\n"
     )
@@ -183,9 +271,16 @@ def export_forecast(forecast):
         input_handlers.prompt_export_path()
         + "/"
         + datetime.today().strftime("%y-%m-%d")
-        + "_forecast.csv"
+        + "_forecast"
     )
-    forecast.write_csv(export_path)
+    if export_content in ("rollups", "both"):
+        rollup_path = export_path + "_rollups"
+        write_rollups(rollup_forecast(forecast), rollup_path, export_format)
+        console.print(f"[green]Rollups exported successfully to {rollup_path}[/green]")
+        if export_content == "rollups":
+            return rollup_path
+
+    export_path = write_forecast(forecast, export_path, export_format)
     console.print(f"[green]Forecast exported successfully to {export_path}[/green]")
     return export_path
 
@@ -199,7 +294,7 @@ def print_cols(forecast):
     table.add_column("Column Name", justify="left", style="white")
     table.add_column("Data Type", justify="center", style="yellow")
 
-    for column, dtype in zip(forecast.columns, forecast.dtypes):
+    for column, dtype in forecast.collect_schema().items():
         table.add_row(column, str(dtype))
 
     console.print(table)
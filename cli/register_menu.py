@@ -3,9 +3,18 @@
 import json
 from datetime import datetime
 
+from rich.prompt import Prompt
+
 import cli.input_handlers as input_handlers
 from forecast.base import generate_forecast_base
-from forecast.calculations import rate_forecast, capped_rate_forecast, per_head_forecast
+from forecast.cache import DEFAULT_CACHE_DIR
+from forecast.profiling import profiling_enabled, print_trace
+from forecast.register import (
+    parse_base_inputs,
+    apply_register_steps,
+    replay_register,
+    validate_register,
+)
 
 
 def export_register(action_register):
@@ -27,33 +36,69 @@ def export_register(action_register):
     return export_path
 
 
-def forecast_from_file():
+def forecast_from_file(lazy=None):
     """
     Create a forecast from json file of actions.
+
+    If lazy is True the roster is scanned and every step is added to a single LazyFrame
+    plan which is only computed when the forecast is exported. Otherwise the base and
+    the output of each step are cached, so replaying an edited register only recomputes
+    the steps from the first edit onwards. If lazy is None the user is asked.
+
+    With the FORECAST_PROFILE environment variable set a table of the time, rows and memory
+    of every stage and step is printed.
+
+    The register is validated first and all of its errors are reported at once, without
+    reading the roster.
     """
     print("\nPlease select file of forecast steps in JSON format")
     filepath = input_handlers.prompt_input_json()
     with open(filepath, "r") as file:
         actions = json.load(file)
     # print(f'Action register  of type {type(actions)} \n\n {actions}')
+
+    # Report every problem of the register before the roster is read
+    errors = validate_register(actions)
+    if errors:
+        print("\nAction register could not be replayed:\n")
+        for error in errors:
+            print(f"  - {error}")
+        print("\nPlease update file and try again.\n")
+        return None
+
+    if lazy is None:
+        lazy = (
+            Prompt.ask(
+                "[bold cyan]Compute the forecast only when it is exported "
+                "(lazy, without the step cache)?[/bold cyan]",
+                choices=["y", "n"],
+                default="n",
+            )
+            == "y"
+        )
+
     forecast = None
+    trace = [] if profiling_enabled() else None
 
-    # Create Forecast base
+    def report_error(column, err):
+        print(f"Invalid inputs forecast could not be added.\n{err}")
+
+    # Create Forecast base, eager replays also add the steps here reusing cached outputs
     try:
-        forecast = generate_forecast_base(
-            roster_path=actions["base_inputs"]["roster_file"],
-            start_date=datetime.strptime(
-                actions["base_inputs"]["start_date"], "%Y-%m-%d"
-            ).date(),
-            end_date=datetime.strptime(
-                actions["base_inputs"]["end_date"], "%Y-%m-%d"
-            ).date(),
-            infl_rate=actions["base_inputs"]["inflation_rate"],
-            infl_start=datetime.strptime(
-                actions["base_inputs"]["inflation_start"], "%Y-%m-%d"
-            ).date(),
-            infl_freq=actions["base_inputs"]["inflation_freq"],
-        )
+        if lazy:
+            forecast = generate_forecast_base(
+                **parse_base_inputs(actions["base_inputs"]),
+                lazy=lazy,
+                cache_dir=DEFAULT_CACHE_DIR,
+                trace=trace,
+            )
+        else:
+            forecast, cached_steps = replay_register(
+                actions, DEFAULT_CACHE_DIR, on_error=report_error, trace=trace
+            )
+            print(
+                f"\n{cached_steps} of {len(actions['added_columns'])} steps reused from cache"
+            )
 
         # Proceed with forecast logic if successful
         print("\nNew Forecast created successfully!\n")
@@ -71,43 +116,16 @@ def forecast_from_file():
     if forecast is None:
         return None
 
-    # Create all added columns sequentially in order
-    for column in actions["added_columns"]:
-        if column["type"] == "flat_rate":
-            try:
-                # Call function to add flat rate forecast
-                forecast = rate_forecast(
-                    forecast,
-                    base_column=column["base_column"],
-                    new_column_name=column["new_column_name"],
-                    applied_rate=column["applied_rate"],
-                )
-            except ValueError as err:
-                print(f"Invalid inputs forecast could not be added.\n{err}")
-
-        elif column["type"] == "capped_rate":
-            try:
-                # Call function to add capped rate forecast
-                forecast = capped_rate_forecast(
-                    forecast,
-                    base_column=column["base_column"],
-                    new_column_name=column["new_column_name"],
-                    applied_rate=column["applied_rate"],
-                    cap_base_column=column["cap_base_column"],
-                    cap_amount=column["cap_amount"],
-                )
-            except ValueError as err:
-                print(f"Invalid inputs forecast could not be added.\n{err}")
-
-        elif column["type"] == "per_head":
-            # Call function to add per head forecast
-            forecast = per_head_forecast(
-                forecast,
-                new_column_name=column["new_column_name"],
-                amount=column["amount"],
-            )
+    # Create all added columns of a lazy plan sequentially in order
+    if lazy:
+        forecast = apply_register_steps(
+            forecast,
+            actions["added_columns"],
+            on_error=report_error,
+            trace=trace,
+        )
 
-        else:
-            print(f"Unknown column type: {column['type']}\nNo forecast will be added")
+    if trace is not None:
+        print_trace(trace)
 
     return forecast, actions
@@ -0,0 +1,215 @@
+# aggregate.py
+import polars as pl
+
+from forecast.base import add_proration
+from forecast.headcount import (
+    check_dimensions,
+    month_segment_grid,
+    running_total,
+    sweep_headcount,
+)
+from forecast.utilities import console, get_roster, generate_month_ranges
+
+# Annual amounts of a role, in the order of calculate_compensation
+AMOUNT_COLUMNS = ["salary_amount", "bonus_amount", "commission_amount"]
+
+
+def annual_amounts():
+    """Expressions for the annual salary, bonus and commission of a role"""
+    return [
+        pl.col("Salary").alias("salary_amount"),
+        (pl.col("Salary") * pl.col("Bonus")).alias("bonus_amount"),
+        (pl.col("Salary") * pl.col("Commission")).alias("commission_amount"),
+    ]
+
+
+def full_month_events(roles, first_month, last_month, dimensions):
+    """
+    Annual amounts added in the first month a role is active for the whole month and
+    removed the month after its last full month.
+
+    A month is full when the role starts on or before its first day and ends on or after
+    its last day, which is exactly when the forecast base prorates it as 1.
+
+    Output
+    lazyframe with the dimensions, month and the signed annual amounts
+    """
+    start = pl.col("start_date_complete")
+    end = pl.col("end_date_complete")
+    full = roles.with_columns(
+        pl.when(start.dt.day() == 1)
+        .then(start.dt.month_start())
+        .otherwise(start.dt.month_start().dt.offset_by("1mo"))
+        .alias("first_full"),
+        pl.when(end == end.dt.month_end())
+        .then(end.dt.month_start())
+        .otherwise(end.dt.month_start().dt.offset_by("-1mo"))
+        .alias("last_full"),
+    ).filter(
+        (pl.col("first_full") <= pl.col("last_full"))
+        & (pl.col("first_full") <= last_month)
+        & (pl.col("last_full") >= first_month)
+    )
+
+    return pl.concat(
+        [
+            full.select(
+                *dimensions,
+                pl.max_horizontal("first_full", pl.lit(first_month)).alias("month"),
+                *AMOUNT_COLUMNS,
+            ),
+            full.filter(pl.col("last_full") < last_month).select(
+                *dimensions,
+                pl.col("last_full").dt.offset_by("1mo").alias("month"),
+                *[-pl.col(column) for column in AMOUNT_COLUMNS],
+            ),
+        ]
+    )
+
+
+def partial_months(roles, month_ranges, dimensions):
+    """
+    Prorated amounts of the first and last month of each role when it is not active the
+    whole month, prorated exactly like the forecast base
+
+    Output
+    lazyframe with the dimensions, start_of_month and the prorated annual amounts
+    """
+    start = pl.col("start_date_complete")
+    end = pl.col("end_date_complete")
+    first = roles.with_columns(start.dt.month_start().alias("start_of_month")).filter(
+        (start.dt.day() != 1) | (end < start.dt.month_end())
+    )
+    # The last month, unless it is also the first month
+    last = roles.with_columns(end.dt.month_start().alias("start_of_month")).filter(
+        (end != end.dt.month_end()) & (end.dt.month_start() != start.dt.month_start())
+    )
+
+    partial = pl.concat([first, last]).join(
+        month_ranges.lazy().select("start_of_month", "end_of_month"),
+        on="start_of_month",
+    )
+    return add_proration(partial).select(
+        *dimensions,
+        "start_of_month",
+        *[pl.col(column) * pl.col("proration") for column in AMOUNT_COLUMNS],
+    )
+
+
+def aggregate_compensation(month_ranges, roster, dimensions=None):
+    """
+    Monthly salary, bonus, commission and compensation totals per segment without building
+    the forecast base.
+
+    Inputs
+    month_ranges: dataframe - start_of_month, end_of_month and inflation_factor for every month
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    dimensions: list of str - roster columns to segment by, e.g. ["Department"],
+                None for company totals
+
+    Annual amounts of roles active for a whole month are added in their first full month
+    and removed after their last, so running totals per segment give the full month
+    amounts. Only the first and last month of a role can be partial, those are prorated
+    one by one. The totals are then inflated and divided by 12 like calculate_compensation,
+    so they match summing the forecast base up to floating point rounding.
+
+    Output
+    dataframe of start_of_month, the dimensions, salary_amount, bonus_amount,
+    commission_amount and compensation for every month and segment
+    """
+    dimensions = list(dimensions or [])
+    check_dimensions(roster, dimensions)
+
+    console.log("Aggregating compensation by month...")
+    first_month = month_ranges["start_of_month"].min()
+    last_month = month_ranges["start_of_month"].max()
+    roles = roster.lazy().select(
+        *dimensions, "start_date_complete", "end_date_complete", *annual_amounts()
+    )
+
+    full = (
+        full_month_events(roles, first_month, last_month, dimensions)
+        .group_by(dimensions + ["month"])
+        .agg(pl.col(AMOUNT_COLUMNS).sum())
+        .rename({"month": "start_of_month"})
+    )
+    partial = (
+        partial_months(roles, month_ranges, dimensions)
+        .group_by(dimensions + ["start_of_month"])
+        .agg(pl.col(AMOUNT_COLUMNS).sum())
+    )
+
+    keys = ["start_of_month"] + dimensions
+    totals = (
+        month_segment_grid(month_ranges, roster, dimensions)
+        .join(full, on=keys, how="left", join_nulls=True)
+        .with_columns(pl.col(AMOUNT_COLUMNS).fill_null(0))
+        .sort(dimensions + ["start_of_month"], nulls_last=True)
+        .with_columns(running_total(column, dimensions) for column in AMOUNT_COLUMNS)
+        .join(partial, on=keys, how="left", join_nulls=True, suffix="_partial")
+        .join(
+            month_ranges.lazy().select("start_of_month", "inflation_factor"),
+            on="start_of_month",
+        )
+        .select(
+            *keys,
+            *[
+                (
+                    (pl.col(column) + pl.col(f"{column}_partial").fill_null(0))
+                    * pl.col("inflation_factor")
+                    / 12
+                ).alias(column)
+                for column in AMOUNT_COLUMNS
+            ],
+        )
+        .with_columns(pl.sum_horizontal(AMOUNT_COLUMNS).alias("compensation"))
+        .sort(keys, nulls_last=True)
+        .collect()
+    )
+    console.log("[green]Compensation aggregated![/green]")
+
+    return totals
+
+
+def aggregate_forecast(month_ranges, roster, dimensions=None):
+    """
+    Monthly headcount, headcount change and compensation totals per segment, see
+    sweep_headcount and aggregate_compensation
+
+    Output
+    dataframe of start_of_month, the dimensions, headcount, headcount_change and the
+    compensation columns
+    """
+    keys = ["start_of_month"] + list(dimensions or [])
+    return sweep_headcount(month_ranges, roster, dimensions).join(
+        aggregate_compensation(month_ranges, roster, dimensions),
+        on=keys,
+        how="left",
+        join_nulls=True,
+    )
+
+
+def generate_aggregate_forecast(
+    roster_path,
+    start_date,
+    end_date,
+    infl_rate,
+    infl_start,
+    infl_freq,
+    dimensions=None,
+    lazy=False,
+    cache_dir=None,
+):
+    """
+    Monthly segment totals straight from a roster file, with the inputs of
+    generate_forecast_base
+
+    Output
+    dataframe as returned by aggregate_forecast
+    """
+    month_ranges = generate_month_ranges(
+        start_date, end_date, infl_rate, infl_start, infl_freq
+    )
+    roster = get_roster(roster_path, lazy=lazy, cache_dir=cache_dir)
+
+    return aggregate_forecast(month_ranges, roster, dimensions)
@@ -1,7 +1,34 @@
 # base.py
 import polars as pl
+from forecast.profiling import profile_stage
 from forecast.utilities import get_roster, generate_month_ranges
 
+# Roster strings repeated on every month of a role
+COMPACT_STRING_COLUMNS = [
+    "Employee ID",
+    "Employee Name",
+    "Title",
+    "Department",
+    "Employment type",
+    "Location",
+]
+COMPACT_INTEGER_COLUMNS = ["headcount", "headcount_change"]
+COMPACT_YEAR_COLUMNS = ["year"]
+# Rates and factors money is calculated from, Float32 with float32_money only so money
+# calculated from them later (e.g. per head amounts) keeps Float64 precision by default
+COMPACT_RATE_COLUMNS = ["inflation_factor", "proration", "Bonus", "Commission"]
+# Roster dates as read, a missing date is date.min or date.max in start_date_complete
+# and end_date_complete, which the base calculations use. Only dropped on request.
+RAW_DATE_COLUMNS = ["Start Date", "End Date"]
+MONEY_COLUMNS = [
+    "Salary",
+    "salary_amount",
+    "bonus_amount",
+    "commission_amount",
+    "compensation",
+    "ytd_compensation",
+]
+
 
 def add_year_column(base):
     return base.with_columns(pl.col("start_of_month").dt.year().alias("year"))
@@ -63,6 +90,25 @@ def add_headcount_change_column(base):
     )
 
 
+def add_primary_role_column(base):
+    """
+    Flag the one role per employee and month that carries per head costs: the role with the
+    highest proration, ties going to the lowest Role ID. Months with no active days have no
+    primary role.
+    """
+    month_window = ["Employee ID", "start_of_month"]
+    # Sorted by employee and month, best role first: the primary role starts each run
+    order = pl.arg_sort_by(
+        month_window + ["proration", "Role ID"], descending=[False, False, True, False]
+    )
+    first_in_month = pl.struct(month_window).gather(order).is_first_distinct()
+    return base.with_columns(
+        ((pl.col("proration") > 0) & first_in_month.gather(order.arg_sort())).alias(
+            "primary_role"
+        )
+    )
+
+
 def calculate_compensation(base):
     # Calculate monthly salary, bonus, and commission
     base = base.with_columns(
@@ -97,7 +143,11 @@ def calculate_compensation(base):
 
 
 def calculate_ytd_compensation(base):
-    return base.sort(["Employee ID", "year", "start_of_month"]).with_columns(
+    # Role ID breaks ties between roles of an employee in the same month
+    order = ["Employee ID", "year", "start_of_month"] + present_columns(
+        base, ["Role ID"]
+    )
+    return base.sort(order).with_columns(
         pl.col("compensation")
         .cum_sum()
         .over(["Employee ID", "year"])
@@ -112,8 +162,275 @@ def filter_active_months(base):
     )
 
 
+def expand_active_months(month_ranges, roster):
+    """
+    Expand each roster row into only the months of the forecast range it is active in.
+
+    Equivalent to a cross join of month_ranges and roster followed by filter_active_months,
+    but the number of rows built scales with active employee-months instead of roster x months.
+
+    Inputs
+    month_ranges: dataframe - start_of_month, end_of_month and inflation_factor for every month
+    roster: dataframe - roster with start_date_complete and end_date_complete
+
+    Output
+    dataframe with month columns followed by roster columns, lazy if roster is lazy
+    """
+    first_month = month_ranges["start_of_month"].min()
+    last_month = month_ranges["start_of_month"].max()
+
+    expanded = roster.with_columns(
+        pl.date_ranges(
+            # Later of the month the role starts or first forecast month
+            pl.max_horizontal(
+                pl.col("start_date_complete").dt.month_start(), pl.lit(first_month)
+            ),
+            # Earlier of the month the role ends or last forecast month
+            pl.min_horizontal(
+                pl.col("end_date_complete").dt.month_start(), pl.lit(last_month)
+            ),
+            interval="1mo",
+        ).alias("start_of_month")
+    ).explode("start_of_month")
+
+    columns = month_ranges.columns + roster.collect_schema().names()
+    if isinstance(roster, pl.LazyFrame):
+        month_ranges = month_ranges.lazy()
+
+    # Roles with no active months explode to a null month and are dropped by the inner join
+    return month_ranges.join(expanded, on="start_of_month", how="inner").select(columns)
+
+
+def present_columns(frame, columns):
+    """Columns of the list that the dataframe or lazyframe has"""
+    names = frame.collect_schema().names()
+    return [column for column in columns if column in names]
+
+
+def compact_dtypes(*rosters):
+    """
+    Enum data types of the compact string columns, with the sorted values of all rosters
+    as categories. Frames compacted with the same data types can be concatenated and
+    joined on those columns.
+
+    Output -> dict of column name -> pl.Enum
+    """
+    columns = present_columns(rosters[0], COMPACT_STRING_COLUMNS)
+    values = pl.concat(
+        [roster.lazy().select(columns) for roster in rosters], how="vertical_relaxed"
+    ).collect()
+
+    return {
+        column: pl.Enum(values[column].drop_nulls().unique().sort())
+        for column in columns
+    }
+
+
+def string_columns(frame, columns):
+    """Columns of the list that the dataframe or lazyframe stores as strings"""
+    schema = frame.collect_schema()
+    return [column for column in columns if schema.get(column) == pl.Utf8]
+
+
+def compact_roster(roster, dtypes=None, drop_roster_dates=False):
+    """
+    Store the roster strings as Enum, so they are expanded to every active month as
+    integer codes instead of copies of the strings.
+
+    Inputs
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    dtypes: Enum data types to use (see compact_dtypes), by default built from roster.
+            Columns that are already compact are kept as they are.
+    drop_roster_dates: if True drop the raw Start Date and End Date columns
+    """
+    columns = string_columns(roster, COMPACT_STRING_COLUMNS)
+    if dtypes is None:
+        dtypes = compact_dtypes(roster.select(columns))
+
+    roster = roster.with_columns(
+        pl.col(column).cast(dtypes[column]) for column in columns
+    )
+    if drop_roster_dates:
+        roster = roster.drop(present_columns(roster, RAW_DATE_COLUMNS))
+
+    return roster
+
+
+def compact_forecast_base(base, float32_money=False, drop_roster_dates=False):
+    """
+    Cast a forecast base to compact data types.
+
+    Inputs
+    base: dataframe or lazyframe - forecast base
+    float32_money: if True also store the monetary columns and the rates and factors they
+                   are calculated from as Float32, which keeps about 7 significant digits
+                   (cents up to amounts of about 100,000)
+    drop_roster_dates: if True drop the raw Start Date and End Date columns, which
+                       changes the exported columns
+
+    Output
+    forecast base with Enum roster strings, Int8 headcount columns, Int16 year and,
+    optionally, Float32 money, rates and factors and without the raw roster dates
+    """
+    strings = string_columns(base, COMPACT_STRING_COLUMNS)
+    dtypes = compact_dtypes(base.select(strings))
+    columns = [
+        *[pl.col(column).cast(dtypes[column]) for column in strings],
+        pl.col(present_columns(base, COMPACT_INTEGER_COLUMNS)).cast(pl.Int8),
+        pl.col(present_columns(base, COMPACT_YEAR_COLUMNS)).cast(pl.Int16),
+    ]
+    if float32_money:
+        columns.append(
+            pl.col(present_columns(base, COMPACT_RATE_COLUMNS + MONEY_COLUMNS)).cast(
+                pl.Float32
+            )
+        )
+
+    base = base.with_columns(columns)
+    if drop_roster_dates:
+        base = base.drop(present_columns(base, RAW_DATE_COLUMNS))
+
+    return base
+
+
+def compact_report(base):
+    """
+    Estimate the memory saved by the compact data types of a forecast base.
+
+    Each compacted column is compared with its size in the default data type, one column
+    at a time, so the full size forecast is never built. Dropped raw roster dates are
+    counted at the size of start_date_complete. On small forecasts the Enum categories
+    can outweigh the strings, saved_bytes is then negative.
+
+    Output
+    dict with "original_bytes", "compact_bytes" and "saved_bytes" of the whole forecast
+    """
+    default_dtypes = {column: pl.Utf8 for column in COMPACT_STRING_COLUMNS}
+    default_dtypes.update({column: pl.Int32 for column in COMPACT_INTEGER_COLUMNS})
+    default_dtypes.update({column: pl.Int32 for column in COMPACT_YEAR_COLUMNS})
+    default_dtypes.update({column: pl.Float64 for column in COMPACT_RATE_COLUMNS})
+    default_dtypes.update({column: pl.Float64 for column in MONEY_COLUMNS})
+
+    compact_bytes = base.estimated_size()
+    saved_bytes = 0
+    for column, dtype in default_dtypes.items():
+        if column in base.columns and base[column].dtype != dtype:
+            saved_bytes += (
+                base[column].cast(dtype).estimated_size()
+                - base[column].estimated_size()
+            )
+    if "start_date_complete" in base.columns:
+        saved_bytes += base["start_date_complete"].estimated_size() * len(
+            [column for column in RAW_DATE_COLUMNS if column not in base.columns]
+        )
+
+    return {
+        "original_bytes": compact_bytes + saved_bytes,
+        "compact_bytes": compact_bytes,
+        "saved_bytes": saved_bytes,
+    }
+
+
+def build_forecast_base(
+    month_ranges,
+    roster,
+    engine="interval",
+    compact=False,
+    float32_money=False,
+    drop_roster_dates=False,
+    trace=None,
+):
+    """
+    Build a base forecast from month ranges and an already loaded roster.
+
+    Inputs
+    month_ranges: dataframe - start_of_month, end_of_month and inflation_factor for every month
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    engine: "interval" to expand each role into its active months only,
+            "cross" to cross join every month with the full roster and filter
+    compact: if True use compact data types (see compact_forecast_base), the Enum
+             categories are the roster's values unless the roster is already compact
+    float32_money: with compact, also store monetary columns, rates and factors as Float32
+    drop_roster_dates: with compact, drop the raw Start Date and End Date columns
+    trace: list to record the time, rows and memory of every stage in, None to not profile
+
+    Output
+    Polars dataframe (or LazyFrame if roster is lazy)
+    """
+    # Encode repeated strings before the roster is expanded to months
+    if compact:
+        roster = profile_stage(
+            trace,
+            "compact_roster",
+            compact_roster,
+            roster,
+            drop_roster_dates=drop_roster_dates,
+        )
+
+    # Combine months with roster, keeping only the months each role is active
+    if engine == "interval":
+        forecast_base = profile_stage(
+            trace,
+            "expand_active_months",
+            lambda roster: expand_active_months(month_ranges, roster),
+            roster,
+        )
+    elif engine == "cross":
+        if isinstance(roster, pl.LazyFrame):
+            month_ranges = month_ranges.lazy()
+        forecast_base = profile_stage(
+            trace,
+            "cross_join",
+            lambda roster: month_ranges.join(roster, how="cross"),
+            roster,
+        )
+        forecast_base = profile_stage(
+            trace, "filter_active_months", filter_active_months, forecast_base
+        )
+    else:
+        raise ValueError(f"\nUnknown forecast base engine: '{engine}'\n")
+
+    # Apply transformations
+    for transformation in [
+        add_year_column,
+        add_proration,
+        add_primary_role_column,
+        add_headcount_column,
+        add_headcount_change_column,
+        calculate_compensation,
+        calculate_ytd_compensation,
+    ]:
+        forecast_base = profile_stage(
+            trace, transformation.__name__, transformation, forecast_base
+        )
+
+    if compact:
+        forecast_base = profile_stage(
+            trace,
+            "compact_forecast_base",
+            compact_forecast_base,
+            forecast_base,
+            float32_money,
+            drop_roster_dates,
+        )
+
+    return forecast_base
+
+
 def generate_forecast_base(
-    roster_path, start_date, end_date, infl_rate, infl_start, infl_freq
+    roster_path,
+    start_date,
+    end_date,
+    infl_rate,
+    infl_start,
+    infl_freq,
+    engine="interval",
+    lazy=False,
+    cache_dir=None,
+    compact=False,
+    float32_money=False,
+    drop_roster_dates=False,
+    trace=None,
 ):
     """
     Generate a base forecast with rows for all employees in roster and active months in range with compensation and headcount data.
@@ -124,12 +441,23 @@ def generate_forecast_base(
     infl_rate: inflation rate,
     infl_start: start date for inflation increases,
     infl_freq: number of months between inflation frequency
+    engine: "interval" to expand each role into its active months only,
+            "cross" to cross join every month with the full roster and filter
+    lazy: if True scan the roster and return a LazyFrame, nothing is computed until collected
+    cache_dir: directory of the parsed roster cache, None to always parse the roster file
+    compact: if True use compact data types (see compact_forecast_base)
+    float32_money: with compact, also store monetary columns, rates and factors as Float32
+    drop_roster_dates: with compact, drop the raw Start Date and End Date columns
+    trace: list to record the time, rows and memory of every stage in, None to not profile
 
     Output
-    Polars dataframe
+    Polars dataframe (or LazyFrame if lazy)
     """
     # Generate the month ranges
-    month_ranges = generate_month_ranges(
+    month_ranges = profile_stage(
+        trace,
+        "generate_month_ranges",
+        generate_month_ranges,
         start_date,
         end_date,
         infl_rate,
@@ -137,29 +465,20 @@ def generate_forecast_base(
         infl_freq,
     )
 
-    # Create a DataFrame from the month ranges
-    forecast_base = pl.DataFrame(
-        month_ranges,
-        schema=["start_of_month", "end_of_month", "inflation_factor"],
-        orient="row",
-    )
-
     # Create a roster from input file
-    roster = get_roster(roster_path)
-
-    # Cross join to roster
-    forecast_base = forecast_base.join(roster, how="cross")
-
-    # Apply transformations
-    forecast_base = filter_active_months(forecast_base)
-    forecast_base = add_year_column(forecast_base)
-    forecast_base = add_proration(forecast_base)
-    forecast_base = add_headcount_column(forecast_base)
-    forecast_base = add_headcount_change_column(forecast_base)
-    forecast_base = calculate_compensation(forecast_base)
-    forecast_base = calculate_ytd_compensation(forecast_base)
+    roster = profile_stage(
+        trace, "get_roster", get_roster, roster_path, lazy=lazy, cache_dir=cache_dir
+    )
 
-    return forecast_base
+    return build_forecast_base(
+        month_ranges,
+        roster,
+        engine=engine,
+        compact=compact,
+        float32_money=float32_money,
+        drop_roster_dates=drop_roster_dates,
+        trace=trace,
+    )
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,160 @@
+# cache.py
+import hashlib
+import inspect
+import json
+import os
+
+import polars as pl
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".headcount_model", "cache")
+DEFAULT_CACHE_MAX_BYTES = 1024**3
+CACHE_EXTENSION = ".arrow"
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """Return a stable hex key for any JSON serializable parts (other values use str)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def code_fingerprint(code):
+    """Bytes identifying a code object: its bytecode, names and constants, nested code included"""
+    parts = [code.co_code, repr(code.co_names).encode("utf-8")]
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            parts.append(code_fingerprint(constant))
+        else:
+            parts.append(repr(constant).encode("utf-8"))
+    return b"\0".join(parts)
+
+
+def code_digest(*sources):
+    """
+    Hex digest of the code of functions and of every function defined in modules.
+
+    Used in cache keys so entries are not reused once the code that calculated them
+    changes. Works without source files (e.g. in the compiled executable).
+    """
+    digest = hashlib.sha256()
+    for source in sources:
+        if inspect.ismodule(source):
+            functions = [
+                value
+                for _, value in sorted(vars(source).items())
+                if inspect.isfunction(value) and value.__module__ == source.__name__
+            ]
+        else:
+            functions = [source]
+        for function in functions:
+            digest.update(function.__qualname__.encode("utf-8"))
+            digest.update(code_fingerprint(function.__code__))
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key + CACHE_EXTENSION)
+
+
+def read_cached_frame(cache_dir, key, lazy=False):
+    """
+    Return the frame stored under key, memory-mapped, or None if it is not cached.
+
+    A hit refreshes the entry's modification time so eviction is least recently used.
+    An entry that cannot be read, e.g. evicted by another process in the meantime, is a
+    miss. In a read-only cache the entry is still read, only its time is not refreshed.
+    """
+    path = cache_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        pass
+
+    try:
+        if lazy:
+            return pl.scan_ipc(path, memory_map=True)
+        return pl.read_ipc(path, memory_map=True)
+    except OSError:
+        return None
+
+
+def write_cached_frame(cache_dir, key, frame, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """
+    Store a frame under key as uncompressed Arrow IPC (so it can be memory-mapped),
+    then evict least recently used entries until the cache fits in max_bytes.
+
+    A frame larger than max_bytes is not stored, it would only evict every other entry.
+
+    Output -> path of the entry, None if the frame was not stored
+    """
+    if frame.estimated_size() > max_bytes:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, key)
+
+    # Write to a temporary file first so readers never see a partial entry
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        frame.write_ipc(temp_path, compression="uncompressed")
+        os.replace(temp_path, path)
+    except OSError:
+        # e.g. a full disk, do not leave the partial entry behind
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    evict_cache(cache_dir, max_bytes, keep=[key])
+    return path
+
+
+def evict_cache(cache_dir, max_bytes, keep=()):
+    """
+    Remove least recently used cache entries until the total size is at most max_bytes.
+    Entries listed in keep are never removed.
+
+    Output -> list of removed keys
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CACHE_EXTENSION):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            # Removed by another process since it was listed
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name[: -len(CACHE_EXTENSION)]))
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, key in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key in keep:
+            continue
+        try:
+            os.remove(cache_path(cache_dir, key))
+        except OSError:
+            # Entry is still memory-mapped elsewhere (e.g. on Windows), try again later
+            continue
+        total -= size
+        removed.append(key)
+
+    return removed
@@ -1,77 +1,73 @@
 # calculations.py
 import polars as pl
 
+PER_HEAD_WINDOW = ["Employee ID", "start_of_month"]
+YEAR_TO_DATE_WINDOW = ["Employee ID", "year"]
 
-def rate_forecast(forecast, base_column, new_column_name, applied_rate):
-    """
-    Add a new column to a forecast that is an amount calculated as a percentage of an existing column
-
-    Inputs
-    forecast: dataframe - current forecast
-    base_column: str - column to calculate % of
-    new_column_name: str - name of new column
-    applied_rate: float - percentage rate to apply
 
-    Output
-    dataframe with new column added
+def validate_rate_inputs(schema, base_column):
+    """
+    Raise a ValueError if a rate forecast cannot be applied to a forecast with this schema
     """
-
     # Check if the base_column exists in the forecast
-    if base_column not in forecast.columns:
+    if base_column not in schema:
         raise ValueError(
             f"\nColumn '{base_column}' not found in forecast. Cannot apply rate.\n"
         )
 
     # Check if the base_column is of a numeric type
-    elif not forecast[base_column].dtype.is_numeric():
+    elif not schema[base_column].is_numeric():
         raise ValueError(
             f"\nColumn '{base_column}' is not a numeric type. Cannot apply rate.\n"
         )
-        return forecast
 
-    # Add the new column as a percentage of the base_column
-    else:
-        forecast = forecast.with_columns(
-            (pl.col(base_column) * applied_rate).alias(new_column_name)
-        )
 
-    return forecast
+def rate_expression(base_column, new_column_name, applied_rate):
+    """Expression for a new column that is a percentage of base_column"""
+    return (pl.col(base_column) * applied_rate).alias(new_column_name)
 
 
-def capped_rate_forecast(
-    forecast, base_column, new_column_name, applied_rate, cap_base_column, cap_amount
-):
+def rate_forecast(forecast, base_column, new_column_name, applied_rate):
     """
-    Add a new column to a forecast that is an amount calculated as a percentage of an existing column,
-    with a cap on the base amount.
+    Add a new column to a forecast that is an amount calculated as a percentage of an existing column
 
     Inputs
-    forecast: dataframe - current forecast
+    forecast: dataframe or lazyframe - current forecast
     base_column: str - column to calculate % of
     new_column_name: str - name of new column
     applied_rate: float - percentage rate to apply
-    cap_base_column: str - column used to determine the whether cap has been exceeded
-    cap_amount: float - maximum amount of cap_base_column to apply the rate to
 
     Output
-    DataFrame with the new column added.
+    dataframe with new column added (lazyframe if forecast is lazy)
     """
+    validate_rate_inputs(forecast.collect_schema(), base_column)
+
+    # Add the new column as a percentage of the base_column
+    return forecast.with_columns(
+        rate_expression(base_column, new_column_name, applied_rate)
+    )
 
+
+def validate_capped_rate_inputs(schema, base_column, cap_base_column):
+    """
+    Raise a ValueError if a capped rate forecast cannot be applied to a forecast with this schema
+    """
     # Ensure base_column and cap_base_column exist and are numeric
-    if base_column not in forecast.columns or cap_base_column not in forecast.columns:
+    if base_column not in schema or cap_base_column not in schema:
         raise ValueError(
             f"\nForecast could not be applied: column '{base_column}' or '{cap_base_column}' not found.\n"
         )
 
-    if (
-        not forecast[base_column].dtype.is_numeric()
-        or not forecast[cap_base_column].dtype.is_numeric()
-    ):
+    if not schema[base_column].is_numeric() or not schema[cap_base_column].is_numeric():
         raise ValueError(
             f"\nForecast could not be applied: column '{base_column}' or '{cap_base_column}' is not numeric.\n"
         )
 
-    # Compute the capped rate
+
+def capped_rate_expression(
+    base_column, new_column_name, applied_rate, cap_base_column, cap_amount
+):
+    """Expression for a new column that is a percentage of base_column up to a cap on cap_base_column"""
     capped_rate_expr = pl.when(pl.col(cap_base_column) <= cap_amount)
     capped_rate_expr = capped_rate_expr.then(pl.col(base_column) * applied_rate)
     capped_rate_expr = capped_rate_expr.when(
@@ -83,52 +79,213 @@ def capped_rate_forecast(
         * applied_rate
     ).alias(new_column_name)
 
-    return forecast.with_columns(capped_rate_expr)
+    return capped_rate_expr
 
 
-def per_head_forecast(forecast, new_column_name, amount):
+def capped_rate_forecast(
+    forecast, base_column, new_column_name, applied_rate, cap_base_column, cap_amount
+):
     """
-    Add a new column to a forecast that is a flat amount adjusted for inflation for any month an employee is active
+    Add a new column to a forecast that is an amount calculated as a percentage of an existing column,
+    with a cap on the base amount.
 
     Inputs
-    forecast: dataframe - current forecast
+    forecast: dataframe or lazyframe - current forecast
+    base_column: str - column to calculate % of
     new_column_name: str - name of new column
-    amount: number - monthly amount of expense
+    applied_rate: float - percentage rate to apply
+    cap_base_column: str - column used to determine the whether cap has been exceeded
+    cap_amount: float - maximum amount of cap_base_column to apply the rate to
+
+    Output
+    DataFrame with the new column added (LazyFrame if forecast is lazy).
+    """
+    validate_capped_rate_inputs(forecast.collect_schema(), base_column, cap_base_column)
+
+    # Compute the capped rate
+    return forecast.with_columns(
+        capped_rate_expression(
+            base_column, new_column_name, applied_rate, cap_base_column, cap_amount
+        )
+    )
+
+
+def validate_capped_cumulative_inputs(schema, caps):
+    """
+    Raise a ValueError if capped cumulative forecasts cannot be applied to a forecast with this schema
+    """
+    missing = [
+        column
+        for column in YEAR_TO_DATE_WINDOW + ["start_of_month"]
+        if column not in schema
+    ]
+    if missing:
+        raise ValueError(
+            f"\nForecast could not be applied: column(s) {missing} not found.\n"
+        )
+
+    for cap in caps:
+        validate_rate_inputs(schema, cap["base_column"])
+
+
+def order_key(order_by):
+    """
+    Single Int64 sort key for order_by: a month column (as days) followed by integer
+    columns, each in the lower 32 bits. Sorting by several columns (or a struct) within a
+    window is much slower and sorting by several columns can misplace rows.
+    """
+    month, *tie_breakers = order_by
+    key = pl.col(month).dt.epoch("d").cast(pl.Int64)
+    for column in tie_breakers:
+        key = key * 2**32 + pl.col(column).cast(pl.Int64)
+    return key
+
+
+def running_total_expression(column, order_by=("start_of_month",)):
+    """
+    Expression for the year to date running total of a column per employee.
+
+    The total is accumulated in order_by order within each employee and year and mapped back
+    to the original rows, so it does not depend on how the forecast is sorted. order_by is
+    the month column followed by integer tie breakers, see running_total_order.
+    """
+    key = order_key(order_by)
+    # Ties keep their row order in both the sort and the ranks
+    position = key.rank("ordinal") - 1
+    return (
+        pl.col(column)
+        .sort_by(key, maintain_order=True)
+        .cum_sum()
+        .gather(position)
+        .over(YEAR_TO_DATE_WINDOW)
+    )
+
+
+def running_total_order(schema):
+    """Order of rows within an employee and year, Role ID breaks ties within a month"""
+    return ["start_of_month", "Role ID"] if "Role ID" in schema else ["start_of_month"]
+
+
+def capped_cumulative_forecast(forecast, caps):
+    """
+    Add several capped rate columns at once, each capped on the employee's year to date total
+    of its own base column, which is computed here.
+
+    Inputs
+    forecast: dataframe or lazyframe - current forecast
+    caps: list of dict - each with
+        base_column: str - column to calculate % of and to accumulate for the cap
+        new_column_name: str - name of new column
+        applied_rate: float - percentage rate to apply
+        cap_amount: float - maximum year to date amount of base_column to apply the rate to
+
+    All caps are calculated from the columns of the input forecast. Caps sharing a base column
+    share one running total, and all new columns are added in a single projection.
 
     Output
-    DataFrame with the new column added.
+    DataFrame with the new columns added (LazyFrame if forecast is lazy).
     """
+    schema = forecast.collect_schema()
+    validate_capped_cumulative_inputs(schema, caps)
+
+    # One running total per distinct base column
+    order_by = running_total_order(schema)
+    running_totals = {}
+    for cap in caps:
+        if cap["base_column"] not in running_totals:
+            running_totals[cap["base_column"]] = f"__ytd_{cap['base_column']}"
+
+    forecast = forecast.with_columns(
+        running_total_expression(base_column, order_by).alias(running_total)
+        for base_column, running_total in running_totals.items()
+    )
+
+    forecast = forecast.with_columns(
+        capped_rate_expression(
+            cap["base_column"],
+            cap["new_column_name"],
+            cap["applied_rate"],
+            running_totals[cap["base_column"]],
+            cap["cap_amount"],
+        )
+        for cap in caps
+    )
+
+    return forecast.drop(list(running_totals.values()))
 
+
+def validate_per_head_inputs(schema):
+    """
+    Raise a ValueError if a per head forecast cannot be applied to a forecast with this schema
+    """
     # Ensure that proration and inflation_factor columns exist and are numeric
     if (
-        "proration" not in forecast.columns
-        or "inflation_factor" not in forecast.columns
-        or not forecast["proration"].dtype.is_numeric()
-        or not forecast["inflation_factor"].dtype.is_numeric()
+        "proration" not in schema
+        or "inflation_factor" not in schema
+        or not schema["proration"].is_numeric()
+        or not schema["inflation_factor"].is_numeric()
     ):
         raise ValueError(
             "\nForecast could not be applied: column 'proration' or 'inflation_factor' not found or not numeric.\n"
         )
 
-    # Find the maximum proration per Employee ID and start_of_month
-    max_prorations = forecast.group_by(["Employee ID", "start_of_month"]).agg(
-        pl.col("proration").max().alias("max_proration")
+
+def primary_role_expression(schema):
+    """
+    Expression flagging the role of each employee and month with the highest proration,
+    ties going to the lowest Role ID, as add_primary_role_column does. Without a Role ID
+    column ties go to the first row. Months with no active days have no primary role.
+    """
+    order = ["proration"] + (["Role ID"] if "Role ID" in schema else [])
+    best = pl.arg_sort_by(
+        order, descending=[True] + [False] * (len(order) - 1), maintain_order=True
+    ).first()
+    return (pl.int_range(pl.len()) == best).over(PER_HEAD_WINDOW) & (
+        pl.col("proration") > 0
     )
 
-    # Join back to the original forecast to identify rows with the maximum proration
-    forecast = forecast.join(max_prorations, on=["Employee ID", "start_of_month"])
 
-    # Apply the amount only to the rows with the maximum proration to avoid duplication when an employee changes roles mid month
-    forecast = forecast.with_columns(
-        pl.when(
-            (pl.col("proration") == pl.col("max_proration")) & (pl.col("proration") > 0)
-        )
+def per_head_expression(new_column_name, amount, primary_role):
+    """
+    Expression for a flat amount adjusted for inflation, applied only to one role of each
+    employee and month.
+
+    primary_role: name of a boolean column flagging that role (see add_primary_role_column)
+                  or a boolean expression (see primary_role_expression)
+    """
+    condition = pl.col(primary_role) if isinstance(primary_role, str) else primary_role
+
+    return (
+        pl.when(condition)
         .then(pl.col("inflation_factor") * amount)
         .otherwise(0)
         .alias(new_column_name)
     )
 
-    # Drop the temporary max_proration column
-    forecast = forecast.drop("max_proration")
 
-    return forecast
+def per_head_forecast(forecast, new_column_name, amount):
+    """
+    Add a new column to a forecast that is a flat amount adjusted for inflation for any month an employee is active
+
+    Inputs
+    forecast: dataframe or lazyframe - current forecast
+    new_column_name: str - name of new column
+    amount: number - monthly amount of expense
+
+    Output
+    DataFrame with the new column added (LazyFrame if forecast is lazy).
+    """
+    schema = forecast.collect_schema()
+    validate_per_head_inputs(schema)
+
+    # Forecast bases flag the role carrying per head costs, no window or join needed
+    if "primary_role" in schema:
+        return forecast.with_columns(
+            per_head_expression(new_column_name, amount, primary_role="primary_role")
+        )
+
+    # Apply the amount only to the primary role to avoid duplication when an employee
+    # changes roles mid month, the same role add_primary_role_column would flag
+    return forecast.with_columns(
+        per_head_expression(new_column_name, amount, primary_role_expression(schema))
+    )
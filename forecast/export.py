@@ -0,0 +1,130 @@
+# export.py
+import os
+from urllib.parse import quote
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from forecast.utilities import console
+
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def hive_partition_path(directory, partition_by, key):
+    """
+    Build the hive style directory (e.g. year=2024/Department=Sales) for one partition key.
+    Values are percent-encoded so they are always valid path segments.
+    """
+    segments = [
+        f"{column}="
+        + (HIVE_DEFAULT_PARTITION if value is None else quote(str(value), safe=""))
+        for column, value in zip(partition_by, key)
+    ]
+    return os.path.join(directory, *segments)
+
+
+# File written in every partition directory
+PARTITION_FILE_NAME = "data.parquet"
+
+
+def write_month_row_groups(months, file_path, compression="zstd"):
+    """
+    Write a frame sorted by start_of_month to one parquet file with one row group per
+    month, so the start_of_month statistics let readers skip the months they do not need.
+    """
+    table = months.to_arrow()
+    counts = months.group_by("start_of_month", maintain_order=True).len()["len"]
+
+    with pq.ParquetWriter(file_path, table.schema, compression=compression) as writer:
+        offset = 0
+        for count in counts:
+            writer.write_table(table.slice(offset, count), row_group_size=count)
+            offset += count
+
+
+def write_forecast_parquet(
+    forecast, directory, partition_by=("year", "Department"), compression="zstd"
+):
+    """
+    Write a forecast as a hive-partitioned Parquet dataset.
+
+    Inputs
+    forecast: dataframe or lazyframe - forecast to export
+    directory: str - root directory of the dataset
+    partition_by: sequence of str - columns used for the partition directories
+    compression: str - parquet compression codec
+
+    One file is written per partition, sorted by start_of_month with one row group per
+    month. Partition columns are stored in the directory names only.
+    Partitions are built and written one at a time, so only one partition is held in
+    memory. A lazy forecast's plan is run once for the partition keys and once (streaming
+    where the plan allows) for every partition.
+
+    Output
+    list of file paths written
+    """
+    partition_by = list(partition_by)
+
+    schema = forecast.collect_schema()
+    missing = [
+        column for column in partition_by + ["start_of_month"] if column not in schema
+    ]
+    if missing:
+        raise ValueError(
+            f"\nForecast could not be exported: column(s) {missing} not found.\n"
+        )
+
+    console.log(f"Writing partitioned forecast to [blue]{directory}[/blue]...")
+    forecast = forecast.lazy()
+    keys = forecast.select(partition_by).unique().collect(streaming=True)
+
+    written = []
+    # Partitions in key order, missing values last
+    for key in sorted(
+        keys.rows(), key=lambda key: [(value is None, value) for value in key]
+    ):
+        partition_dir = hive_partition_path(directory, partition_by, key)
+        os.makedirs(partition_dir, exist_ok=True)
+
+        months = (
+            forecast.filter(
+                [
+                    pl.col(column).eq_missing(value)
+                    for column, value in zip(partition_by, key)
+                ]
+            )
+            .drop(partition_by)
+            .sort("start_of_month", maintain_order=True)
+            .collect(streaming=True)
+        )
+        file_path = os.path.join(partition_dir, PARTITION_FILE_NAME)
+        write_month_row_groups(months, file_path, compression)
+        written.append(file_path)
+
+    console.log(f"[green]Wrote {len(written)} partitions![/green]")
+
+    return written
+
+
+def write_forecast(forecast, export_stem, export_format="csv"):
+    """
+    Write a forecast to export_stem + ".csv", or to a partitioned parquet dataset
+    in the directory export_stem.
+
+    A lazy forecast is collected here for csv, so the full plan is computed only once.
+
+    Output
+    path of the file or directory written
+    """
+    if export_format == "parquet":
+        write_forecast_parquet(forecast, export_stem)
+        return export_stem
+
+    elif export_format == "csv":
+        export_path = export_stem + ".csv"
+        if isinstance(forecast, pl.LazyFrame):
+            forecast = forecast.collect()
+        forecast.write_csv(export_path)
+        return export_path
+
+    raise ValueError(f"\nUnknown export format: '{export_format}'\n")
@@ -0,0 +1,280 @@
+# headcount.py
+import polars as pl
+
+from forecast.utilities import console, get_roster, generate_month_ranges
+
+
+def role_events(roster, first_month, dimensions):
+    """
+    Turn each role into a start event and an end event in the month they happen.
+
+    Roles ending before they start are never counted by the forecast base and are left out.
+    Events before the forecast are moved into its first month, so they count towards the
+    opening headcount but not towards the change of that month.
+
+    Output
+    lazyframe with the dimensions, month, opening (bool) and starts/ends (1 or 0)
+    """
+    roles = roster.lazy().filter(
+        pl.col("start_date_complete") <= pl.col("end_date_complete")
+    )
+    events = pl.concat(
+        [
+            roles.select(
+                *dimensions,
+                pl.col("start_date_complete").dt.month_start().alias("month"),
+                pl.lit(1).alias("starts"),
+                pl.lit(0).alias("ends"),
+            ),
+            roles.select(
+                *dimensions,
+                pl.col("end_date_complete").dt.month_start().alias("month"),
+                pl.lit(0).alias("starts"),
+                pl.lit(1).alias("ends"),
+            ),
+        ]
+    )
+
+    return events.with_columns(
+        (pl.col("month") < first_month).alias("opening"),
+        pl.max_horizontal("month", pl.lit(first_month)).alias("month"),
+    )
+
+
+def check_dimensions(roster, dimensions):
+    """Raise a ValueError if a dimension to segment by is not a roster column"""
+    roster_columns = roster.collect_schema().names()
+    missing = [column for column in dimensions if column not in roster_columns]
+    if missing:
+        raise ValueError(f"\nForecast could not be segmented: {missing} not found.\n")
+
+
+def month_segment_grid(month_ranges, roster, dimensions):
+    """Lazyframe of every month of every segment of the roster"""
+    months = month_ranges.lazy().select("start_of_month")
+    if not dimensions:
+        return months
+    return months.join(roster.lazy().select(dimensions).unique(), how="cross")
+
+
+def running_total(column, dimensions):
+    """Expression for the running total of a column over months within each segment"""
+    if dimensions:
+        return pl.col(column).cum_sum().over(dimensions)
+    return pl.col(column).cum_sum()
+
+
+def sweep_headcount(month_ranges, roster, dimensions=None):
+    """
+    Monthly ending headcount and net change per segment without building the forecast base.
+
+    Inputs
+    month_ranges: dataframe - start_of_month and end_of_month for every month
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    dimensions: list of str - roster columns to segment by, e.g. ["Department"],
+                None for company totals
+
+    Every role becomes a start and an end event, events are counted per segment and month
+    and the headcount is the running total of starts less ends. The work grows with the
+    roster plus months x segments instead of every employee-month. Results match summing
+    headcount and headcount_change of the forecast base per month and segment.
+
+    Output
+    dataframe of start_of_month, the dimensions, headcount and headcount_change for every
+    month and segment
+    """
+    dimensions = list(dimensions or [])
+    check_dimensions(roster, dimensions)
+
+    console.log("Sweeping roster events into monthly headcount...")
+    first_month = month_ranges["start_of_month"].min()
+    last_month = month_ranges["start_of_month"].max()
+
+    counts = (
+        role_events(roster, first_month, dimensions)
+        .filter(pl.col("month") <= last_month)
+        .group_by(dimensions + ["month"])
+        .agg(
+            (pl.col("starts") - pl.col("ends")).sum().alias("net"),
+            (pl.col("starts") - pl.col("ends"))
+            .filter(~pl.col("opening"))
+            .sum()
+            .alias("headcount_change"),
+        )
+        .rename({"month": "start_of_month"})
+    )
+
+    # Every month of every segment, so months without events carry the headcount forward
+    headcount = (
+        month_segment_grid(month_ranges, roster, dimensions)
+        .join(counts, on=["start_of_month"] + dimensions, how="left", join_nulls=True)
+        .with_columns(pl.col("net", "headcount_change").fill_null(0))
+        .sort(dimensions + ["start_of_month"], nulls_last=True)
+        .with_columns(running_total("net", dimensions).alias("headcount"))
+        .select("start_of_month", *dimensions, "headcount", "headcount_change")
+        .sort(["start_of_month"] + dimensions, nulls_last=True)
+        .collect()
+    )
+    console.log("[green]Monthly headcount calculated![/green]")
+
+    return headcount
+
+
+def generate_headcount(
+    roster_path, start_date, end_date, dimensions=None, lazy=False, cache_dir=None
+):
+    """
+    Monthly headcount and net change per segment straight from a roster file.
+
+    Inputs
+    roster_path: str - roster csv
+    start_date: start date of forecast range
+    end_date: end date of forecast range
+    dimensions: list of str - roster columns to segment by, None for company totals
+    lazy: if True scan the roster instead of reading it
+    cache_dir: directory of the parsed roster cache, None to always parse the roster file
+
+    Output
+    dataframe as returned by sweep_headcount
+    """
+    # Headcount does not depend on inflation
+    month_ranges = generate_month_ranges(start_date, end_date, 0.0, start_date, 12)
+    roster = get_roster(roster_path, lazy=lazy, cache_dir=cache_dir)
+
+    return sweep_headcount(month_ranges, roster, dimensions)
+
+
+def segment_date_key(segment, day):
+    """
+    Int64 key ordering by segment, then date: the segment code in the upper bits and the
+    date (as days, shifted to be positive) in the lower 32 bits
+    """
+    return segment.cast(pl.Int64) * 2**32 + day.dt.epoch("d").cast(pl.Int64) + 2**31
+
+
+def headcount_index(roster, dimensions=None):
+    """
+    Index the roster's role intervals for point in time headcount queries.
+
+    Inputs
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    dimensions: list of str - roster columns to segment by, None for company totals
+
+    Start and end dates are kept as two sorted keys of segment and date, so the headcount
+    of a segment on a date is the number of starts on or before it less the number of ends
+    on or before it, two binary searches. Like the forecast base, a role counts on a date
+    from its start date up to the day before its end date.
+
+    Output
+    dict with dimensions, segments (dataframe of the dimensions and their segment code),
+    starts and ends (sorted Int64 series) and roles (roster sorted by start date)
+    """
+    dimensions = list(dimensions or [])
+    check_dimensions(roster, dimensions)
+
+    console.log("Indexing roster for point in time headcount...")
+    # Roles ending before they start are never counted
+    roles = (
+        roster.lazy()
+        .filter(pl.col("start_date_complete") <= pl.col("end_date_complete"))
+        .sort("start_date_complete")
+        .collect()
+    )
+    if dimensions:
+        segments = (
+            roles.select(dimensions)
+            .unique()
+            .sort(dimensions, nulls_last=True)
+            .with_row_index("segment")
+        )
+        codes = roles.select(dimensions).join(
+            segments, on=dimensions, how="left", join_nulls=True
+        )["segment"]
+    else:
+        segments = pl.DataFrame({"segment": [0]}, schema={"segment": pl.UInt32})
+        codes = pl.repeat(0, roles.height, dtype=pl.UInt32, eager=True)
+
+    keys = roles.select(
+        segment_date_key(pl.lit(codes), pl.col("start_date_complete"))
+        .sort()
+        .alias("starts"),
+        segment_date_key(pl.lit(codes), pl.col("end_date_complete"))
+        .sort()
+        .alias("ends"),
+    )
+
+    return {
+        "dimensions": dimensions,
+        "segments": segments,
+        "starts": keys["starts"],
+        "ends": keys["ends"],
+        "roles": roles,
+    }
+
+
+def headcount_at(index, dates):
+    """
+    Headcount per segment on each of a batch of dates.
+
+    Inputs
+    index: dict - roster index from headcount_index
+    dates: list or series of dates
+
+    Every segment and date is answered with two binary searches over the index, so the
+    work grows with segments x dates x log(roles). On the end_of_month of a month the
+    headcount matches summing headcount of the forecast base.
+
+    Output
+    dataframe of date, the dimensions and headcount for every date and segment
+    """
+    dimensions = index["dimensions"]
+    queries = (
+        pl.DataFrame({"date": pl.Series(dates).cast(pl.Date)})
+        .unique()
+        .join(index["segments"], how="cross")
+    )
+    query_keys = segment_date_key(pl.col("segment"), pl.col("date"))
+
+    # Segments before the queried one have as many starts as ends and cancel out
+    return (
+        queries.with_columns(
+            (
+                pl.lit(index["starts"]).search_sorted(query_keys, side="right")
+                - pl.lit(index["ends"]).search_sorted(query_keys, side="right")
+            )
+            .cast(pl.Int32)
+            .alias("headcount")
+        )
+        .sort(["date", "segment"])
+        .select("date", *dimensions, "headcount")
+    )
+
+
+def roster_snapshots(index, dates):
+    """
+    Roles active on each of a batch of dates.
+
+    The queried dates are sorted once, and two binary searches per role find the run of
+    dates from its start date up to the day before its end date. The work grows with
+    roles x log(dates) plus the rows returned, with no pass over the roster per date.
+
+    Output
+    dataframe of date and the roster columns of every role active on each date, in start
+    date order of the roles and then by date
+    """
+    roles = index["roles"]
+    dates = pl.Series("date", sorted(set(dates)), dtype=pl.Date)
+
+    # Every active role repeated once per position of a date it is active on
+    return (
+        roles.with_columns(
+            pl.int_ranges(
+                pl.lit(dates).search_sorted(pl.col("start_date_complete"), side="left"),
+                pl.lit(dates).search_sorted(pl.col("end_date_complete"), side="left"),
+                dtype=pl.UInt32,
+            ).alias("date")
+        )
+        .filter(pl.col("date").list.len() > 0)
+        .explode("date")
+        .select(pl.lit(dates).gather(pl.col("date")).alias("date"), *roles.columns)
+    )
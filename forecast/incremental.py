@@ -0,0 +1,203 @@
+# incremental.py
+import polars as pl
+
+from forecast.base import (
+    COMPACT_STRING_COLUMNS,
+    build_forecast_base,
+    compact_dtypes,
+    compact_roster,
+)
+from forecast.register import (
+    parse_base_inputs,
+    base_from_register,
+    apply_register_steps,
+)
+from forecast.utilities import generate_month_ranges
+
+
+def diff_rosters(old_roster, new_roster, key="Role ID"):
+    """
+    Compare two rosters row by row on key.
+
+    Inputs
+    old_roster: dataframe - roster the current forecast was built from
+    new_roster: dataframe - updated roster
+    key: str - column identifying a roster row
+
+    Output
+    dict with lists of "added", "removed" and "changed" keys and "employees",
+    the Employee IDs whose forecast rows have to be recomputed (in either roster)
+    """
+    columns = [column for column in new_roster.columns if column in old_roster.columns]
+
+    def row_hashes(roster):
+        return roster.select(pl.col(key), pl.struct(columns).hash().alias("row_hash"))
+
+    compared = row_hashes(old_roster).join(
+        row_hashes(new_roster), on=key, how="full", suffix="_new", coalesce=True
+    )
+    added = compared.filter(pl.col("row_hash").is_null())[key].to_list()
+    removed = compared.filter(pl.col("row_hash_new").is_null())[key].to_list()
+    changed = compared.filter(
+        pl.col("row_hash").is_not_null()
+        & pl.col("row_hash_new").is_not_null()
+        & (pl.col("row_hash") != pl.col("row_hash_new"))
+    )[key].to_list()
+
+    # A changed role may also have moved between employees, so take both sides
+    touched = added + removed + changed
+    employees = (
+        pl.concat(
+            [
+                old_roster.filter(pl.col(key).is_in(touched)).select("Employee ID"),
+                new_roster.filter(pl.col(key).is_in(touched)).select("Employee ID"),
+            ]
+        )
+        .unique()["Employee ID"]
+        .to_list()
+    )
+
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "employees": employees,
+    }
+
+
+def forecast_dtypes(forecast):
+    """Enum data types of the compact string columns of a forecast"""
+    schema = forecast.collect_schema()
+    return {
+        column: schema[column]
+        for column in COMPACT_STRING_COLUMNS
+        if isinstance(schema.get(column), pl.Enum)
+    }
+
+
+def update_forecast(forecast, old_roster, new_roster, actions, on_error=None):
+    """
+    Update a forecast for roster edits by recomputing only the employees they affect.
+
+    Inputs
+    forecast: dataframe or lazyframe - forecast built from old_roster with actions
+    old_roster: dataframe - roster the forecast was built from
+    new_roster: dataframe - updated roster, as returned by get_roster
+    actions: dict - action register the forecast was built with
+    on_error: callable(column, error) for register steps that cannot be applied
+
+    Every calculation in the base and the register works within an employee (year to date,
+    primary role and per head windows are per employee), so rebuilding all rows of the
+    affected employees gives the same result as a full rebuild. The recomputed rows are
+    appended after the unchanged ones. Compact string columns of both are cast to Enums
+    holding the values of both rosters.
+
+    Output
+    updated forecast (lazy if forecast is lazy) and the roster diff
+    """
+    diff = diff_rosters(old_roster, new_roster)
+    if not diff["employees"]:
+        return forecast, diff
+
+    affected = pl.col("Employee ID").is_in(diff["employees"])
+    unchanged = forecast.filter(~affected)
+    new_roster = new_roster.filter(affected)
+
+    if forecast_dtypes(forecast):
+        dtypes = compact_dtypes(old_roster, new_roster)
+        unchanged = unchanged.with_columns(
+            pl.col(column).cast(dtypes[column]) for column in forecast_dtypes(forecast)
+        )
+        new_roster = compact_roster(new_roster, dtypes)
+
+    # Base rows, compensation, year to date and register columns for affected employees only
+    recomputed = base_from_register(actions, new_roster)
+    recomputed = apply_register_steps(
+        recomputed, actions["added_columns"], on_error=on_error
+    )
+
+    if isinstance(forecast, pl.LazyFrame):
+        recomputed = recomputed.lazy()
+
+    return (
+        pl.concat([unchanged, recomputed.select(unchanged.collect_schema().names())]),
+        diff,
+    )
+
+
+def extend_horizon(forecast, roster, actions, end_date, on_error=None):
+    """
+    Extend a forecast to a later end date by generating only the new months.
+
+    Inputs
+    forecast: dataframe - forecast built from roster with actions
+    roster: dataframe - roster the forecast was built from, as returned by get_roster
+    actions: dict - action register the forecast was built with
+    end_date: date - new end date of the forecast
+    on_error: callable(column, error) for register steps that cannot be applied
+
+    The month calendar is regenerated from the original start date, which only costs one row
+    per month and keeps the inflation curve identical to a full rebuild. Year to date
+    compensation carries on from the existing months of the same year, and register steps
+    are applied to the new months together with those existing months, so cumulative caps
+    continue where they stopped. A compact roster is encoded with the forecast's Enums.
+
+    Output
+    extended forecast and a copy of actions with the new end_date
+    """
+    base_inputs = parse_base_inputs(actions["base_inputs"])
+    if end_date <= base_inputs["end_date"]:
+        raise ValueError(
+            f"\nNew end date {end_date} is not after the current end date {base_inputs['end_date']}.\n"
+        )
+
+    # Months after the current horizon, with the inflation curve continued
+    month_ranges = generate_month_ranges(
+        base_inputs["start_date"],
+        end_date,
+        base_inputs["infl_rate"],
+        base_inputs["infl_start"],
+        base_inputs["infl_freq"],
+    )
+    current_end = base_inputs["end_date"]
+    month_ranges = month_ranges.filter(pl.col("start_of_month") > current_end)
+
+    extended_actions = dict(actions)
+    extended_actions["base_inputs"] = dict(
+        actions["base_inputs"], end_date=end_date.strftime("%Y-%m-%d")
+    )
+    if month_ranges.is_empty():
+        return forecast, extended_actions
+
+    if forecast_dtypes(forecast):
+        roster = compact_roster(roster, forecast_dtypes(forecast))
+    extension = build_forecast_base(
+        month_ranges, roster, compact=base_inputs.get("compact", False)
+    )
+    # Only the columns the forecast kept, e.g. without dropped roster dates
+    extension = extension.select(
+        column for column in extension.columns if column in forecast.columns
+    )
+
+    # Existing months of the first new year carry into year to date compensation
+    first_year = month_ranges["start_of_month"].min().year
+    context = forecast.filter(pl.col("year") == first_year).select(extension.columns)
+    carried = context.group_by(["Employee ID", "year"]).agg(
+        pl.col("compensation").sum().alias("carried_compensation")
+    )
+    extension = (
+        extension.join(carried, on=["Employee ID", "year"], how="left")
+        .with_columns(
+            (
+                pl.col("ytd_compensation") + pl.col("carried_compensation").fill_null(0)
+            ).alias("ytd_compensation")
+        )
+        .drop("carried_compensation")
+    )
+
+    # Register columns for the new months, computed alongside the existing months of that year
+    extension = apply_register_steps(
+        pl.concat([context, extension]), actions["added_columns"], on_error=on_error
+    ).filter(pl.col("start_of_month") > current_end)
+
+    return pl.concat([forecast, extension.select(forecast.columns)]), extended_actions
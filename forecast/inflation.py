@@ -0,0 +1,207 @@
+# inflation.py
+from itertools import product
+
+import polars as pl
+
+from forecast.base import build_forecast_base, calculate_ytd_compensation
+from forecast.register import apply_register_steps, parse_base_inputs
+from forecast.rollup import rollup_forecast
+from forecast.utilities import console, generate_month_ranges
+
+# Base columns calculated as an amount times the inflation factor
+LINEAR_BASE_COLUMNS = [
+    "salary_amount",
+    "bonus_amount",
+    "commission_amount",
+    "compensation",
+]
+# Base columns that are not a multiple of the month's inflation factor
+RECOMPUTED_BASE_COLUMNS = ["ytd_compensation"]
+
+
+def inflation_grid(rates, starts, freqs):
+    """
+    Every combination of inflation rates, start dates and frequencies as scenarios
+
+    Output
+    list of dict with infl_rate, infl_start and infl_freq
+    """
+    return [
+        {"infl_rate": rate, "infl_start": start, "infl_freq": freq}
+        for rate, start, freq in product(rates, starts, freqs)
+    ]
+
+
+def scenario_name(scenario):
+    """Name of an inflation scenario, e.g. 3.00% from 2025-01-01 every 12 months"""
+    if "name" in scenario:
+        return scenario["name"]
+    return (
+        f"{scenario['infl_rate']:.2%} from {scenario['infl_start']:%Y-%m-%d} "
+        f"every {scenario['infl_freq']} months"
+    )
+
+
+def inflation_scaling(added_columns):
+    """
+    How each base and register column depends on the inflation factor.
+
+    "linear" columns are a multiple of the month's inflation factor and are rescaled,
+    "constant" columns do not depend on it and "recompute" columns (year to date totals,
+    caps and anything calculated from them) are recalculated for every scenario.
+    Columns not listed are constant.
+
+    Output
+    dict of column name -> "linear", "constant" or "recompute"
+    """
+    scaling = {column: "linear" for column in LINEAR_BASE_COLUMNS}
+    scaling.update({column: "recompute" for column in RECOMPUTED_BASE_COLUMNS})
+
+    for column in added_columns:
+        if column["type"] == "flat_rate":
+            kind = scaling.get(column["base_column"], "constant")
+        elif column["type"] == "per_head":
+            kind = "linear"
+        else:
+            kind = "recompute"
+        scaling[column["new_column_name"]] = kind
+
+    return scaling
+
+
+def rescale_inflation(forecast, month_ranges, linear_columns):
+    """
+    Replace the inflation factor of a forecast built at a unit inflation factor and
+    multiply the linear columns by it, keeping row order and data types
+    """
+    factor = pl.col("start_of_month").replace_strict(
+        month_ranges["start_of_month"],
+        month_ranges["inflation_factor"],
+        return_dtype=pl.Float64,
+    )
+    schema = forecast.collect_schema()
+
+    return forecast.with_columns(
+        factor.cast(schema["inflation_factor"]).alias("inflation_factor"),
+        *[(pl.col(column) * factor).cast(schema[column]) for column in linear_columns],
+    )
+
+
+def inflation_sweep(
+    actions, roster, scenarios, engine="interval", on_error=None, grains=None
+):
+    """
+    Replay an action register under several inflation assumptions from a single base.
+
+    Inputs
+    actions: dict - action register, its inflation inputs are replaced by each scenario
+    roster: dataframe - roster as returned by get_roster
+    scenarios: list of dict - each with infl_rate, infl_start (date), infl_freq and
+               optionally a name, see inflation_grid
+    engine: forecast base engine passed to build_forecast_base
+    on_error: callable(column, error) called once for a step that cannot be applied,
+              which is then skipped. If None the ValueError is raised.
+    grains: rollup grains (see rollup_forecast) to return per scenario rollups instead of
+            the detail, "scenario" is added as the first dimension of every grain
+
+    The base and every register step that is linear in the inflation factor (flat rates
+    of compensation, per head amounts) are calculated once at an inflation factor of 1.
+    Each scenario rescales those columns by its monthly inflation factors, recalculates
+    year to date compensation and applies only the capped steps and steps depending on them.
+
+    Output
+    dataframe of all scenarios with a scenario column first, rows and columns of each
+    scenario as in a full replay, or a dict of rollup tables if grains are given
+    """
+    base_inputs = parse_base_inputs(actions["base_inputs"])
+    added_columns = actions["added_columns"]
+    reported = set()
+
+    def report_once(column, err):
+        if on_error is None:
+            raise err
+        if column.get("new_column_name") not in reported:
+            reported.add(column.get("new_column_name"))
+            on_error(column, err)
+
+    # Base and linear steps at a unit inflation factor (no inflation)
+    unit_months = generate_month_ranges(
+        base_inputs["start_date"],
+        base_inputs["end_date"],
+        0.0,
+        base_inputs["start_date"],
+        12,
+    )
+    base = build_forecast_base(
+        unit_months,
+        roster,
+        engine=engine,
+        compact=base_inputs.get("compact", False),
+    )
+    scaling = inflation_scaling(added_columns)
+    unit = apply_register_steps(
+        base,
+        [
+            column
+            for column in added_columns
+            if scaling[column["new_column_name"]] != "recompute"
+        ],
+        on_error=report_once,
+    )
+    scenario_steps = [
+        column
+        for column in added_columns
+        if scaling[column["new_column_name"]] == "recompute"
+    ]
+    linear_columns = [
+        column for column in unit.columns if scaling.get(column) == "linear"
+    ]
+
+    forecasts = []
+    rollups = {}
+    for scenario in scenarios:
+        name = scenario_name(scenario)
+        console.log(f"Applying inflation scenario [blue]{name}[/blue]...")
+        month_ranges = generate_month_ranges(
+            base_inputs["start_date"],
+            base_inputs["end_date"],
+            scenario["infl_rate"],
+            scenario["infl_start"],
+            scenario["infl_freq"],
+        )
+
+        forecast = rescale_inflation(unit, month_ranges, linear_columns)
+        forecast = calculate_ytd_compensation(forecast)
+        forecast = apply_register_steps(forecast, scenario_steps, on_error=report_once)
+
+        # Column order of a full replay: base columns, then steps in register order
+        step_columns = [
+            column["new_column_name"]
+            for column in added_columns
+            if column["new_column_name"] in forecast.columns
+            and column["new_column_name"] not in base.columns
+        ]
+        forecast = forecast.select(
+            pl.lit(name).alias("scenario"), *base.columns, *step_columns
+        )
+
+        if grains is None:
+            forecasts.append(forecast)
+            continue
+        scenario_rollups = rollup_forecast(
+            forecast,
+            [
+                (period, ["scenario"] + list(dimensions))
+                for period, dimensions in grains
+            ],
+        )
+        for grain, table in scenario_rollups.items():
+            rollups.setdefault(grain, []).append(table)
+
+    console.log(
+        f"[green]Forecast swept over {len(scenarios)} inflation scenarios![/green]"
+    )
+
+    if grains is not None:
+        return {grain: pl.concat(tables) for grain, tables in rollups.items()}
+    return pl.concat(forecasts)
@@ -0,0 +1,182 @@
+# profiling.py
+import json
+import os
+import sys
+import time
+
+import polars as pl
+from rich.table import Table
+from rich import box
+
+from forecast.utilities import console
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is then not reported
+    resource = None
+
+# Set to 1 to print a stage profile after forecasts are built in the TUI
+PROFILE_ENV_VAR = "FORECAST_PROFILE"
+
+
+def profiling_enabled():
+    """True if stage profiling was switched on with the FORECAST_PROFILE environment variable"""
+    return os.environ.get(PROFILE_ENV_VAR, "").strip().lower() in ("1", "true", "yes")
+
+
+def rss_bytes():
+    """Current resident set size of this process, None where /proc is not available"""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process since the last reset (see reset_peak_rss).
+
+    Linux reports it as VmHWM, which the reset clears. Elsewhere only the peak since the
+    process started is known, it is never lower than that of an earlier stage.
+    """
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss():
+    """
+    Reset VmHWM to the current RSS so peak_rss_bytes covers only the next stage (Linux
+    only, ignored elsewhere)
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def frame_rows(frame):
+    """Rows of a dataframe, None for lazyframes and other inputs"""
+    return frame.height if isinstance(frame, pl.DataFrame) else None
+
+
+def frame_bytes(frame):
+    """Estimated size of a dataframe, None for lazyframes and other inputs"""
+    return frame.estimated_size() if isinstance(frame, pl.DataFrame) else None
+
+
+def profile_stage(trace, stage, function, *args, **kwargs):
+    """
+    Call function(*args, **kwargs) and record it as a stage of trace.
+
+    Inputs
+    trace: list or None - stage records are appended to it, None disables profiling and the
+           function is called directly
+    stage: str - name of the stage
+    function: callable - the stage, its first argument is counted as the input rows
+
+    Rows and sizes are only known for dataframes. A stage on a lazyframe only builds the
+    plan, so its time is that of building the plan and its rows are None.
+
+    Output
+    return value of function
+    """
+    if trace is None:
+        return function(*args, **kwargs)
+
+    reset_peak_rss()
+    start = time.perf_counter()
+    output = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    trace.append(
+        {
+            "stage": stage,
+            "seconds": seconds,
+            "rows_in": frame_rows(args[0]) if args else None,
+            "rows_out": frame_rows(output),
+            "estimated_bytes": frame_bytes(output),
+            "rss_bytes": rss_bytes(),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+    )
+    return output
+
+
+def format_megabytes(value, decimals=1):
+    return "" if value is None else f"{value / 1024**2:,.{decimals}f}"
+
+
+def format_rows(value):
+    return "" if value is None else f"{value:,}"
+
+
+def print_trace(trace, title="Forecast Profile"):
+    """
+    Print a table of the stages of a trace with a total of their wall time
+    """
+    table = Table(title=title, box=box.ROUNDED, style="bold cyan")
+    table.add_column("Stage", justify="left", style="white")
+    table.add_column("Seconds", justify="right", style="yellow")
+    table.add_column("Rows in", justify="right", style="yellow")
+    table.add_column("Rows out", justify="right", style="yellow")
+    table.add_column("Size MB", justify="right", style="yellow")
+    table.add_column("Peak RSS MB", justify="right", style="yellow")
+
+    for stage in trace:
+        table.add_row(
+            stage["stage"],
+            f"{stage['seconds']:.3f}",
+            format_rows(stage["rows_in"]),
+            format_rows(stage["rows_out"]),
+            format_megabytes(stage["estimated_bytes"]),
+            format_megabytes(stage["peak_rss_bytes"], 0),
+        )
+    table.add_row(
+        "[bold]Total[/bold]",
+        f"[bold]{sum(stage['seconds'] for stage in trace):.3f}[/bold]",
+        "",
+        "",
+        "",
+        "",
+    )
+
+    console.print(table)
+
+
+def write_trace(traces, trace_path):
+    """
+    Write traces as json, a dict of run name -> list of stage records
+
+    Output
+    dict written to trace_path
+    """
+    document = {
+        "polars": pl.__version__,
+        "threads": pl.thread_pool_size(),
+        "runs": [
+            {
+                "run": name,
+                "seconds": sum(stage["seconds"] for stage in trace),
+                "stages": trace,
+            }
+            for name, trace in traces.items()
+        ],
+    }
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=4)
+
+    return document
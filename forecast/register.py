@@ -0,0 +1,716 @@
+# register.py
+import os
+import sys
+from datetime import datetime
+from functools import lru_cache
+
+import polars as pl
+
+import forecast.base
+import forecast.calculations
+import forecast.utilities
+from forecast.base import build_forecast_base, generate_forecast_base
+from forecast.cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    cache_key,
+    code_digest,
+    file_digest,
+    read_cached_frame,
+    write_cached_frame,
+)
+from forecast.calculations import (
+    PER_HEAD_WINDOW,
+    YEAR_TO_DATE_WINDOW,
+    rate_forecast,
+    capped_rate_forecast,
+    capped_cumulative_forecast,
+    per_head_forecast,
+    validate_rate_inputs,
+    validate_capped_rate_inputs,
+    validate_capped_cumulative_inputs,
+    validate_per_head_inputs,
+    rate_expression,
+    capped_rate_expression,
+    running_total_expression,
+    running_total_order,
+    primary_role_expression,
+    per_head_expression,
+)
+from forecast.profiling import profile_stage
+from forecast.utilities import (
+    ROSTER_CACHE_VERSION,
+    ROSTER_COLUMNS,
+    ROSTER_SCHEMA_OVERRIDES,
+    complete_dates,
+    console,
+    generate_month_ranges,
+)
+
+# Cached step outputs are keyed on the code of the base and the calculations, bump to
+# also invalidate them for a change outside that code (e.g. in polars)
+STEP_CACHE_VERSION = 2
+
+# Entries every step of each column type needs, which of them are numbers and which
+# name columns
+STEP_FIELDS = {
+    "flat_rate": ["base_column", "new_column_name", "applied_rate"],
+    "capped_rate": [
+        "base_column",
+        "new_column_name",
+        "applied_rate",
+        "cap_base_column",
+        "cap_amount",
+    ],
+    "capped_cumulative": [
+        "base_column",
+        "new_column_name",
+        "applied_rate",
+        "cap_amount",
+    ],
+    "per_head": ["new_column_name", "amount"],
+}
+NUMERIC_STEP_FIELDS = ["applied_rate", "cap_amount", "amount"]
+COLUMN_NAME_FIELDS = ["base_column", "cap_base_column", "new_column_name"]
+
+# Entries of the base inputs of every register, by the check they need
+BASE_DATE_FIELDS = ["start_date", "end_date", "inflation_start"]
+BASE_NUMERIC_FIELDS = ["inflation_rate"]
+BASE_MONTH_FIELDS = ["inflation_freq"]
+
+# Schema of generate_month_ranges
+MONTH_RANGES_SCHEMA = {
+    "start_of_month": pl.Date,
+    "end_of_month": pl.Date,
+    "inflation_factor": pl.Float64,
+}
+
+
+def parse_base_inputs(base_inputs):
+    """
+    Convert the base_inputs of an action register into generate_forecast_base arguments
+
+    Input -> dict of base inputs as stored in the action register json
+    Output -> dict with roster_path, start_date, end_date, infl_rate, infl_start, infl_freq
+              and compact if the register uses compact data types
+    """
+    inputs = {
+        "roster_path": base_inputs["roster_file"],
+        "start_date": datetime.strptime(base_inputs["start_date"], "%Y-%m-%d").date(),
+        "end_date": datetime.strptime(base_inputs["end_date"], "%Y-%m-%d").date(),
+        "infl_rate": base_inputs["inflation_rate"],
+        "infl_start": datetime.strptime(
+            base_inputs["inflation_start"], "%Y-%m-%d"
+        ).date(),
+        "infl_freq": base_inputs["inflation_freq"],
+    }
+    # Registers saved before compact data types were added have no compact entry
+    if base_inputs.get("compact"):
+        inputs["compact"] = True
+
+    return inputs
+
+
+def base_from_register(actions, roster, engine="interval", trace=None):
+    """
+    Build the forecast base described by an action register from an already loaded roster.
+
+    Inputs
+    actions: dict - action register with base_inputs
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    engine: forecast base engine passed to build_forecast_base
+    trace: list to record the time, rows and memory of every stage in, None to not profile
+
+    Output
+    forecast base (lazy if roster is lazy)
+    """
+    base_inputs = parse_base_inputs(actions["base_inputs"])
+    month_ranges = profile_stage(
+        trace,
+        "generate_month_ranges",
+        generate_month_ranges,
+        base_inputs["start_date"],
+        base_inputs["end_date"],
+        base_inputs["infl_rate"],
+        base_inputs["infl_start"],
+        base_inputs["infl_freq"],
+    )
+    return build_forecast_base(
+        month_ranges,
+        roster,
+        engine=engine,
+        compact=base_inputs.get("compact", False),
+        trace=trace,
+    )
+
+
+def apply_register_step(forecast, column):
+    """
+    Add one column described by an action register entry to the forecast.
+
+    Inputs
+    forecast: dataframe or lazyframe - current forecast
+    column: dict - entry of the register's added_columns
+
+    Output
+    forecast with the new column added, raises ValueError if the step cannot be applied
+    """
+    if column["type"] == "flat_rate":
+        return rate_forecast(
+            forecast,
+            base_column=column["base_column"],
+            new_column_name=column["new_column_name"],
+            applied_rate=column["applied_rate"],
+        )
+
+    elif column["type"] == "capped_rate":
+        return capped_rate_forecast(
+            forecast,
+            base_column=column["base_column"],
+            new_column_name=column["new_column_name"],
+            applied_rate=column["applied_rate"],
+            cap_base_column=column["cap_base_column"],
+            cap_amount=column["cap_amount"],
+        )
+
+    elif column["type"] == "capped_cumulative":
+        return capped_cumulative_forecast(
+            forecast,
+            [
+                {
+                    "base_column": column["base_column"],
+                    "new_column_name": column["new_column_name"],
+                    "applied_rate": column["applied_rate"],
+                    "cap_amount": column["cap_amount"],
+                }
+            ],
+        )
+
+    elif column["type"] == "per_head":
+        return per_head_forecast(
+            forecast,
+            new_column_name=column["new_column_name"],
+            amount=column["amount"],
+        )
+
+    raise ValueError(
+        f"\nUnknown column type: {column['type']}\nNo forecast will be added\n"
+    )
+
+
+def compile_register(added_columns, schema, on_error=None):
+    """
+    Compile the added_columns of an action register into as few projections as possible.
+
+    Every step is validated once against the schema it would see when replayed in order.
+    Steps are then placed in stages: a step goes in the first stage after the stages that
+    produce the columns it reads, so independent columns share one with_columns. Per head
+    steps use the base's primary_role flag, or else a primary role window (see
+    primary_role_expression) computed once and shared. Capped cumulative steps on the same base column share one running total.
+
+    Inputs
+    added_columns: list of dict - the register's added_columns
+    schema: schema (column name -> dtype) of the forecast the register is applied to
+    on_error: callable(column, error) called for a step that cannot be applied,
+              which is then skipped. If None the ValueError is raised.
+
+    Output
+    dict with "stages" (list of lists of expressions), "temporary" (helper columns to drop
+    after the last stage) and "schema" (schema of the resulting forecast)
+    """
+    schema = dict(schema)
+    stages = []
+    temporary = []
+    # Stage of the last expression writing each column and latest stage reading that version
+    written_in = {}
+    read_in = {}
+    # Count writes per column so a shared window is rebuilt if one of its inputs changes
+    versions = {}
+    windows = {}
+    running_totals = {}
+
+    def place(expression, reads, writes):
+        stage = max(
+            [written_in[column] + 1 for column in reads if column in written_in] + [0]
+        )
+        if writes in written_in:
+            stage = max(stage, written_in[writes] + 1)
+        # Overwriting a column must not happen before the previous version has been read
+        stage = max(stage, read_in.pop(writes, 0))
+
+        while len(stages) <= stage:
+            stages.append([])
+        stages[stage].append(expression)
+
+        for column in reads:
+            read_in[column] = max(read_in.get(column, 0), stage)
+        written_in[writes] = stage
+        versions[writes] = versions.get(writes, 0) + 1
+        schema[writes] = (
+            pl.LazyFrame(schema=schema).select(expression).collect_schema()[writes]
+        )
+
+    for column in added_columns:
+        try:
+            if column["type"] == "flat_rate":
+                validate_rate_inputs(schema, column["base_column"])
+                place(
+                    rate_expression(
+                        column["base_column"],
+                        column["new_column_name"],
+                        column["applied_rate"],
+                    ),
+                    [column["base_column"]],
+                    column["new_column_name"],
+                )
+
+            elif column["type"] == "capped_rate":
+                validate_capped_rate_inputs(
+                    schema, column["base_column"], column["cap_base_column"]
+                )
+                place(
+                    capped_rate_expression(
+                        column["base_column"],
+                        column["new_column_name"],
+                        column["applied_rate"],
+                        column["cap_base_column"],
+                        column["cap_amount"],
+                    ),
+                    [column["base_column"], column["cap_base_column"]],
+                    column["new_column_name"],
+                )
+
+            elif column["type"] == "capped_cumulative":
+                validate_capped_cumulative_inputs(schema, [column])
+                order_by = running_total_order(schema)
+                total_inputs = [column["base_column"]] + YEAR_TO_DATE_WINDOW + order_by
+                total_key = tuple(
+                    [column["base_column"]]
+                    + [versions.get(name, 0) for name in total_inputs]
+                )
+                if total_key not in running_totals:
+                    running_totals[total_key] = f"__ytd_{len(running_totals)}"
+                    temporary.append(running_totals[total_key])
+                    place(
+                        running_total_expression(column["base_column"], order_by).alias(
+                            running_totals[total_key]
+                        ),
+                        total_inputs,
+                        running_totals[total_key],
+                    )
+                place(
+                    capped_rate_expression(
+                        column["base_column"],
+                        column["new_column_name"],
+                        column["applied_rate"],
+                        running_totals[total_key],
+                        column["cap_amount"],
+                    ),
+                    [column["base_column"], running_totals[total_key]],
+                    column["new_column_name"],
+                )
+
+            elif column["type"] == "per_head":
+                validate_per_head_inputs(schema)
+
+                # Use the base's primary role flag while its inputs are unchanged
+                if "primary_role" in schema and not any(
+                    name in versions
+                    for name in ["primary_role", "proration"] + PER_HEAD_WINDOW
+                ):
+                    place(
+                        per_head_expression(
+                            column["new_column_name"],
+                            column["amount"],
+                            primary_role="primary_role",
+                        ),
+                        ["inflation_factor", "primary_role"],
+                        column["new_column_name"],
+                    )
+                    continue
+
+                window_inputs = ["proration"] + PER_HEAD_WINDOW
+                if "Role ID" in schema:
+                    window_inputs.append("Role ID")
+                window_key = tuple(versions.get(name, 0) for name in window_inputs)
+                if window_key not in windows:
+                    windows[window_key] = f"__primary_role_{len(windows)}"
+                    temporary.append(windows[window_key])
+                    place(
+                        primary_role_expression(schema).alias(windows[window_key]),
+                        window_inputs,
+                        windows[window_key],
+                    )
+                place(
+                    per_head_expression(
+                        column["new_column_name"],
+                        column["amount"],
+                        windows[window_key],
+                    ),
+                    ["inflation_factor", windows[window_key]],
+                    column["new_column_name"],
+                )
+
+            else:
+                raise ValueError(
+                    f"\nUnknown column type: {column['type']}\nNo forecast will be added\n"
+                )
+        except ValueError as err:
+            if on_error is None:
+                raise
+            on_error(column, err)
+
+    for name in temporary:
+        schema.pop(name)
+
+    return {"stages": stages, "temporary": temporary, "schema": schema}
+
+
+def apply_compiled_register(forecast, compiled):
+    """
+    Apply a register compiled by compile_register: one with_columns per stage, then
+    restore the column order of a step by step replay and drop helper columns
+    """
+    for stage in compiled["stages"]:
+        forecast = forecast.with_columns(stage)
+
+    return forecast.select(list(compiled["schema"]))
+
+
+def apply_register_steps(forecast, added_columns, on_error=None, trace=None):
+    """
+    Add all columns of an action register to the forecast.
+
+    The register is compiled against the forecast schema first, so every step is validated
+    before any is applied and independent steps are computed in the same projection.
+    With a trace each step is compiled and applied on its own instead, so its time, rows and
+    memory can be recorded.
+
+    Inputs
+    forecast: dataframe or lazyframe - current forecast
+    added_columns: list of dict - the register's added_columns
+    on_error: callable(column, error) called for a step that cannot be applied,
+              which is then skipped. If None the ValueError is raised.
+    trace: list to record every step in, None to not profile
+
+    Output
+    forecast with all applicable columns added
+    """
+    if trace is not None:
+        for column in added_columns:
+            forecast = profile_stage(
+                trace,
+                f"step {column.get('new_column_name')}",
+                apply_register_steps,
+                forecast,
+                [column],
+                on_error=on_error,
+            )
+        return forecast
+
+    compiled = compile_register(
+        added_columns, forecast.collect_schema(), on_error=on_error
+    )
+
+    return apply_compiled_register(forecast, compiled)
+
+
+def forecast_base_schema(engine="interval", compact=False):
+    """
+    Schema of the forecast base, inferred from an empty roster and month ranges so no
+    file is read and no rows are processed
+    """
+    roster = complete_dates(
+        pl.LazyFrame(
+            schema={
+                column: ROSTER_SCHEMA_OVERRIDES.get(column, pl.Date)
+                for column in ROSTER_COLUMNS
+            }
+        )
+    )
+    month_ranges = pl.DataFrame(schema=MONTH_RANGES_SCHEMA)
+
+    return build_forecast_base(
+        month_ranges, roster, engine=engine, compact=compact
+    ).collect_schema()
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_base_inputs(base_inputs):
+    """
+    Check every entry of the base_inputs of an action register separately
+
+    Output -> list of str, every error found
+    """
+    if not isinstance(base_inputs, dict):
+        return ["Base inputs: must be an object of base inputs"]
+
+    errors = []
+    roster_file = base_inputs.get("roster_file")
+    if roster_file is None:
+        errors.append("Base inputs: 'roster_file' is missing")
+    elif not isinstance(roster_file, str) or not os.path.exists(roster_file):
+        errors.append(f"Base inputs: roster file '{roster_file}' not found")
+
+    for field in BASE_DATE_FIELDS:
+        if field not in base_inputs:
+            errors.append(f"Base inputs: '{field}' is missing")
+            continue
+        try:
+            datetime.strptime(base_inputs[field], "%Y-%m-%d")
+        except (TypeError, ValueError) as err:
+            errors.append(f"Base inputs: {field}: {str(err).strip()}")
+
+    for field in BASE_NUMERIC_FIELDS:
+        if field not in base_inputs:
+            errors.append(f"Base inputs: '{field}' is missing")
+        elif not is_number(base_inputs[field]):
+            errors.append(f"Base inputs: '{field}' must be a number")
+
+    for field in BASE_MONTH_FIELDS:
+        if field not in base_inputs:
+            errors.append(f"Base inputs: '{field}' is missing")
+        elif not (
+            is_number(base_inputs[field])
+            and isinstance(base_inputs[field], int)
+            and base_inputs[field] > 0
+        ):
+            errors.append(
+                f"Base inputs: '{field}' must be a positive whole number of months"
+            )
+
+    return errors
+
+
+def validate_register(actions, engine="interval"):
+    """
+    Check an action register before anything is computed.
+
+    Every base input is checked on its own and the roster file must exist. Each step is
+    then checked against the schema the forecast would have when the step is replayed,
+    starting from the inferred base schema (see forecast_base_schema): it must be an
+    object of a known type, its entries present, column names strings, rates and amounts
+    numbers, and the columns it reads must exist and be numeric. A new column that
+    already exists is overwritten, as in a replay. Steps with an error are left out of
+    the schema, as a replay would skip them.
+
+    Inputs
+    actions: action register as loaded from json
+    engine: forecast base engine the register will be replayed with
+
+    Output
+    list of str - every error found, empty if the register can be replayed
+    """
+    if not isinstance(actions, dict):
+        return ["Action register: must be an object with base_inputs and added_columns"]
+
+    errors = validate_base_inputs(actions.get("base_inputs"))
+
+    compact = isinstance(actions.get("base_inputs"), dict) and bool(
+        actions["base_inputs"].get("compact")
+    )
+    schema = dict(forecast_base_schema(engine=engine, compact=compact))
+
+    added_columns = actions.get("added_columns")
+    if not isinstance(added_columns, list):
+        errors.append("Action register: added_columns must be a list of steps")
+        added_columns = []
+
+    for position, column in enumerate(added_columns, start=1):
+        if not isinstance(column, dict):
+            errors.append(f"Step {position}: must be an object, not {column!r}")
+            continue
+        step = f"Step {position} ({column.get('new_column_name', 'unnamed')})"
+
+        if column.get("type") not in STEP_FIELDS:
+            errors.append(f"{step}: unknown column type: {column.get('type')}")
+            continue
+        missing = [
+            field for field in STEP_FIELDS[column["type"]] if field not in column
+        ]
+        if missing:
+            errors.append(f"{step}: missing {missing}")
+            continue
+        not_names = [
+            field
+            for field in COLUMN_NAME_FIELDS
+            if field in column and not isinstance(column[field], str)
+        ]
+        if not_names:
+            errors.append(f"{step}: {not_names} must be column names")
+            continue
+        not_numbers = [
+            field
+            for field in NUMERIC_STEP_FIELDS
+            if field in column and not is_number(column[field])
+        ]
+        if not_numbers:
+            errors.append(f"{step}: {not_numbers} must be numbers")
+            continue
+
+        schema = compile_register(
+            [column],
+            schema,
+            on_error=lambda column, err: errors.append(f"{step}: {str(err).strip()}"),
+        )["schema"]
+
+    return errors
+
+
+@lru_cache(maxsize=None)
+def calculation_digest():
+    """Digest of the code that builds the forecast base and calculates the steps"""
+    return code_digest(
+        forecast.base,
+        forecast.calculations,
+        forecast.utilities,
+        sys.modules[__name__],
+    )
+
+
+def step_cache_keys(actions, roster_digest, engine="interval"):
+    """
+    Cache keys of the forecast base and of every step of an action register.
+
+    The base key hashes the roster content, the base inputs (not the roster's path) and
+    the code of the calculations, each step key hashes the previous key and the step,
+    so it covers all previous steps.
+
+    Output -> base key and list of step keys in register order
+    """
+    base_inputs = {
+        name: value
+        for name, value in actions["base_inputs"].items()
+        if name != "roster_file"
+    }
+    base_key = cache_key(
+        "register_base",
+        STEP_CACHE_VERSION,
+        ROSTER_CACHE_VERSION,
+        calculation_digest(),
+        roster_digest,
+        base_inputs,
+        engine,
+    )
+
+    step_keys = []
+    previous_key = base_key
+    for column in actions["added_columns"]:
+        previous_key = cache_key("register_step", previous_key, column)
+        step_keys.append(previous_key)
+
+    return base_key, step_keys
+
+
+def replay_register(
+    actions,
+    cache_dir,
+    roster_path=None,
+    engine="interval",
+    on_error=None,
+    max_bytes=DEFAULT_CACHE_MAX_BYTES,
+    trace=None,
+):
+    """
+    Replay an action register, reusing the outputs of steps replayed before.
+
+    The forecast base and the column written by each step are stored as Arrow IPC in
+    cache_dir under the keys of step_cache_keys, so editing a step only recomputes that
+    step and the ones after it. Consecutive steps missing from the cache are compiled
+    and applied in one pass (see apply_register_steps), only the columns they leave in
+    the forecast are cached. Cached entries are memory-mapped and the cache is kept
+    below max_bytes by removing the least recently used entries, entries larger than
+    max_bytes are not cached.
+
+    Inputs
+    actions: dict - action register
+    cache_dir: str - directory of the cache, shared with the parsed roster cache
+    roster_path: str - roster used instead of the register's roster_file
+    engine: forecast base engine passed to build_forecast_base
+    on_error: callable(column, error) called for a step that cannot be applied,
+              which is then skipped. If None the ValueError is raised.
+    max_bytes: int - size limit of the cache directory
+    trace: list to record the base stages and every step in, None to not profile. Steps
+           served from the cache are recorded as "step <column> (cached)"
+
+    Output
+    forecast dataframe and the number of steps served from the cache
+    """
+    base_inputs = parse_base_inputs(actions["base_inputs"])
+    if roster_path is not None:
+        base_inputs["roster_path"] = roster_path
+    base_key, step_keys = step_cache_keys(
+        actions, file_digest(base_inputs["roster_path"]), engine
+    )
+
+    def cache_frame(key, frame):
+        try:
+            write_cached_frame(cache_dir, key, frame, max_bytes=max_bytes)
+        except OSError as err:
+            # A read-only or full cache directory only means outputs are computed again
+            console.log(
+                f"[yellow]Forecast could not be cached in {cache_dir}: {err}[/yellow]"
+            )
+
+    forecast = profile_stage(
+        trace, "read_cached_base", read_cached_frame, cache_dir, base_key
+    )
+    if forecast is None:
+        forecast = generate_forecast_base(
+            **base_inputs, engine=engine, cache_dir=cache_dir, trace=trace
+        )
+        cache_frame(base_key, forecast)
+
+    def replay_steps(forecast, steps):
+        """Apply (column, key) steps missing from the cache in one pass and cache them"""
+        if not steps:
+            return forecast
+
+        skipped = []
+
+        def skip(column, err):
+            if on_error is None:
+                raise err
+            skipped.append(column)
+            on_error(column, err)
+
+        forecast = apply_register_steps(
+            forecast, [column for column, _ in steps], on_error=skip, trace=trace
+        )
+
+        new_columns = [column["new_column_name"] for column, _ in steps]
+        for position, (column, key) in enumerate(steps):
+            # Skipped steps leave the forecast unchanged and are not cached, so they are
+            # reported again. A column overwritten later in the pass only holds its
+            # final value.
+            if any(column is skipped_column for skipped_column in skipped):
+                continue
+            if column["new_column_name"] in new_columns[position + 1 :]:
+                continue
+            cache_frame(key, forecast.select(column["new_column_name"]))
+
+        return forecast
+
+    cached_steps = 0
+    uncached = []
+    for column, key in zip(actions["added_columns"], step_keys):
+        cached = read_cached_frame(cache_dir, key)
+        if cached is None:
+            uncached.append((column, key))
+            continue
+
+        forecast = replay_steps(forecast, uncached)
+        uncached = []
+        forecast = profile_stage(
+            trace,
+            f"step {column['new_column_name']} (cached)",
+            lambda forecast: forecast.with_columns(cached.get_columns()),
+            forecast,
+        )
+        cached_steps += 1
+
+    forecast = replay_steps(forecast, uncached)
+
+    return forecast, cached_steps
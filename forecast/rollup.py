@@ -0,0 +1,174 @@
+# rollup.py
+import os
+
+import polars as pl
+
+from forecast.utilities import console
+
+ROLLUP_PERIODS = ["month", "quarter", "year"]
+ROLLUP_DIMENSIONS = ["Department", "Location", "Employment type"]
+
+# Numeric forecast columns that are inputs or running totals rather than amounts to add up
+NON_MEASURE_COLUMNS = [
+    "Role ID",
+    "Salary",
+    "Bonus",
+    "Commission",
+    "inflation_factor",
+    "proration",
+    "year",
+    "ytd_compensation",
+]
+
+# Measures counted at a point in time, reported for the last month of each period
+STOCK_MEASURES = ["headcount"]
+
+PERIOD_TRUNCATE = {"month": "1mo", "quarter": "1q", "year": "1y"}
+
+
+def default_grains(periods=ROLLUP_PERIODS, dimensions=ROLLUP_DIMENSIONS):
+    """Every period by each single dimension, e.g. ("quarter", ["Department"])"""
+    return [(period, [dimension]) for period in periods for dimension in dimensions]
+
+
+def grain_name(period, dimensions):
+    """File friendly name of a grain, e.g. quarter_by_employment_type"""
+    if not dimensions:
+        return period
+    return f"{period}_by_" + "_and_".join(
+        dimension.lower().replace(" ", "_") for dimension in dimensions
+    )
+
+
+def rollup_measures(schema):
+    """Numeric columns of a forecast that are summed in rollups, register columns included"""
+    return [
+        column
+        for column, dtype in schema.items()
+        if dtype.is_numeric() and column not in NON_MEASURE_COLUMNS
+    ]
+
+
+def period_label(period):
+    """Expression labelling the truncated period_start: a date, 2024-Q2 or 2024"""
+    if period == "quarter":
+        return pl.format(
+            "{}-Q{}",
+            pl.col("period_start").dt.year(),
+            pl.col("period_start").dt.quarter(),
+        )
+    if period == "year":
+        return pl.col("period_start").dt.year()
+    return pl.col("period_start")
+
+
+def rollup_forecast(forecast, grains=None, measures=None):
+    """
+    Aggregate a forecast to small summary tables at several grains.
+
+    Inputs
+    forecast: dataframe or lazyframe - forecast at the employee-month grain
+    grains: list of (period, dimensions) - period is "month", "quarter" or "year",
+            dimensions a list of columns, default every period by each of Department,
+            Location and Employment type
+    measures: list of str - columns to aggregate, default headcount, headcount change,
+              compensation and every register column
+
+    The forecast is aggregated once to months by all dimensions used in any grain, every
+    grain is then rolled up from that small table. Flows are summed over the period,
+    headcount is the headcount of the last month of the period.
+
+    Output
+    dict of grain name -> dataframe
+    """
+    forecast = forecast.lazy()
+    schema = forecast.collect_schema()
+    if grains is None:
+        grains = default_grains()
+    if measures is None:
+        measures = rollup_measures(schema)
+
+    unknown = [period for period, _ in grains if period not in PERIOD_TRUNCATE]
+    if unknown:
+        raise ValueError(f"\nUnknown rollup period(s): {unknown}\n")
+
+    dimensions = []
+    for _, grain_dimensions in grains:
+        dimensions += [
+            column for column in grain_dimensions if column not in dimensions
+        ]
+    missing = [
+        column
+        for column in ["start_of_month"] + dimensions + measures
+        if column not in schema
+    ]
+    if missing:
+        raise ValueError(
+            f"\nForecast could not be rolled up: column(s) {missing} not found.\n"
+        )
+
+    # Single grouped pass over the detail forecast
+    console.log("Rolling up forecast...")
+    cube = (
+        forecast.group_by(["start_of_month"] + dimensions)
+        .agg(pl.col(measures).sum())
+        .collect(streaming=True)
+        # Compact forecasts store dimensions as Enum, label them as text to sort
+        .with_columns(pl.col(pl.Categorical, pl.Enum).cast(pl.Utf8))
+    )
+
+    rollups = {}
+    for period, grain_dimensions in grains:
+        period_cube = cube.with_columns(
+            pl.col("start_of_month")
+            .dt.truncate(PERIOD_TRUNCATE[period])
+            .alias("period_start")
+        ).with_columns(
+            (
+                pl.col("start_of_month")
+                == pl.col("start_of_month").max().over("period_start")
+            ).alias("period_end")
+        )
+
+        rollups[grain_name(period, grain_dimensions)] = (
+            period_cube.group_by(["period_start"] + grain_dimensions)
+            .agg(
+                [
+                    (
+                        pl.col(measure).filter(pl.col("period_end")).sum()
+                        if measure in STOCK_MEASURES
+                        else pl.col(measure).sum()
+                    )
+                    for measure in measures
+                ]
+            )
+            .sort(["period_start"] + grain_dimensions, nulls_last=True)
+            .select(period_label(period).alias(period), *grain_dimensions, *measures)
+        )
+
+    console.log(f"[green]Rolled up forecast to {len(rollups)} tables![/green]")
+
+    return rollups
+
+
+def write_rollups(rollups, directory, export_format="csv"):
+    """
+    Write each rollup table to directory as grain_name.csv or grain_name.parquet
+
+    Output
+    list of file paths written
+    """
+    if export_format not in ("csv", "parquet"):
+        raise ValueError(f"\nUnknown export format: '{export_format}'\n")
+
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for name, table in rollups.items():
+        file_path = os.path.join(directory, f"{name}.{export_format}")
+        if export_format == "parquet":
+            table.write_parquet(file_path)
+        else:
+            table.write_csv(file_path)
+        written.append(file_path)
+
+    return written
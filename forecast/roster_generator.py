@@ -0,0 +1,128 @@
+# roster_generator.py
+from datetime import date
+
+import polars as pl
+
+from forecast.utilities import ROSTER_COLUMNS, ROSTER_DATE_FORMAT
+
+TITLES = [
+    "Analyst",
+    "Senior Analyst",
+    "Engineer",
+    "Senior Engineer",
+    "Manager",
+    "Director",
+    "Account Executive",
+    "Coordinator",
+]
+DEPARTMENTS = ["Admin", "Engineering", "Finance", "Marketing", "Operations", "Sales"]
+EMPLOYMENT_TYPES = ["Full time", "Full time", "Full time", "Part time", "Contractor"]
+LOCATIONS = ["US-NY", "US-PA", "US-CA", "US-TX", "Canada", "UK", "Germany"]
+BONUS_RATES = [0.0, 0.0, 0.05, 0.1, 0.2]
+
+# Hires are spread over these dates, weighted towards recent years
+FIRST_HIRE = date(2010, 1, 1)
+LAST_HIRE = date(2026, 12, 31)
+
+# Share of roles that are a later role (promotion, transfer) of the previous employee
+INTERNAL_MOVE_SHARE = 0.15
+# Share of employees still active in their last role
+ACTIVE_SHARE = 0.7
+
+
+def uniform(seed, stream):
+    """
+    Seeded pseudo random numbers in [0, 1), one per row, as an expression.
+
+    Hashing the row number keeps generation vectorized and reproducible for a given seed
+    (and Polars version) without any extra dependency. Each stream gives independent values.
+    """
+    return (
+        pl.int_range(pl.len(), dtype=pl.UInt64).hash(seed * 1_000 + stream)
+        % 1_000_000_007
+    ) / 1_000_000_007
+
+
+def pick(choices, seed, stream):
+    """Expression picking one of choices per row with equal probability"""
+    index = (uniform(seed, stream) * len(choices)).floor().cast(pl.UInt32)
+    return pl.lit(pl.Series(choices)).gather(index)
+
+
+def generate_roster(n_roles, seed=0):
+    """
+    Generate a synthetic roster with the columns of a roster csv.
+
+    Inputs
+    n_roles: int - number of roster rows
+    seed: int - the same seed always gives the same roster
+
+    About 15% of roles continue an employee's previous role the day after it ends, so
+    employees have one to several roles. Hires are weighted towards recent years, role
+    lengths range from three months to five years and about 70% of employees are still
+    active in their last role.
+
+    Output
+    dataframe with ROSTER_COLUMNS, dates as strings in the roster date format
+    """
+    hire_span = (LAST_HIRE - FIRST_HIRE).days
+
+    roster = (
+        pl.DataFrame({"Role ID": pl.int_range(1, n_roles + 1, eager=True)})
+        .with_columns(
+            new_employee=(pl.col("Role ID") == 1)
+            | (uniform(seed, 1) >= INTERNAL_MOVE_SHARE),
+            # Square root skews hire dates towards LAST_HIRE
+            hire_offset=(uniform(seed, 2).sqrt() * hire_span).cast(pl.Int32),
+            role_days=(90 + uniform(seed, 3) * 1_735).cast(pl.Int32),
+            still_active=uniform(seed, 4) < ACTIVE_SHARE,
+            salary=(40 + uniform(seed, 5) * 160).round() * 1_000,
+            Title=pick(TITLES, seed, 6),
+            Department=pick(DEPARTMENTS, seed, 7),
+            **{"Employment type": pick(EMPLOYMENT_TYPES, seed, 8)},
+            Location=pick(LOCATIONS, seed, 9),
+            Bonus=pick(BONUS_RATES, seed, 10),
+            commission_rate=(0.1 + uniform(seed, 11) * 0.2).round(2),
+        )
+        .with_columns(employee=pl.col("new_employee").cum_sum())
+    )
+
+    # Chain the roles of an employee: each starts the day after the previous one ends
+    roster = roster.with_columns(
+        start_offset=pl.col("hire_offset").first().over("employee")
+        + (pl.col("role_days").cum_sum() - pl.col("role_days")).over("employee"),
+        last_role=pl.col("Role ID") == pl.col("Role ID").max().over("employee"),
+    ).with_columns(
+        start=pl.lit(FIRST_HIRE) + pl.duration(days=pl.col("start_offset")),
+        end=pl.lit(FIRST_HIRE)
+        + pl.duration(days=pl.col("start_offset") + pl.col("role_days") - 1),
+    )
+
+    return roster.select(
+        pl.col("Role ID").cast(pl.Int32),
+        pl.format("EMP{}", pl.col("employee").cast(pl.Utf8).str.zfill(8)).alias(
+            "Employee ID"
+        ),
+        pl.format("Employee {}", pl.col("employee")).alias("Employee Name"),
+        "Title",
+        "Department",
+        "Employment type",
+        "Location",
+        pl.col("start").dt.strftime(ROSTER_DATE_FORMAT).alias("Start Date"),
+        pl.when(pl.col("last_role") & pl.col("still_active"))
+        .then(None)
+        .otherwise(pl.col("end").dt.strftime(ROSTER_DATE_FORMAT))
+        .alias("End Date"),
+        pl.col("salary").alias("Salary"),
+        "Bonus",
+        pl.when(pl.col("Department") == "Sales")
+        .then(pl.col("commission_rate"))
+        .otherwise(0.0)
+        .alias("Commission"),
+    ).select(ROSTER_COLUMNS)
+
+
+def write_roster(n_roles, path, seed=0):
+    """Generate a synthetic roster and write it as a roster csv, returns the path"""
+    generate_roster(n_roles, seed).write_csv(path)
+    return path
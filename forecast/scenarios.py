@@ -0,0 +1,154 @@
+# scenarios.py
+import polars as pl
+
+from forecast.register import base_from_register, apply_register_steps
+from forecast.utilities import console, complete_dates, get_roster
+
+SCENARIO_COLUMN = "scenario"
+# Real Employee ID while rows of several scenarios are computed together
+ORIGINAL_EMPLOYEE_ID = "__employee_id"
+# Joins scenario and Employee ID into a key that is unique across scenarios
+SCENARIO_SEPARATOR = "\x1f"
+
+
+def delta_frame(rows):
+    """Roster rows of a delta: a dataframe, or the path of a roster csv"""
+    if rows is None:
+        return None
+    if isinstance(rows, str):
+        return get_roster(rows)
+    return rows
+
+
+def apply_roster_delta(roster, delta):
+    """
+    Apply a scenario's changes to a roster.
+
+    Inputs
+    roster: dataframe - roster as returned by get_roster
+    delta: dict with any of
+        remove: list of Role IDs to drop
+        override: dataframe (or roster csv path) of Role ID and the columns to change,
+                  null values leave the roster value unchanged
+        add: dataframe (or roster csv path) of new roster rows
+
+    Output
+    roster of the scenario
+    """
+    remove = delta.get("remove") or []
+    override = delta_frame(delta.get("override"))
+    add = delta_frame(delta.get("add"))
+
+    scenario = roster.filter(~pl.col("Role ID").is_in(remove))
+    if override is not None:
+        scenario = complete_dates(
+            scenario.update(
+                override.drop(
+                    ["start_date_complete", "end_date_complete"], strict=False
+                ),
+                on="Role ID",
+            )
+        )
+    if add is not None:
+        scenario = pl.concat(
+            [scenario, complete_dates(add).select(scenario.columns)],
+            how="vertical_relaxed",
+        )
+
+    return scenario
+
+
+def touched_employees(roster, scenario_rosters):
+    """
+    Employee IDs whose roles differ between the roster and any scenario roster.
+
+    Base calculations and register steps work per employee (primary role, year to date
+    totals and caps), so an employee's rows are only shared if none of their roles change.
+    """
+    touched = set()
+    for scenario in scenario_rosters.values():
+        changed = pl.concat(
+            [
+                roster.join(scenario, on=roster.columns, how="anti", join_nulls=True),
+                scenario.join(roster, on=roster.columns, how="anti", join_nulls=True),
+            ]
+        )
+        touched.update(changed["Employee ID"].to_list())
+
+    return touched
+
+
+def roster_scenarios(actions, roster, scenarios, engine="interval", on_error=None):
+    """
+    Replay an action register for several versions of a roster in one pass.
+
+    Inputs
+    actions: dict - action register
+    roster: dataframe - base roster as returned by get_roster
+    scenarios: dict of scenario name -> delta (see apply_roster_delta), {} for the
+               base roster itself
+    engine: forecast base engine passed to build_forecast_base
+    on_error: callable(column, error) called for a step that cannot be applied,
+              which is then skipped. If None the ValueError is raised.
+
+    Employees whose roles are the same in every scenario are forecast once and shared.
+    The changed employees of every scenario are forecast together with them in a single
+    forecast base and register replay, their Employee ID made unique per scenario so
+    year to date totals, caps and primary roles never mix scenarios.
+
+    Output
+    dataframe of all scenarios with a scenario column first, each scenario with the rows
+    and columns of a full replay of its roster
+    """
+    scenario_rosters = {
+        name: apply_roster_delta(roster, delta) for name, delta in scenarios.items()
+    }
+    touched = touched_employees(roster, scenario_rosters)
+    console.log(
+        f"Forecasting {len(scenarios)} roster scenarios, "
+        f"{len(touched):,} employee(s) differ between them..."
+    )
+
+    # Shared employees once, then the changed employees of each scenario
+    is_touched = pl.col("Employee ID").is_in(list(touched))
+    combined = [
+        roster.filter(~is_touched).with_columns(
+            pl.lit(None, dtype=pl.Utf8).alias(SCENARIO_COLUMN),
+            pl.col("Employee ID").alias(ORIGINAL_EMPLOYEE_ID),
+        )
+    ]
+    for name, scenario_roster in scenario_rosters.items():
+        combined.append(
+            scenario_roster.filter(is_touched).with_columns(
+                pl.lit(name, dtype=pl.Utf8).alias(SCENARIO_COLUMN),
+                pl.col("Employee ID").alias(ORIGINAL_EMPLOYEE_ID),
+                (pl.lit(name + SCENARIO_SEPARATOR) + pl.col("Employee ID")).alias(
+                    "Employee ID"
+                ),
+            )
+        )
+
+    forecast = base_from_register(
+        actions, pl.concat(combined, how="vertical_relaxed"), engine=engine
+    )
+    forecast = apply_register_steps(
+        forecast, actions["added_columns"], on_error=on_error
+    ).with_columns(pl.col(ORIGINAL_EMPLOYEE_ID).alias("Employee ID"))
+    columns = [
+        column
+        for column in forecast.columns
+        if column not in (SCENARIO_COLUMN, ORIGINAL_EMPLOYEE_ID)
+    ]
+
+    shared = forecast.filter(pl.col(SCENARIO_COLUMN).is_null())
+    return pl.concat(
+        [
+            pl.concat(
+                [
+                    shared.with_columns(pl.lit(name).alias(SCENARIO_COLUMN)),
+                    forecast.filter(pl.col(SCENARIO_COLUMN) == name),
+                ]
+            ).select(SCENARIO_COLUMN, *columns)
+            for name in scenarios
+        ]
+    )
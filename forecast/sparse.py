@@ -0,0 +1,243 @@
+# sparse.py
+import polars as pl
+
+from forecast.base import add_year_column, build_forecast_base, present_columns
+from forecast.calculations import (
+    PER_HEAD_WINDOW,
+    YEAR_TO_DATE_WINDOW,
+    running_total_order,
+)
+from forecast.register import apply_register_step
+from forecast.rollup import default_grains, rollup_forecast, rollup_measures
+from forecast.utilities import console
+
+
+def month_offset(first_month):
+    """Expression for the number of months from first_month to start_of_month"""
+    month = pl.col("start_of_month")
+    return (
+        month.dt.year().cast(pl.Int32) * 12
+        + month.dt.month().cast(pl.Int32)
+        - (first_month.year * 12 + first_month.month)
+    )
+
+
+def to_sparse(base, month_ranges, role_columns):
+    """
+    Store a forecast base as a sparse roles by months matrix in compressed sparse row form.
+
+    Inputs
+    base: dataframe or lazyframe - forecast at the role-month grain
+    month_ranges: dataframe - month ranges the base was built from
+    role_columns: list of str - columns describing a role (the roster columns)
+
+    Output
+    dict with
+        roles: dataframe of the role columns, one row per active Role ID in Role ID order
+        months: dataframe of the month columns (month ranges and year), one row per month
+        indptr: Int64 series, the months of role i are entries indptr[i] to indptr[i + 1]
+        indices: Int32 series, month offset (row of months) of every entry
+        values: dict of column name -> series with the value of every entry
+        columns: column order of the forecast, restored by to_long
+    """
+    base = base.lazy().sort(["Role ID", "start_of_month"]).collect()
+    schema = base.collect_schema()
+    role_columns = present_columns(base, role_columns)
+    month_columns = present_columns(base, month_ranges.columns + ["year"])
+
+    months = add_year_column(month_ranges.sort("start_of_month")).select(
+        pl.col(column).cast(schema[column]) for column in month_columns
+    )
+    roles = base.select(role_columns).unique(
+        "Role ID", keep="first", maintain_order=True
+    )
+    counts = base.group_by("Role ID", maintain_order=True).len()["len"]
+
+    return {
+        "roles": roles,
+        "months": months,
+        "indptr": pl.concat(
+            [pl.Series([0], dtype=pl.Int64), counts.cum_sum().cast(pl.Int64)]
+        ),
+        "indices": base.select(
+            month_offset(months["start_of_month"][0]).alias("month")
+        ).to_series(),
+        "values": {
+            column: base[column]
+            for column in base.columns
+            if column not in role_columns and column not in month_columns
+        },
+        "columns": base.columns,
+    }
+
+
+def build_sparse_base(month_ranges, roster, engine="interval"):
+    """
+    Build the forecast base (see build_forecast_base) as a sparse roles by months matrix.
+
+    Role and month columns are stored once per role and month instead of on every
+    role-month row, only proration, headcount, compensation and register columns have a
+    value per entry.
+
+    Output
+    sparse forecast, see to_sparse
+    """
+    base = build_forecast_base(month_ranges, roster, engine=engine)
+    console.log("Converting forecast base to a sparse matrix...")
+
+    return to_sparse(base, month_ranges, roster.collect_schema().names())
+
+
+def role_rows(sparse):
+    """Row of roles of every entry"""
+    counts = sparse["indptr"].diff().slice(1)
+    return (
+        pl.select(
+            pl.int_range(len(counts), dtype=pl.UInt32).repeat_by(counts).explode()
+        )
+        .to_series()
+        .drop_nulls()
+    )
+
+
+def sparse_frame(sparse, columns):
+    """
+    Dataframe with one row per entry and the given columns of the sparse forecast,
+    role and month columns are gathered from their single copy
+    """
+    rows = None
+    series = []
+    for column in columns:
+        if column in sparse["values"]:
+            series.append(sparse["values"][column])
+        elif column in sparse["months"].columns:
+            series.append(sparse["months"][column].gather(sparse["indices"]))
+        elif column in sparse["roles"].columns:
+            if rows is None:
+                rows = role_rows(sparse)
+            series.append(sparse["roles"][column].gather(rows))
+
+    return pl.DataFrame(series)
+
+
+def to_long(sparse):
+    """
+    Convert a sparse forecast back to a forecast at the role-month grain for export,
+    sorted by Role ID and month
+
+    Output
+    dataframe with the columns of the original forecast and every added column
+    """
+    return sparse_frame(sparse, sparse["columns"])
+
+
+def step_inputs(column):
+    """Columns an action register step reads"""
+    if column["type"] == "flat_rate":
+        return [column["base_column"]]
+    elif column["type"] == "capped_rate":
+        return [column["base_column"], column["cap_base_column"]]
+    elif column["type"] == "capped_cumulative":
+        return (
+            [column["base_column"]]
+            + YEAR_TO_DATE_WINDOW
+            + running_total_order(["Role ID"])
+        )
+    elif column["type"] == "per_head":
+        return ["proration", "inflation_factor", "primary_role"] + PER_HEAD_WINDOW
+    return []
+
+
+def apply_sparse_steps(sparse, added_columns, on_error=None):
+    """
+    Add all columns of an action register to a sparse forecast.
+
+    Each step is calculated on a frame of only the columns it reads and stored as a new
+    values series, so flat rates and per head amounts are single vectorized operations
+    over the entries.
+
+    Inputs
+    sparse: dict - sparse forecast, see to_sparse
+    added_columns: list of dict - the register's added_columns
+    on_error: callable(column, error) called for a step that cannot be applied,
+              which is then skipped. If None the ValueError is raised.
+
+    Output
+    sparse forecast with all applicable columns added
+    """
+    values = dict(sparse["values"])
+    columns = list(sparse["columns"])
+    sparse = dict(sparse, values=values, columns=columns)
+
+    for column in added_columns:
+        try:
+            frame = sparse_frame(sparse, step_inputs(column))
+            new_column = apply_register_step(frame, column)[column["new_column_name"]]
+        except ValueError as err:
+            if on_error is None:
+                raise
+            on_error(column, err)
+            continue
+
+        values[column["new_column_name"]] = new_column
+        if column["new_column_name"] not in columns:
+            columns.append(column["new_column_name"])
+
+    return sparse
+
+
+def sparse_rollups(sparse, grains=None, measures=None):
+    """
+    Aggregate a sparse forecast to summary tables, see rollup_forecast.
+
+    Entries are first summed by month and integer segment codes of the grain dimensions,
+    labels are only attached to the resulting small table.
+
+    Output
+    dict of grain name -> dataframe
+    """
+    if grains is None:
+        grains = default_grains()
+    if measures is None:
+        measures = rollup_measures(
+            {column: values.dtype for column, values in sparse["values"].items()}
+        )
+    dimensions = []
+    for _, grain_dimensions in grains:
+        dimensions += [
+            column for column in grain_dimensions if column not in dimensions
+        ]
+    missing = [column for column in measures if column not in sparse["values"]] + [
+        column for column in dimensions if column not in sparse["roles"].columns
+    ]
+    if missing:
+        raise ValueError(
+            f"\nForecast could not be rolled up: column(s) {missing} not found.\n"
+        )
+
+    # Segment code of every role, a single segment without dimensions
+    roles = sparse["roles"].select(pl.lit(0, dtype=pl.UInt32).alias("segment"))
+    segments = roles.head(1)
+    if dimensions:
+        roles = sparse["roles"].select(dimensions)
+        segments = roles.unique(maintain_order=True).with_row_index("segment")
+        roles = roles.join(segments, on=dimensions, how="left", join_nulls=True)
+
+    cube = (
+        pl.DataFrame(
+            [
+                roles["segment"].gather(role_rows(sparse)),
+                sparse["indices"].cast(pl.UInt32),
+                *[sparse["values"][measure] for measure in measures],
+            ]
+        )
+        .group_by(["segment", "month"])
+        .agg(pl.col(measures).sum())
+        .join(segments, on="segment")
+        .join(
+            sparse["months"].select("start_of_month").with_row_index("month"),
+            on="month",
+        )
+    )
+
+    return rollup_forecast(cube, grains, measures)
@@ -0,0 +1,102 @@
+# star.py
+import polars as pl
+
+from forecast.base import build_forecast_base, compact_forecast_base
+
+ROLE_KEY = "Role ID"
+MONTH_KEY = "start_of_month"
+
+# Roster columns the base calculations need, everything else stays in the role dimension
+FACT_ROSTER_COLUMNS = [
+    "Role ID",
+    "Employee ID",
+    "start_date_complete",
+    "end_date_complete",
+    "Salary",
+    "Bonus",
+    "Commission",
+]
+
+# Inputs of the base calculations that are not needed once the facts are computed
+FACT_INPUT_COLUMNS = [
+    "end_of_month",
+    "start_date_complete",
+    "end_date_complete",
+    "Salary",
+    "Bonus",
+    "Commission",
+]
+
+
+def build_star_forecast(
+    month_ranges, roster, engine="interval", compact=False, float32_money=False
+):
+    """
+    Build a forecast base as a narrow fact table plus role and month dimensions.
+
+    Inputs
+    month_ranges: dataframe - start_of_month, end_of_month and inflation_factor for every month
+    roster: dataframe or lazyframe - roster as returned by get_roster
+    engine, compact, float32_money: passed to build_forecast_base
+
+    The facts hold one row per role and active month with the keys (Role ID, start_of_month),
+    Employee ID and year for the per employee windows, inflation_factor, proration,
+    primary_role, headcount and compensation columns. The descriptive roster columns are
+    only stored once per role, so the calculations in calculations.py and register steps
+    on fact columns touch far fewer bytes.
+
+    Output
+    dict with "facts", "roles" (roster keyed by Role ID) and "months" (month_ranges)
+    """
+    facts = build_forecast_base(
+        month_ranges,
+        roster.select(FACT_ROSTER_COLUMNS),
+        engine=engine,
+        compact=compact,
+        float32_money=float32_money,
+    ).drop(FACT_INPUT_COLUMNS)
+
+    return {
+        "facts": facts,
+        "roles": compact_forecast_base(roster, float32_money) if compact else roster,
+        "months": month_ranges,
+    }
+
+
+def join_dimensions(star, facts=None):
+    """
+    Join the role and month attributes back onto the facts of a star forecast.
+
+    Inputs
+    star: dict - as returned by build_star_forecast
+    facts: dataframe or lazyframe - facts to use instead of star["facts"], e.g. with
+           register columns added
+
+    The join is lazy, so it only runs when the result is collected or exported, and the
+    columns are in the same order as in build_forecast_base followed by any added columns.
+
+    Output
+    lazyframe of the full forecast
+    """
+    facts = (star["facts"] if facts is None else facts).lazy()
+    months = star["months"].lazy()
+    roles = star["roles"].lazy()
+
+    fact_names = facts.collect_schema().names()
+    month_columns = months.collect_schema().names()
+    role_columns = roles.collect_schema().names()
+
+    # Attributes the facts do not carry already
+    month_attributes = [column for column in month_columns if column not in fact_names]
+    role_attributes = [column for column in role_columns if column not in fact_names]
+    fact_columns = [
+        column
+        for column in fact_names
+        if column not in month_columns and column not in role_columns
+    ]
+
+    return (
+        facts.join(months.select([MONTH_KEY] + month_attributes), on=MONTH_KEY)
+        .join(roles.select([ROLE_KEY] + role_attributes), on=ROLE_KEY)
+        .select(month_columns + role_columns + fact_columns)
+    )
@@ -4,7 +4,15 @@ import logging
 import polars as pl
 
 from polars.exceptions import ColumnNotFoundError, ComputeError
-from datetime import date, timedelta
+from datetime import date
+from forecast.cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    cache_key,
+    code_digest,
+    file_digest,
+    read_cached_frame,
+    write_cached_frame,
+)
 from rich.console import Console
 from rich.logging import RichHandler
 
@@ -35,6 +43,116 @@ def increase_date(start_date, months):
     return new_date
 
 
+def generate_calendar(
+    start_date,
+    end_date,
+    inflation_rate,
+    inflation_date,
+    inflation_frequency,
+    interval="1mo",
+):
+    """Creates a calendar of periods with applicable inflation factor
+
+    Positional arguments:
+    start_date -- date in the first period
+    end_date -- date in the last period
+    inflation_rate -- rate by which inflation increases
+    inflation_date -- date when inflation begins
+    inflation_frequency -- number of months between inflation incrementation
+
+    Keyword arguments:
+    interval -- length of each period as a polars duration string, e.g. "1mo", "1w", "1d"
+
+    Return value:
+    Polars DataFrame with columns start_of_period (date), end_of_period (date)
+    and inflation_factor (float)
+
+    Periods start at the period containing the start date and continue until the period
+    containing the end date. Inflation is compounded in the first period starting on or
+    after the inflation date, and again every inflation_frequency months after that.
+    Everything is built with columnar operations, so long horizons and fine grains are cheap.
+    """
+    if (
+        not isinstance(inflation_frequency, int)
+        or isinstance(inflation_frequency, bool)
+        or inflation_frequency < 1
+    ):
+        raise ValueError(
+            "\nInflation frequency must be a positive whole number of months, "
+            f"not {inflation_frequency!r}.\n"
+        )
+
+    # Every period start from the period containing start_date until end_date
+    first_start = pl.select(pl.lit(start_date).dt.truncate(interval)).item()
+    starts = pl.date_range(
+        first_start, end_date, interval, eager=True, closed="both"
+    ).alias("start_of_period")
+    n_periods = len(starts)
+
+    if n_periods == 0:
+        return pl.DataFrame(
+            schema={
+                "start_of_period": pl.Date,
+                "end_of_period": pl.Date,
+                "inflation_factor": pl.Float64,
+            }
+        )
+
+    # Dates at which inflation is due: the inflation date, then the first of the month
+    # every inflation_frequency months later. Each step uses one of these, so no more than
+    # one per period is needed, and none after the end date can apply.
+    months_to_end = (end_date.year - inflation_date.year) * 12 + (
+        end_date.month - inflation_date.month
+    )
+    n_later_dates = min(n_periods - 1, months_to_end // inflation_frequency)
+    due_dates = pl.Series("due_date", [inflation_date], dtype=pl.Date)
+    if n_later_dates > 0:
+        due_dates = due_dates.append(
+            pl.date_range(
+                increase_date(inflation_date, inflation_frequency),
+                increase_date(inflation_date, inflation_frequency * n_later_dates),
+                f"{inflation_frequency}mo",
+                eager=True,
+            ).alias("due_date")
+        )
+
+    # A step happens in the first period starting on or after its due date, and never
+    # more than once per period, so a late step pushes all following steps back.
+    # Step j lands in period j + max over i <= j of (first eligible period of i - i).
+    steps = (
+        starts.to_frame()
+        .select(pl.col("start_of_period").search_sorted(due_dates, side="left"))
+        .select(
+            (
+                pl.int_range(pl.len(), dtype=pl.Int64)
+                + (
+                    pl.col("start_of_period").cast(pl.Int64)
+                    - pl.int_range(pl.len(), dtype=pl.Int64)
+                ).cum_max()
+            ).alias("step_period")
+        )
+        .filter(pl.col("step_period") < n_periods)
+    )["step_period"]
+
+    calendar = starts.to_frame().with_columns(
+        # Last day of each period is the day before the next period starts
+        pl.col("start_of_period")
+        .dt.offset_by(interval)
+        .sub(pl.duration(days=1))
+        .alias("end_of_period"),
+        # Compound the rate in every period flagged as an inflation step
+        pl.when(pl.int_range(pl.len(), dtype=pl.Int64).is_in(steps))
+        .then(pl.lit(1.0 + inflation_rate))
+        .otherwise(pl.lit(1.0))
+        .cum_prod()
+        .alias("inflation_factor"),
+    )
+
+    logger.debug(f"Generated {n_periods} periods of {interval}")
+
+    return calendar
+
+
 def generate_month_ranges(
     start_date, end_date, inflation_rate, inflation_date, inflation_frequency
 ):
@@ -48,110 +166,152 @@ def generate_month_ranges(
     inflation_frequency -- number of months between inflation incrementation
 
     Return value:
-    List of tuples of (start of month: date, end of month: date, inflation factor: float)
+    Polars DataFrame with columns start_of_month (date), end_of_month (date)
+    and inflation_factor (float)
 
     Starting on in the month of the start date, finds the first and last day of month for
     every month until the month of the end date incrementing inflation if applicable.
-    Adds a tuple with start of month, end of month and inflation factor to a list.
-
     """
-    # Initialize the list of month ranges
-    month_ranges = []
-
-    # Start with the first month
-    current_date = start_date.replace(day=1)
-
-    # Set starting point for inflation factor
-    inflation_factor = 1.0
-
     console.log("Generating month ranges...")
 
-    while current_date <= end_date:
-        # Calculate the first day of the next month
-        if current_date.month == 12:
-            next_month = current_date.replace(year=current_date.year + 1, month=1)
-        else:
-            next_month = current_date.replace(month=current_date.month + 1)
+    month_ranges = generate_calendar(
+        start_date,
+        end_date,
+        inflation_rate,
+        inflation_date,
+        inflation_frequency,
+        interval="1mo",
+    ).rename({"start_of_period": "start_of_month", "end_of_period": "end_of_month"})
 
-        # Calculate the last day of the current month
-        end_of_month = next_month - timedelta(days=1)
+    console.log("[green]Month ranges generated successfully![/green]")
 
-        # Increment inflation if necessary
-        if current_date >= inflation_date:
-            inflation_factor *= 1.0 + inflation_rate
-            inflation_date = increase_date(inflation_date, inflation_frequency)
+    return month_ranges
 
-        # Append the month range to the list
-        month_ranges.append((current_date, end_of_month, inflation_factor))
 
-        # Log progress
-        logger.debug(f"Processed range: {current_date} - {end_of_month}")
+ROSTER_COLUMNS = [
+    "Role ID",
+    "Employee ID",
+    "Employee Name",
+    "Title",
+    "Department",
+    "Employment type",
+    "Location",
+    "Start Date",
+    "End Date",
+    "Salary",
+    "Bonus",
+    "Commission",
+]
 
-        # Move to the next month
-        current_date = next_month
+ROSTER_SCHEMA_OVERRIDES = {
+    "Role ID": pl.Int32,
+    "Employee ID": pl.Utf8,
+    "Employee Name": pl.Utf8,
+    "Title": pl.Utf8,
+    "Department": pl.Utf8,
+    "Employment type": pl.Utf8,
+    "Location": pl.Utf8,
+    "Salary": pl.Float64,
+    "Bonus": pl.Float64,
+    "Commission": pl.Float64,
+}
 
-    console.log("[green]Month ranges generated successfully![/green]")
+ROSTER_DATE_FORMAT = "%m/%d/%y"
 
-    return month_ranges
+# Cached rosters are keyed on the code of get_roster, bump to also invalidate them for a
+# change outside that code (e.g. in polars)
+ROSTER_CACHE_VERSION = 1
 
 
-def get_roster(data_path):
+def get_roster(data_path, lazy=False, cache_dir=None):
     """
     Reads in an input headcount roster from a .csv file fills missing start and end dates.
 
     Input -> path to headcount roster input (string)
-    Output -> Polars Dataframe of roster
+             lazy -> if True scan the file and return a LazyFrame so the read can be
+                     optimized together with the rest of the forecast plan
+             cache_dir -> if given, the cleaned roster is cached there as Arrow IPC keyed
+                          by file content and parse options, and reused while unchanged
+    Output -> Polars Dataframe (or LazyFrame) of roster
     """
-    console.log(f"Reading roster from [blue]{data_path}[/blue]...")
-    roster = pl.read_csv(
-        data_path,
-        try_parse_dates=True,
-        columns=[
-            "Role ID",
-            "Employee ID",
-            "Employee Name",
-            "Title",
-            "Department",
-            "Employment type",
-            "Location",
-            "Start Date",
-            "End Date",
-            "Salary",
-            "Bonus",
-            "Commission",
-        ],
-        schema_overrides={
-            "Role ID": pl.Int32,
-            "Employee ID": pl.Utf8,
-            "Employee Name": pl.Utf8,
-            "Title": pl.Utf8,
-            "Department": pl.Utf8,
-            "Employment type": pl.Utf8,
-            "Location": pl.Utf8,
-            "Salary": pl.Float64,
-            "Bonus": pl.Float64,
-            "Commission": pl.Float64,
-        },
-    )
+    if cache_dir is not None:
+        return get_cached_roster(data_path, cache_dir, lazy=lazy)
+
+    if lazy:
+        console.log(f"Scanning roster from [blue]{data_path}[/blue]...")
+        roster = pl.scan_csv(
+            data_path,
+            try_parse_dates=True,
+            schema_overrides=ROSTER_SCHEMA_OVERRIDES,
+        ).select(ROSTER_COLUMNS)
+    else:
+        console.log(f"Reading roster from [blue]{data_path}[/blue]...")
+        roster = pl.read_csv(
+            data_path,
+            try_parse_dates=True,
+            columns=ROSTER_COLUMNS,
+            schema_overrides=ROSTER_SCHEMA_OVERRIDES,
+        )
 
     # Convert start and end to dates
     roster = roster.with_columns(
         pl.col("Start Date").str.strptime(
-            pl.Date, format="%m/%d/%y", strict=False, exact=True
+            pl.Date, format=ROSTER_DATE_FORMAT, strict=False, exact=True
         ),
         pl.col("End Date").str.strptime(
-            pl.Date, format="%m/%d/%y", strict=False, exact=True
+            pl.Date, format=ROSTER_DATE_FORMAT, strict=False, exact=True
         ),
     )
 
-    # Set minimal start date
-    roster = roster.with_columns(
-        pl.col("Start Date").fill_null(date.min).alias("start_date_complete")
+    return complete_dates(roster)
+
+
+def complete_dates(roster):
+    """
+    Add start_date_complete and end_date_complete: the roster dates with a missing start
+    date as the minimal date and a missing end date as the maximal date
+    """
+    return roster.with_columns(
+        # Set minimal start date
+        pl.col("Start Date").fill_null(date.min).alias("start_date_complete"),
+        # Set maximal end date
+        pl.col("End Date").fill_null(date.max).alias("end_date_complete"),
     )
 
-    # Set maximal end date
-    roster = roster.with_columns(
-        pl.col("End Date").fill_null(date.max).alias("end_date_complete")
+
+def get_cached_roster(
+    data_path, cache_dir, lazy=False, max_bytes=DEFAULT_CACHE_MAX_BYTES
+):
+    """
+    Return the cleaned roster from the on-disk cache, parsing and storing it on a miss.
+
+    The key is the hash of the file content together with the parse options and the
+    parsing code, so an edited file (or a change in parsing) is never served from a
+    stale entry.
+    Cached rosters are memory-mapped Arrow IPC, the cache is kept below max_bytes by
+    removing the least recently used entries. If the entry cannot be written the parsed
+    roster is still returned.
+    """
+    key = cache_key(
+        "roster",
+        ROSTER_CACHE_VERSION,
+        code_digest(get_roster, complete_dates),
+        file_digest(data_path),
+        ROSTER_COLUMNS,
+        {column: str(dtype) for column, dtype in ROSTER_SCHEMA_OVERRIDES.items()},
+        ROSTER_DATE_FORMAT,
     )
 
-    return roster
+    roster = read_cached_frame(cache_dir, key, lazy=lazy)
+    if roster is not None:
+        console.log(f"Using cached roster for [blue]{data_path}[/blue]")
+        return roster
+
+    roster = get_roster(data_path)
+    try:
+        write_cached_frame(cache_dir, key, roster, max_bytes=max_bytes)
+    except OSError as err:
+        # A read-only or full cache directory only means the roster is parsed again
+        logger.warning(f"Roster could not be cached in {cache_dir}: {err}")
+
+    return roster.lazy() if lazy else roster
@@ -0,0 +1,91 @@
+# forecast_batch.py:
+
+import argparse
+import sys
+
+from cli.batch import run_batch, print_summary, write_summary, write_batch_trace
+from forecast.cache import DEFAULT_CACHE_DIR
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay saved action registers without any prompts."
+    )
+    parser.add_argument(
+        "registers", nargs="+", help="Action register json files to replay"
+    )
+    parser.add_argument(
+        "--roster",
+        default=None,
+        help="Roster csv used for every register instead of its saved roster_file",
+    )
+    parser.add_argument(
+        "--output", default=".", help="Directory the forecasts are written to"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Export format of the forecasts",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes replaying registers in parallel",
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Also write rollup tables by department, location and employment type",
+    )
+    parser.add_argument(
+        "--summary",
+        default=None,
+        help="Write a consolidated json summary of the run to this file",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Profile every stage and register step and write the json trace to this file",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help="Directory of the parsed roster cache",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always parse the roster file"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        results = run_batch(
+            args.registers,
+            args.output,
+            roster_path=args.roster,
+            export_format=args.format,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            workers=args.workers,
+            rollups=args.rollups,
+            profile=args.trace is not None,
+        )
+    except ValueError as e:
+        print(f"Batch could not be started:\n{e}")
+        return 2
+    print_summary(results)
+    if args.summary is not None:
+        write_summary(results, args.summary)
+    if args.trace is not None:
+        write_batch_trace(results, args.trace)
+
+    # Non-zero exit code so schedulers can detect failed registers
+    return 1 if any(result["error"] is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
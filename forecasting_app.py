@@ -30,7 +30,10 @@ def main():
                 print("\nPlease create a forecast base first.\n")
 
         elif choice == "forecast_from_file":
-            forecast, action_register = register_menu.forecast_from_file()
+            # None if the register or roster could not be replayed
+            replayed = register_menu.forecast_from_file()
+            if replayed is not None:
+                forecast, action_register = replayed
 
         elif choice == "export_forecast":
             # Ensure a forecast exists before proceeding
@@ -0,0 +1,113 @@
+import copy
+from datetime import date
+
+import pytest
+
+from forecast.roster_generator import write_roster
+from forecast.utilities import ROSTER_COLUMNS, generate_month_ranges, get_roster
+
+# An open ended full time role and a part time role ending at the end of June 2024
+ROSTER_ROWS = [
+    "1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,,60000,0.1,0",
+    "2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,06/30/24,80000,0,0.2",
+]
+
+BASE_INPUTS = {
+    "start_date": "2024-01-01",
+    "end_date": "2024-12-31",
+    "inflation_rate": 0.03,
+    "inflation_start": "2024-07-01",
+    "inflation_freq": 12,
+}
+
+# One step of every register column type, each reading the previous ones where it can
+REGISTER_STEPS = [
+    {
+        "type": "flat_rate",
+        "base_column": "compensation",
+        "new_column_name": "payroll_tax",
+        "applied_rate": 0.08,
+    },
+    {
+        "type": "capped_rate",
+        "base_column": "compensation",
+        "new_column_name": "ss_tax",
+        "applied_rate": 0.062,
+        "cap_base_column": "ytd_compensation",
+        "cap_amount": 168_600,
+    },
+    {
+        "type": "capped_cumulative",
+        "base_column": "payroll_tax",
+        "new_column_name": "capped_payroll",
+        "applied_rate": 0.5,
+        "cap_amount": 5_000,
+    },
+    {"type": "per_head", "new_column_name": "laptops", "amount": 50},
+]
+
+
+@pytest.fixture
+def roster_rows():
+    """Csv rows of the default roster, extend them for rosters with more roles"""
+    return list(ROSTER_ROWS)
+
+
+@pytest.fixture
+def write_roster_csv(tmp_path):
+    """Write roster csv rows (the default roster if None) under a name in tmp_path"""
+
+    def write(rows=None, name="roster.csv"):
+        path = tmp_path / name
+        path.write_text(
+            "\n".join([",".join(ROSTER_COLUMNS)] + (rows or ROSTER_ROWS)) + "\n"
+        )
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def roster_file(write_roster_csv):
+    return write_roster_csv()
+
+
+@pytest.fixture
+def roster(roster_file):
+    return get_roster(roster_file)
+
+
+@pytest.fixture
+def month_ranges():
+    """Months of 2024 with 3% inflation from July"""
+    return generate_month_ranges(
+        date(2024, 1, 1), date(2024, 12, 31), 0.03, date(2024, 7, 1), 12
+    )
+
+
+@pytest.fixture
+def register_steps():
+    return copy.deepcopy(REGISTER_STEPS)
+
+
+@pytest.fixture
+def make_register(roster_file):
+    """Action register over the default roster and 2024, base inputs can be replaced"""
+
+    def make(added_columns, **base_inputs):
+        inputs = dict(BASE_INPUTS, roster_file=roster_file)
+        inputs.update(base_inputs)
+        return {"base_inputs": inputs, "added_columns": added_columns}
+
+    return make
+
+
+@pytest.fixture
+def synthetic_roster(tmp_path):
+    """Parsed synthetic roster of n_roles roles, the same for the same seed"""
+
+    def generate(n_roles, seed=0):
+        path = tmp_path / f"synthetic_{n_roles}_{seed}.csv"
+        return get_roster(write_roster(n_roles, str(path), seed))
+
+    return generate
@@ -0,0 +1,80 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from forecast.aggregate import (
+    AMOUNT_COLUMNS,
+    aggregate_compensation,
+    generate_aggregate_forecast,
+)
+from forecast.base import build_forecast_base
+from forecast.utilities import generate_month_ranges
+
+# A role within February and a role starting and ending mid month
+EXTRA_ROWS = [
+    "3,125,Ann Lee,Analyst,Sales,Full-time,New York,02/10/24,02/20/24,50000,0,0",
+    "4,126,Bo Chan,Engineer,Engineering,Full-time,New York,05/16/24,11/10/24,70000,0.05,0",
+]
+
+MEASURES = AMOUNT_COLUMNS + ["compensation"]
+
+
+@pytest.fixture
+def roster_file(write_roster_csv, roster_rows):
+    return write_roster_csv(roster_rows + EXTRA_ROWS)
+
+
+def assert_matches_forecast_base(totals, month_ranges, roster, dimensions):
+    keys = ["start_of_month"] + dimensions
+    detail = (
+        build_forecast_base(month_ranges, roster)
+        .group_by(keys)
+        .agg(pl.col(MEASURES).sum())
+    )
+    # Segments without active roles in a month are only in the totals, as zeros
+    compared = totals.join(detail, on=keys, how="left", suffix="_detail").fill_null(0)
+
+    assert detail.height <= totals.height
+    assert_frame_equal(
+        compared.select(MEASURES),
+        compared.select(
+            pl.col(f"{measure}_detail").alias(measure) for measure in MEASURES
+        ),
+        check_exact=False,
+        rtol=1e-9,
+    )
+
+
+def test_aggregate_compensation(month_ranges, roster):
+    totals = aggregate_compensation(month_ranges, roster, ["Department"])
+
+    assert totals.height == 24
+    assert_matches_forecast_base(totals, month_ranges, roster, ["Department"])
+
+
+def test_aggregate_compensation_matches_forecast_base(synthetic_roster):
+    roster = synthetic_roster(2_000, seed=5)
+    month_ranges = generate_month_ranges(
+        date(2022, 7, 1), date(2026, 6, 30), 0.03, date(2023, 1, 1), 12
+    )
+
+    for dimensions in [[], ["Department", "Location"]]:
+        totals = aggregate_compensation(month_ranges, roster.lazy(), dimensions)
+        assert_matches_forecast_base(totals, month_ranges, roster, dimensions)
+
+
+def test_generate_aggregate_forecast(roster_file):
+    totals = generate_aggregate_forecast(
+        roster_file,
+        date(2024, 1, 1),
+        date(2024, 12, 31),
+        0.03,
+        date(2024, 7, 1),
+        12,
+    )
+
+    headcount_columns = ["start_of_month", "headcount", "headcount_change"]
+    assert totals.columns == headcount_columns + MEASURES
+    assert totals["headcount"].to_list()[:3] == [2, 2, 2]
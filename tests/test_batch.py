@@ -0,0 +1,129 @@
+import json
+import os
+
+import polars as pl
+import pytest
+
+from cli.batch import output_stems, run_batch, write_summary
+
+LAPTOPS = [{"type": "per_head", "new_column_name": "laptops", "amount": 50}]
+
+
+def write_register(path, register):
+    path.write_text(json.dumps(register))
+    return str(path)
+
+
+def test_run_batch(tmp_path, roster_file, make_register):
+    output = tmp_path / "out"
+    taxes = {
+        "type": "flat_rate",
+        "base_column": "missing",
+        "new_column_name": "taxes",
+        "applied_rate": 0.1,
+    }
+
+    # The shared roster replaces the registers' own roster files
+    registers = [
+        write_register(
+            tmp_path / "base.json", make_register(LAPTOPS, roster_file="not_used.csv")
+        ),
+        write_register(
+            tmp_path / "taxes.json", make_register([taxes], roster_file="not_used.csv")
+        ),
+    ]
+
+    results = run_batch(registers, str(output), roster_path=roster_file, cache_dir=None)
+
+    assert results[0]["error"] is None
+    # 12 months for the open ended role, 6 for the role ending in June
+    assert results[0]["rows"] == 18
+    # Registers are validated before anything is replayed
+    assert results[1]["rows"] is None
+    assert results[1]["error"].startswith("ValueError")
+    assert "Step 1 (taxes)" in results[1]["error"]
+    assert not (output / "taxes_forecast.csv").exists()
+
+    forecast = pl.read_csv(output / "base_forecast.csv")
+    assert forecast.height == 18
+    assert "laptops" in forecast.columns
+
+
+def test_run_batch_rollups(tmp_path, make_register):
+    register = write_register(tmp_path / "base.json", make_register([]))
+
+    results = run_batch([register], str(tmp_path / "out"), cache_dir=None, rollups=True)
+
+    rollups = pl.read_csv(
+        tmp_path / "out" / "base_forecast_rollups" / "year_by_department.csv"
+    )
+    assert results[0]["rollups"].endswith("base_forecast_rollups")
+    assert rollups["Department"].to_list() == ["Engineering", "Sales"]
+
+
+def test_run_batch_parallel_matches_sequential(tmp_path, make_register):
+    registers = [
+        write_register(tmp_path / f"scenario_{index}.json", make_register(LAPTOPS))
+        for index in range(3)
+    ]
+
+    sequential = run_batch(registers, str(tmp_path / "seq"), cache_dir=None)
+    parallel = run_batch(registers, str(tmp_path / "par"), cache_dir=None, workers=2)
+
+    assert [result["register"] for result in parallel] == registers
+    assert [result["rows"] for result in parallel] == [
+        result["rows"] for result in sequential
+    ]
+    sort_cols = ["Role ID", "start_of_month"]
+    assert (
+        pl.read_csv(tmp_path / "par" / "scenario_0_forecast.csv")
+        .sort(sort_cols)
+        .equals(
+            pl.read_csv(tmp_path / "seq" / "scenario_0_forecast.csv").sort(sort_cols)
+        )
+    )
+
+    summary = write_summary(parallel, str(tmp_path / "summary.json"))
+    assert summary["succeeded"] == 3
+    assert summary["total_rows"] == 3 * 18
+    assert json.loads((tmp_path / "summary.json").read_text())["failed"] == 0
+
+
+def test_run_batch_reports_failed_register(tmp_path, make_register):
+    registers = [
+        write_register(
+            tmp_path / "missing_roster.json",
+            make_register([], roster_file=str(tmp_path / "nope.csv")),
+        )
+    ]
+
+    results = run_batch(registers, str(tmp_path / "out"), cache_dir=None)
+
+    assert results[0]["rows"] is None
+    assert results[0]["error"].startswith("ValueError")
+    assert "nope.csv' not found" in results[0]["error"]
+
+
+def test_output_stems_are_unique(tmp_path):
+    paths = ["q1/plan.json", "q2/plan.json", "base.json", "q1/plan.json.bak"]
+
+    stems = output_stems([str(tmp_path / path) for path in paths], "out")
+
+    assert stems == [
+        os.path.join("out", "q1_plan_forecast"),
+        os.path.join("out", "q2_plan_forecast"),
+        os.path.join("out", "base_forecast"),
+        os.path.join("out", "plan.json_forecast"),
+    ]
+    assert output_stems(["a/b_plan.json", "a_b/plan.json", "a/b/plan.json"], "") == [
+        "b_plan_forecast",
+        "a_b_plan_2_forecast",
+        "a_b_plan_3_forecast",
+    ]
+
+
+def test_run_batch_rejects_duplicate_registers(tmp_path, make_register):
+    register = write_register(tmp_path / "base.json", make_register([]))
+
+    with pytest.raises(ValueError, match="more than once"):
+        run_batch([register, str(tmp_path / "." / "base.json")], str(tmp_path / "out"))
@@ -0,0 +1,68 @@
+import json
+
+import polars as pl
+
+from benchmarks.run_benchmarks import main
+from forecast.roster_generator import generate_roster, write_roster
+from forecast.utilities import ROSTER_COLUMNS, get_roster
+
+
+def test_generate_roster_is_seeded():
+    roster = generate_roster(1_000, seed=3)
+
+    assert roster.columns == ROSTER_COLUMNS
+    assert roster.height == 1_000
+    assert roster.equals(generate_roster(1_000, seed=3))
+    assert not roster.equals(generate_roster(1_000, seed=4))
+
+
+def test_generated_roster_is_realistic(tmp_path):
+    path = write_roster(2_000, str(tmp_path / "roster.csv"), seed=1)
+    roster = get_roster(path)
+
+    assert roster["Role ID"].is_unique().all()
+    assert roster["Start Date"].null_count() == 0
+    # Some employees are still active, some have several roles
+    assert 0 < roster["End Date"].null_count() < roster.height
+    roles_per_employee = roster.group_by("Employee ID").len()["len"]
+    assert roles_per_employee.max() > 1
+    assert roles_per_employee.mean() < 1.5
+
+    # Later roles of an employee start the day after the previous one ends
+    moves = roster.sort("Role ID").with_columns(
+        previous_end=pl.col("End Date").shift(1).over("Employee ID")
+    )
+    moves = moves.filter(pl.col("previous_end").is_not_null())
+    assert moves.height > 0
+    assert ((moves["Start Date"] - moves["previous_end"]).dt.total_days() == 1).all()
+
+
+def test_benchmark_run_writes_results(tmp_path):
+    output = tmp_path / "results.json"
+
+    assert main(["--sizes", "200", "--output", str(output)]) == 0
+
+    run = json.loads(output.read_text())
+    assert run["seed"] == 0
+    (result,) = run["results"]
+    assert result["roles"] == 200
+    stages = [stage["stage"] for stage in result["stages"]]
+    assert stages[0] == "get_roster"
+    assert "calculate_ytd_compensation" in stages
+    assert stages[-1] == "apply_register_steps"
+    assert all(stage["rows_out"] > 0 for stage in result["stages"])
+
+    # A second run can be compared against the first
+    assert (
+        main(
+            [
+                "--sizes",
+                "200",
+                "--output",
+                str(tmp_path / "second.json"),
+                "--compare",
+                str(output),
+            ]
+        )
+        == 0
+    )
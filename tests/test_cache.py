@@ -0,0 +1,110 @@
+import os
+
+import polars as pl
+
+from forecast.cache import (
+    cache_key,
+    code_digest,
+    cache_path,
+    evict_cache,
+    file_digest,
+    read_cached_frame,
+    write_cached_frame,
+)
+
+
+def test_cache_key_stable_and_sensitive():
+    assert cache_key("roster", 1, ["a", "b"]) == cache_key("roster", 1, ["a", "b"])
+    assert cache_key("roster", 1, ["a", "b"]) != cache_key("roster", 2, ["a", "b"])
+
+
+def test_file_digest_changes_with_content(tmp_path):
+    path = tmp_path / "roster.csv"
+    path.write_text("a,b\n1,2\n")
+    first = file_digest(path)
+    path.write_text("a,b\n1,3\n")
+    assert file_digest(path) != first
+
+
+def test_read_write_round_trip(tmp_path):
+    frame = pl.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+
+    assert read_cached_frame(str(tmp_path), "missing") is None
+
+    write_cached_frame(str(tmp_path), "key", frame)
+    assert read_cached_frame(str(tmp_path), "key").equals(frame)
+    assert read_cached_frame(str(tmp_path), "key", lazy=True).collect().equals(frame)
+
+
+def test_read_treats_unreadable_entries_as_misses(tmp_path, monkeypatch):
+    frame = pl.DataFrame({"a": [1, 2, 3]})
+    write_cached_frame(str(tmp_path), "key", frame)
+
+    def read_only(path):
+        raise PermissionError(path)
+
+    # A read-only cache is still read
+    monkeypatch.setattr(os, "utime", read_only)
+    assert read_cached_frame(str(tmp_path), "key").equals(frame)
+
+    def evicted(path, **kwargs):
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    # Evicted by another process between the existence check and the read
+    monkeypatch.setattr(os, "utime", evicted)
+    assert read_cached_frame(str(tmp_path), "key") is None
+    monkeypatch.undo()
+
+    write_cached_frame(str(tmp_path), "key", frame)
+    monkeypatch.setattr(pl, "read_ipc", evicted)
+    assert read_cached_frame(str(tmp_path), "key") is None
+
+
+def test_evict_least_recently_used(tmp_path):
+    frame = pl.DataFrame({"a": list(range(1000))})
+    for key in ["old", "used", "new"]:
+        write_cached_frame(str(tmp_path), key, frame)
+
+    # Make the access order explicit: "old" is the least recently used entry
+    os.utime(cache_path(str(tmp_path), "old"), (1, 1))
+    os.utime(cache_path(str(tmp_path), "used"), (2, 2))
+
+    entry_size = os.path.getsize(cache_path(str(tmp_path), "new"))
+    removed = evict_cache(str(tmp_path), max_bytes=2 * entry_size)
+
+    assert removed == ["old"]
+    assert read_cached_frame(str(tmp_path), "used") is not None
+
+
+def test_write_keeps_new_entry_when_over_budget(tmp_path):
+    frame = pl.DataFrame({"a": list(range(1000))})
+    write_cached_frame(str(tmp_path), "first", frame)
+    entry_size = os.path.getsize(cache_path(str(tmp_path), "first"))
+    write_cached_frame(str(tmp_path), "second", frame, max_bytes=entry_size + 100)
+
+    assert read_cached_frame(str(tmp_path), "first") is None
+    assert read_cached_frame(str(tmp_path), "second") is not None
+
+
+def test_write_skips_frames_over_budget(tmp_path):
+    frame = pl.DataFrame({"a": list(range(1000))})
+    write_cached_frame(str(tmp_path), "first", frame)
+
+    assert write_cached_frame(str(tmp_path), "second", frame, max_bytes=100) is None
+    assert read_cached_frame(str(tmp_path), "first") is not None
+    assert read_cached_frame(str(tmp_path), "second") is None
+
+
+def test_code_digest_follows_code():
+    def rate(value):
+        return value * 0.1
+
+    first = code_digest(rate)
+
+    def rate(value):
+        return value * 0.2
+
+    assert code_digest(rate) != first
+    assert code_digest(rate) == code_digest(rate)
+    assert code_digest(pl) == code_digest(pl)
@@ -0,0 +1,82 @@
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from datetime import date
+
+from forecast.export import write_forecast_parquet
+
+
+def create_test_forecast():
+    return pl.DataFrame(
+        {
+            "start_of_month": [
+                date(2024, 12, 1),
+                date(2024, 12, 1),
+                date(2025, 1, 1),
+                date(2025, 1, 1),
+                date(2025, 2, 1),
+            ],
+            "year": [2024, 2024, 2025, 2025, 2025],
+            "Department": ["Sales", "R&D/Eng", "Sales", "R&D/Eng", "Sales"],
+            "Employee ID": ["E001", "E002", "E001", "E002", "E001"],
+            "compensation": [1000.0, 2000.0, 1030.0, 2060.0, 1030.0],
+        }
+    )
+
+
+def test_write_forecast_parquet_partitions(tmp_path):
+    forecast = create_test_forecast()
+    written = write_forecast_parquet(forecast, str(tmp_path))
+
+    # One file per year / department partition
+    assert len(written) == 4
+    assert (tmp_path / "year=2025" / "Department=Sales" / "data.parquet").exists()
+    # Values that are not valid path segments are encoded
+    assert (tmp_path / "year=2024" / "Department=R%26D%2FEng").is_dir()
+
+    # Partition columns live in the directory names only, rows are in month order
+    sales = pl.read_parquet(
+        tmp_path / "year=2025" / "Department=Sales" / "data.parquet"
+    )
+    assert sales.columns == ["start_of_month", "Employee ID", "compensation"]
+    assert sales["start_of_month"].to_list() == [date(2025, 1, 1), date(2025, 2, 1)]
+
+
+def test_write_forecast_parquet_lazy_round_trip(tmp_path):
+    forecast = create_test_forecast()
+    write_forecast_parquet(forecast.lazy(), str(tmp_path), partition_by=["year"])
+
+    result = pl.read_parquet(tmp_path / "**" / "*.parquet", hive_partitioning=True)
+
+    assert result.height == forecast.height
+    assert result["compensation"].sum() == forecast["compensation"].sum()
+
+
+def test_write_forecast_parquet_row_group_per_month(tmp_path):
+    # A hire in January 2025 makes the months of 2025 different sizes
+    forecast = pl.concat(
+        [
+            create_test_forecast(),
+            create_test_forecast()
+            .slice(2, 1)
+            .with_columns(pl.lit("E003").alias("Employee ID")),
+        ]
+    ).reverse()
+
+    for lazy in [False, True]:
+        written = write_forecast_parquet(
+            forecast.lazy() if lazy else forecast, str(tmp_path / str(lazy)), ["year"]
+        )
+
+        metadata = pq.ParquetFile(written[-1]).metadata
+        assert [
+            metadata.row_group(index).num_rows
+            for index in range(metadata.num_row_groups)
+        ] == [3, 1]
+
+
+def test_write_forecast_parquet_missing_partition_column(tmp_path):
+    forecast = create_test_forecast().drop("Department")
+
+    with pytest.raises(ValueError, match="not found"):
+        write_forecast_parquet(forecast, str(tmp_path))
@@ -7,6 +7,7 @@ from datetime import datetime
 from base import (
     add_year_column,
     add_proration,
+    add_primary_role_column,
     add_headcount_column,
     add_headcount_change_column,
     calculate_compensation,
@@ -17,6 +18,7 @@ from base import (
 from calculations import (
     rate_forecast,
     capped_rate_forecast,
+    capped_cumulative_forecast,
     per_head_forecast,
 )
 
@@ -187,6 +189,60 @@ def test_calculate_ytd_compensation():
     )
 
 
+def test_calculate_ytd_compensation_same_month_roles():
+    # Two roles of one employee in the same months, in either row order
+    data = {
+        "Employee ID": ["E001"] * 4,
+        "Role ID": [2, 1, 1, 2],
+        "year": [2024] * 4,
+        "start_of_month": [datetime(2024, 1, 1)] * 2 + [datetime(2024, 2, 1)] * 2,
+        "compensation": [300.0, 100.0, 100.0, 300.0],
+    }
+
+    for compensation_df in [pl.DataFrame(data), pl.DataFrame(data).reverse()]:
+        result = calculate_ytd_compensation(compensation_df)
+
+        # Role 1 is accumulated first within each month
+        assert result.select("Role ID", "ytd_compensation").rows() == [
+            (1, 100.0),
+            (2, 400.0),
+            (1, 500.0),
+            (2, 800.0),
+        ]
+
+
+def test_add_primary_role_column():
+    base = pl.DataFrame(
+        {
+            "Employee ID": ["E001", "E001", "E001", "E002", "E003"],
+            "Role ID": [7, 3, 5, 1, 2],
+            "start_of_month": [datetime(2024, 1, 1)] * 5,
+            "proration": [0.5, 0.5, 0.25, 1.0, 0.0],
+        }
+    )
+    result = add_primary_role_column(base)
+
+    # Tie on proration goes to the lowest Role ID, no primary role without active days
+    assert result["primary_role"].to_list() == [False, True, False, True, False]
+
+
+def test_add_primary_role_column_interleaved_employees():
+    base = pl.DataFrame(
+        {
+            "Employee ID": ["E002", "E001", "E002", "E001", "E001"],
+            "Role ID": [4, 2, 3, 1, 2],
+            "start_of_month": [datetime(2024, 2, 1), datetime(2024, 1, 1)]
+            + [datetime(2024, 2, 1)] * 2
+            + [datetime(2024, 2, 1)],
+            "proration": [0.5, 1.0, 0.5, 0.25, 0.75],
+        }
+    )
+    result = add_primary_role_column(base)
+
+    # Flags are mapped back to the original row order
+    assert result["primary_role"].to_list() == [False, True, True, False, True]
+
+
 def test_filter_active_months():
     forecast_base = create_test_forecast_base()
     # Update start and end dates to ensure that starts and ends are filtered out
@@ -218,6 +274,19 @@ def test_rate_forecast_valid_column():
     assert result["new_rate_column"].to_list() == expected
 
 
+def test_rate_forecast_lazy():
+    forecast = create_test_forecast().lazy()
+    result = rate_forecast(forecast, "compensation", "new_rate_column", 0.1)
+    assert isinstance(result, pl.LazyFrame)
+    assert result.collect()["new_rate_column"].to_list() == [100.0, 200.0, 300.0]
+
+
+def test_rate_forecast_lazy_invalid_column():
+    forecast = create_test_forecast().lazy()
+    with pytest.raises(ValueError):
+        rate_forecast(forecast, "invalid_column", "new_rate_column", 0.1)
+
+
 def test_rate_forecast_invalid_column():
     forecast = create_test_forecast()
     with pytest.raises(ValueError):
@@ -262,6 +331,137 @@ def test_capped_rate_forecast_non_numeric_column():
         )
 
 
+def create_test_cumulative_forecast():
+    """Helper function with rows out of month order and two employees"""
+    data = {
+        "Employee ID": ["E001", "E001", "E001", "E002", "E002", "E001"],
+        "year": [2024, 2024, 2024, 2024, 2024, 2025],
+        "start_of_month": [
+            datetime(2024, 3, 1),
+            datetime(2024, 1, 1),
+            datetime(2024, 2, 1),
+            datetime(2024, 1, 1),
+            datetime(2024, 2, 1),
+            datetime(2025, 1, 1),
+        ],
+        "compensation": [100.0, 100.0, 100.0, 50.0, 50.0, 100.0],
+        "bonus": [10.0, 10.0, 10.0, 0.0, 0.0, 10.0],
+    }
+    return pl.DataFrame(data)
+
+
+def test_capped_cumulative_forecast():
+    forecast = create_test_cumulative_forecast()
+    result = capped_cumulative_forecast(
+        forecast,
+        [
+            {
+                "base_column": "compensation",
+                "new_column_name": "ss_tax",
+                "applied_rate": 0.5,
+                "cap_amount": 250,
+            },
+            {
+                "base_column": "compensation",
+                "new_column_name": "medicare",
+                "applied_rate": 0.1,
+                "cap_amount": 1000,
+            },
+            {
+                "base_column": "bonus",
+                "new_column_name": "bonus_match",
+                "applied_rate": 1.0,
+                "cap_amount": 15,
+            },
+        ],
+    )
+
+    # Cap reached during March for E001, reset in the new year
+    assert result["ss_tax"].to_list() == [25.0, 50.0, 50.0, 25.0, 25.0, 50.0]
+    assert result["medicare"].to_list() == [10.0, 10.0, 10.0, 5.0, 5.0, 10.0]
+    assert result["bonus_match"].to_list() == [0.0, 10.0, 5.0, 0.0, 0.0, 10.0]
+    # Running totals are not left in the forecast
+    assert result.columns == forecast.columns + ["ss_tax", "medicare", "bonus_match"]
+
+
+def test_capped_cumulative_forecast_matches_capped_rate():
+    forecast = create_test_cumulative_forecast()
+    cumulative = capped_cumulative_forecast(
+        forecast,
+        [
+            {
+                "base_column": "compensation",
+                "new_column_name": "ss_tax",
+                "applied_rate": 0.062,
+                "cap_amount": 250,
+            }
+        ],
+    )
+    with_ytd = calculate_ytd_compensation(forecast)
+    capped = capped_rate_forecast(
+        with_ytd, "compensation", "ss_tax", 0.062, "ytd_compensation", 250
+    )
+
+    sort_cols = ["Employee ID", "start_of_month"]
+    assert (
+        cumulative.sort(sort_cols)["ss_tax"].to_list()
+        == capped.sort(sort_cols)["ss_tax"].to_list()
+    )
+
+
+def test_capped_cumulative_forecast_interleaved_employees():
+    # Employees' months arrive in separate blocks, as when forecasts are concatenated
+    months = [datetime(2024, month, 1) for month in range(1, 13)]
+    forecast = pl.DataFrame(
+        {
+            "Employee ID": ["E001"] * 6 + ["E002"] * 6 + ["E001"] * 6,
+            "Role ID": [1] * 6 + [2] * 6 + [1] * 6,
+            "year": [2024] * 18,
+            "start_of_month": months[:6] + months[:6] + months[6:],
+            "compensation": [100.0] * 18,
+        }
+    )
+    cap = {
+        "base_column": "compensation",
+        "new_column_name": "ss_tax",
+        "applied_rate": 0.5,
+        "cap_amount": 750,
+    }
+    result = capped_cumulative_forecast(forecast, [cap])
+
+    assert result["ss_tax"].to_list() == [50.0] * 13 + [25.0] + [0.0] * 4
+
+
+def test_capped_cumulative_forecast_invalid_column():
+    forecast = create_test_cumulative_forecast()
+
+    with pytest.raises(ValueError):
+        capped_cumulative_forecast(
+            forecast,
+            [
+                {
+                    "base_column": "missing",
+                    "new_column_name": "ss_tax",
+                    "applied_rate": 0.062,
+                    "cap_amount": 250,
+                }
+            ],
+        )
+
+    with pytest.raises(ValueError):
+        capped_cumulative_forecast(
+            forecast.drop("year"),
+            [
+                {
+                    "base_column": "compensation",
+                    "new_column_name": "ss_tax",
+                    "applied_rate": 0.062,
+                    "cap_amount": 250,
+                }
+            ],
+        )
+
+
 def test_per_head_forecast_normal_case():
     # Test the normal case with valid inputs
     df = pl.DataFrame(
@@ -329,6 +529,71 @@ def test_per_head_forecast_multiple_roles():
     assert_series_equal(result["per_head_amount"], expected)
 
 
+def test_per_head_forecast_lazy():
+    df = pl.DataFrame(
+        {
+            "Employee ID": [1, 1, 2],
+            "start_of_month": [
+                datetime(2024, 1, 1),
+                datetime(2024, 1, 1),
+                datetime(2024, 1, 1),
+            ],
+            "proration": [0.5, 1.0, 0.8],
+            "inflation_factor": [1.02, 1.02, 1.02],
+        }
+    )
+
+    result = per_head_forecast(df.lazy(), "per_head_amount", 1000).collect()
+    expected = pl.Series(name="per_head_amount", values=[0.0, 1020.0, 1020.0])
+
+    assert_series_equal(result["per_head_amount"], expected)
+
+
+def test_per_head_forecast_primary_role():
+    # With a primary role flag only the flagged role is charged, even on equal prorations
+    df = pl.DataFrame(
+        {
+            "Employee ID": [1, 1, 2],
+            "start_of_month": [
+                datetime(2024, 1, 1),
+                datetime(2024, 1, 1),
+                datetime(2024, 1, 1),
+            ],
+            "proration": [1.0, 1.0, 0.8],
+            "inflation_factor": [1.02, 1.02, 1.02],
+            "primary_role": [True, False, True],
+        }
+    )
+
+    result = per_head_forecast(df, "per_head_amount", 1000)
+    expected = pl.Series(name="per_head_amount", values=[1020.0, 0.0, 1020.0])
+
+    assert_series_equal(result["per_head_amount"], expected)
+
+
+def test_per_head_forecast_tie_goes_to_lowest_role_id():
+    # Without a primary role flag, equal prorations go to the role the flag would pick
+    df = pl.DataFrame(
+        {
+            "Employee ID": [1, 1, 2, 2],
+            "Role ID": [3, 2, 4, 5],
+            "start_of_month": [datetime(2024, 1, 1)] * 4,
+            "proration": [1.0, 1.0, 0.5, 0.5],
+            "inflation_factor": [1.02] * 4,
+        }
+    )
+
+    result = per_head_forecast(df, "per_head_amount", 1000)
+    expected = per_head_forecast(add_primary_role_column(df), "per_head_amount", 1000)
+
+    assert result["per_head_amount"].to_list() == [0.0, 1020.0, 1020.0, 0.0]
+    assert_series_equal(result["per_head_amount"], expected["per_head_amount"])
+    # Without Role IDs the first of the tied rows is charged
+    assert per_head_forecast(df.drop("Role ID"), "per_head_amount", 1000)[
+        "per_head_amount"
+    ].to_list() == [1020.0, 0.0, 1020.0, 0.0]
+
+
 def test_per_head_forecast_no_proration():
     # Test when proration is zero
     df = pl.DataFrame(
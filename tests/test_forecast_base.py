@@ -1,14 +1,15 @@
 import polars as pl
 import pytest
+from polars.testing import assert_frame_equal
 from datetime import date
 
-
 # Import the function to be tested
-from forecast.base import generate_forecast_base
+from forecast.base import generate_forecast_base, compact_report
+from forecast.register import apply_register_steps
 
 
 # Mock Data for Testing
-def mock_get_roster(path):
+def mock_get_roster(path, lazy=False, cache_dir=None):
     # Mock a small roster DataFrame
     data = {
         "Employee ID": ["E001", "E002", "E002"],
@@ -27,7 +28,8 @@ def mock_get_roster(path):
         "Bonus": [0.1, 0.2, 0.3],
         "Commission": [0.05, 0.0, 0.5],
     }
-    return pl.DataFrame(data)
+    roster = pl.DataFrame(data)
+    return roster.lazy() if lazy else roster
 
 
 def mock_generate_month_ranges(start_date, end_date, infl_rate, infl_start, infl_freq):
@@ -61,7 +63,7 @@ def test_generate_forecast_base(monkeypatch):
     )
 
     # Check if the output DataFrame has the expected shape and columns
-    assert forecast_base.shape == (6, 19)
+    assert forecast_base.shape == (6, 20)
     expected_columns = {
         "start_of_month",
         "end_of_month",
@@ -82,6 +84,7 @@ def test_generate_forecast_base(monkeypatch):
         "ytd_compensation",
         "proration",
         "year",
+        "primary_role",
     }  # Use set because order is not so important
 
     assert set(forecast_base.columns) == expected_columns
@@ -100,6 +103,139 @@ def test_generate_forecast_base(monkeypatch):
         )
         == forecast_base["compensation"]
     ).all()
+    # E002 holds two fully prorated roles, the lower Role ID carries per head costs
+    primary = forecast_base.filter(pl.col("primary_role"))
+    assert primary.height == 4
+    assert sorted(primary["Role ID"].unique().to_list()) == [1, 2]
+
+
+def test_generate_forecast_base_interval_matches_cross(monkeypatch):
+    # Include a role that ends before the forecast range and one that starts mid range
+    def roster_with_inactive(path, lazy=False, cache_dir=None):
+        return mock_get_roster(path, lazy).vstack(
+            pl.DataFrame(
+                {
+                    "Employee ID": ["E003", "E004"],
+                    "Role ID": [4, 5],
+                    "start_date_complete": [date(2020, 1, 1), date(2024, 2, 10)],
+                    "end_date_complete": [date(2022, 6, 30), date.max],
+                    "Salary": [50000, 90000],
+                    "Bonus": [0.0, 0.1],
+                    "Commission": [0.0, 0.0],
+                }
+            )
+        )
+
+    monkeypatch.setattr("forecast.base.get_roster", roster_with_inactive)
+    monkeypatch.setattr(
+        "forecast.base.generate_month_ranges", mock_generate_month_ranges
+    )
+
+    inputs = (
+        "fake_roster_path.csv",
+        date(2024, 1, 1),
+        date(2024, 2, 29),
+        0.03,
+        date(2024, 1, 1),
+        12,
+    )
+    interval = generate_forecast_base(*inputs, engine="interval")
+    cross = generate_forecast_base(*inputs, engine="cross")
+
+    assert interval.shape == (7, 20)
+    assert interval.columns == cross.columns
+    sort_cols = ["Role ID", "start_of_month"]
+    assert interval.sort(sort_cols).equals(cross.sort(sort_cols))
+
+
+def test_generate_forecast_base_unknown_engine(monkeypatch):
+    monkeypatch.setattr("forecast.base.get_roster", mock_get_roster)
+    monkeypatch.setattr(
+        "forecast.base.generate_month_ranges", mock_generate_month_ranges
+    )
+
+    with pytest.raises(ValueError, match="Unknown forecast base engine"):
+        generate_forecast_base(
+            "fake_roster_path.csv",
+            date(2024, 1, 1),
+            date(2024, 2, 29),
+            0.03,
+            date(2024, 1, 1),
+            12,
+            engine="nested_loop",
+        )
+
+
+def test_generate_forecast_base_lazy(monkeypatch):
+    monkeypatch.setattr("forecast.base.get_roster", mock_get_roster)
+    monkeypatch.setattr(
+        "forecast.base.generate_month_ranges", mock_generate_month_ranges
+    )
+
+    inputs = (
+        "fake_roster_path.csv",
+        date(2024, 1, 1),
+        date(2024, 2, 29),
+        0.03,
+        date(2024, 1, 1),
+        12,
+    )
+    eager = generate_forecast_base(*inputs)
+    lazy = generate_forecast_base(*inputs, lazy=True)
+
+    assert isinstance(lazy, pl.LazyFrame)
+    sort_cols = ["Role ID", "start_of_month"]
+    assert lazy.collect().sort(sort_cols).equals(eager.sort(sort_cols))
+
+
+def test_generate_forecast_base_compact(roster_file):
+    inputs = (
+        roster_file,
+        date(2024, 1, 1),
+        date(2024, 12, 31),
+        0.03,
+        date(2024, 7, 1),
+        12,
+    )
+
+    default = generate_forecast_base(*inputs)
+    compact = generate_forecast_base(*inputs, compact=True)
+    compact_money = generate_forecast_base(
+        *inputs, compact=True, float32_money=True, drop_roster_dates=True
+    )
+
+    assert compact["Department"].dtype == pl.Enum(["Engineering", "Sales"])
+    assert compact["Employee ID"].dtype == pl.Enum(["123", "124"])
+    assert compact["headcount"].dtype == pl.Int8
+    assert compact["proration"].dtype == pl.Float64
+    assert compact["compensation"].dtype == pl.Float64
+    assert compact_money["proration"].dtype == pl.Float32
+    assert compact_money["compensation"].dtype == pl.Float32
+    assert compact.columns == default.columns
+    assert compact_money.columns == [
+        column for column in default.columns if column not in ["Start Date", "End Date"]
+    ]
+
+    # Same values, only the data types change
+    assert_frame_equal(
+        compact.with_columns(pl.col(pl.Enum).cast(pl.Utf8)),
+        default,
+        check_dtypes=False,
+    )
+    assert compact["compensation"].equals(default["compensation"])
+    # Money calculated later from the rates keeps Float64 unless float32_money is set
+    laptops = [{"type": "per_head", "new_column_name": "laptops", "amount": 50}]
+    assert apply_register_steps(compact, laptops)["laptops"].equals(
+        apply_register_steps(default, laptops)["laptops"]
+    )
+    assert compact_money["compensation"].to_list() == pytest.approx(
+        default["compensation"].to_list(), rel=1e-6
+    )
+
+    report = compact_report(compact_money)
+    assert report["original_bytes"] == pytest.approx(default.estimated_size(), rel=0.01)
+    assert report["compact_bytes"] == compact_money.estimated_size()
+    assert report["saved_bytes"] > compact_report(compact)["saved_bytes"]
 
 
 if __name__ == "__main__":
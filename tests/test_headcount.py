@@ -0,0 +1,138 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from forecast.base import build_forecast_base
+from forecast.headcount import (
+    generate_headcount,
+    headcount_at,
+    headcount_index,
+    roster_snapshots,
+    sweep_headcount,
+)
+from forecast.utilities import generate_month_ranges
+
+# Ann joins and leaves Sales in February, Bo joins Engineering in May
+EXTRA_ROWS = [
+    "3,125,Ann Lee,Analyst,Sales,Full-time,New York,02/10/24,02/20/24,50000,0,0",
+    "4,126,Bo Chan,Engineer,Engineering,Full-time,New York,05/01/24,,70000,0,0",
+]
+
+
+@pytest.fixture
+def roster_file(write_roster_csv, roster_rows):
+    return write_roster_csv(roster_rows + EXTRA_ROWS)
+
+
+def detail_headcount(month_ranges, roster, dimensions):
+    """Headcount summed from the forecast base, for comparison"""
+    return (
+        build_forecast_base(month_ranges, roster)
+        .group_by(["start_of_month"] + dimensions)
+        .agg(pl.col("headcount", "headcount_change").sum())
+    )
+
+
+def test_sweep_headcount(roster_file):
+    headcount = generate_headcount(
+        roster_file, date(2024, 1, 1), date(2024, 12, 31), ["Department"]
+    )
+
+    assert headcount.height == 24
+    sales = headcount.filter(pl.col("Department") == "Sales")
+    # Jane leaves at the end of June, Ann joins and leaves in February
+    assert sales["headcount"].to_list() == [1] * 5 + [0] * 7
+    assert sales["headcount_change"].to_list() == [0, 0, 0, 0, 0, -1] + [0] * 6
+    engineering = headcount.filter(pl.col("Department") == "Engineering")
+    assert engineering["headcount"].to_list() == [1] * 4 + [2] * 8
+    assert engineering["headcount_change"].sum() == 1
+
+
+def test_sweep_headcount_matches_forecast_base(synthetic_roster):
+    roster = synthetic_roster(2_000, seed=2)
+    month_ranges = generate_month_ranges(
+        date(2022, 7, 1), date(2026, 6, 30), 0.03, date(2023, 1, 1), 12
+    )
+
+    for dimensions in [[], ["Department", "Location"]]:
+        headcount = sweep_headcount(month_ranges, roster.lazy(), dimensions)
+        detail = detail_headcount(month_ranges, roster, dimensions)
+        # Segments without active roles in a month are only in the sweep, as zeros
+        compared = headcount.join(
+            detail, on=["start_of_month"] + dimensions, how="left", suffix="_detail"
+        ).fill_null(0)
+
+        assert detail.height <= headcount.height
+        assert_frame_equal(
+            compared.select("headcount", "headcount_change"),
+            compared.select(
+                pl.col("headcount_detail").alias("headcount"),
+                pl.col("headcount_change_detail").alias("headcount_change"),
+            ),
+            check_dtypes=False,
+        )
+
+
+def test_sweep_headcount_unknown_dimension(month_ranges, roster):
+    with pytest.raises(ValueError):
+        sweep_headcount(month_ranges, roster, ["Team"])
+
+
+def test_headcount_at_and_roster_snapshots(roster):
+    index = headcount_index(roster, ["Department"])
+    dates = [date(2024, 6, 30), date(2024, 2, 15)]
+
+    headcount = headcount_at(index, dates)
+    snapshots = roster_snapshots(index, dates)
+
+    # Jane's last day is June 30th, like the forecast base she no longer counts on it
+    assert headcount.rows() == [
+        (date(2024, 2, 15), "Engineering", 1),
+        (date(2024, 2, 15), "Sales", 2),
+        (date(2024, 6, 30), "Engineering", 2),
+        (date(2024, 6, 30), "Sales", 0),
+    ]
+    assert snapshots.columns[0] == "date"
+    assert snapshots.group_by("date").agg(pl.col("Role ID").sort()).sort(
+        "date"
+    ).rows() == [(date(2024, 2, 15), [1, 2, 3]), (date(2024, 6, 30), [1, 4])]
+
+
+def test_headcount_at_matches_forecast_base(synthetic_roster):
+    roster = synthetic_roster(2_000, seed=4)
+    month_ranges = generate_month_ranges(
+        date(2022, 7, 1), date(2026, 6, 30), 0.03, date(2023, 1, 1), 12
+    )
+
+    for dimensions in [[], ["Department", "Location"]]:
+        index = headcount_index(roster.lazy(), dimensions)
+        headcount = headcount_at(index, month_ranges["end_of_month"])
+        detail = detail_headcount(month_ranges, roster, dimensions).with_columns(
+            pl.col("start_of_month").dt.month_end().alias("date")
+        )
+        compared = headcount.join(
+            detail, on=["date"] + dimensions, how="left", suffix="_detail"
+        ).fill_null(0)
+
+        assert compared["headcount"].sum() > 0
+        assert (compared["headcount"] == compared["headcount_detail"]).all()
+
+
+def test_roster_snapshots_match_headcount_at(synthetic_roster):
+    roster = synthetic_roster(2_000, seed=6)
+    index = headcount_index(roster)
+    dates = [date(2026, 6, 30), date(2019, 12, 31), date(2023, 3, 15), date(2010, 1, 1)]
+
+    snapshots = roster_snapshots(index, dates + dates[:1])
+
+    assert snapshots.columns == ["date"] + roster.columns
+    counts = snapshots.group_by("date").len()
+    assert (
+        headcount_at(index, dates)
+        .filter(pl.col("headcount") > 0)
+        .join(counts, on="date", how="full")
+        .select((pl.col("headcount") == pl.col("len")).all())
+        .item()
+    )
@@ -0,0 +1,157 @@
+import pytest
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from datetime import date
+
+from forecast.incremental import diff_rosters, update_forecast, extend_horizon
+from forecast.register import base_from_register, apply_register_steps
+from forecast.utilities import get_roster
+
+EXTRA_ROWS = [
+    "3,125,Jim Beam,Analyst,Finance,Full-time,Chicago,01/01/23,,50000,0,0",
+]
+
+# Role 2 gets a raise, role 3 leaves, role 4 is a mid month promotion of employee 123
+UPDATED_ROWS = [
+    "1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,05/15/24,60000,0.1,0",
+    "2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,06/30/24,90000,0,0.2",
+    "4,123,John Doe,Lead Engineer,Engineering,Full-time,New York,05/16/24,,75000,0.1,0",
+]
+
+
+@pytest.fixture
+def roster_file(write_roster_csv, roster_rows):
+    return write_roster_csv(roster_rows + EXTRA_ROWS)
+
+
+@pytest.fixture
+def new_roster(write_roster_csv):
+    return get_roster(write_roster_csv(UPDATED_ROWS, name="new.csv"))
+
+
+@pytest.fixture
+def actions(make_register, register_steps):
+    return make_register(register_steps)
+
+
+def full_forecast(actions, roster):
+    return apply_register_steps(
+        base_from_register(actions, roster), actions["added_columns"]
+    )
+
+
+def test_diff_rosters(roster, new_roster):
+    diff = diff_rosters(roster, new_roster)
+
+    assert diff["added"] == [4]
+    assert diff["removed"] == [3]
+    assert sorted(diff["changed"]) == [1, 2]
+    assert sorted(diff["employees"]) == ["123", "124", "125"]
+
+
+def test_update_forecast_matches_full_rebuild(actions, roster, new_roster):
+    forecast = full_forecast(actions, roster)
+
+    updated, diff = update_forecast(forecast, roster, new_roster, actions)
+
+    order = ["Employee ID", "start_of_month", "Role ID"]
+    assert_frame_equal(
+        updated.sort(order),
+        full_forecast(actions, new_roster).sort(order),
+        check_exact=False,
+    )
+
+
+def test_update_forecast_only_recomputes_affected_employees(actions, roster):
+    forecast = full_forecast(actions, roster)
+    new_roster = roster.with_columns(
+        pl.when(pl.col("Role ID") == 3)
+        .then(pl.col("Salary") * 2)
+        .otherwise(pl.col("Salary"))
+        .alias("Salary")
+    )
+
+    updated, diff = update_forecast(forecast.lazy(), roster, new_roster, actions)
+
+    assert diff["employees"] == ["125"]
+    assert isinstance(updated, pl.LazyFrame)
+    updated = updated.collect()
+    # Unchanged employees keep their rows and order, the recomputed one is appended
+    assert_frame_equal(
+        updated.head(forecast.height - 12),
+        forecast.filter(pl.col("Employee ID") != "125"),
+    )
+    assert updated.filter(pl.col("Employee ID") == "125")["compensation"].sum() == (
+        2 * forecast.filter(pl.col("Employee ID") == "125")["compensation"].sum()
+    )
+
+
+def test_update_forecast_unchanged_roster(actions, roster):
+    forecast = full_forecast(actions, roster)
+
+    updated, diff = update_forecast(forecast, roster, roster, actions)
+
+    assert diff["employees"] == []
+    assert updated is forecast
+
+
+def test_extend_horizon_matches_full_rebuild(make_register, register_steps, roster):
+    # Stop mid year so year to date totals and caps have to carry into the new months
+    actions = make_register(register_steps, end_date="2024-06-30")
+    forecast = full_forecast(actions, roster)
+
+    extended, extended_actions = extend_horizon(
+        forecast, roster, actions, date(2025, 9, 30)
+    )
+
+    assert extended_actions["base_inputs"]["end_date"] == "2025-09-30"
+    assert actions["base_inputs"]["end_date"] == "2024-06-30"
+    # Existing months are kept as they are
+    assert_frame_equal(extended.head(forecast.height), forecast)
+
+    rebuilt = full_forecast(extended_actions, roster)
+    order = ["Employee ID", "start_of_month", "Role ID"]
+    assert_frame_equal(extended.sort(order), rebuilt.sort(order), check_exact=False)
+
+
+def test_extend_horizon_requires_later_end_date(actions, roster):
+    forecast = full_forecast(actions, roster)
+
+    with pytest.raises(ValueError):
+        extend_horizon(forecast, roster, actions, date(2024, 6, 30))
+
+
+def test_compact_forecast_update_and_extension(
+    make_register, register_steps, roster, new_roster
+):
+    actions = make_register(register_steps, end_date="2024-06-30", compact=True)
+
+    def labelled(forecast):
+        order = ["Employee ID", "start_of_month", "Role ID"]
+        return forecast.with_columns(pl.col(pl.Enum).cast(pl.Utf8)).sort(order)
+
+    # Recomputed rows use new titles, both sides share the Enums of both rosters
+    updated, _ = update_forecast(
+        full_forecast(actions, roster), roster, new_roster, actions
+    )
+    assert updated["Title"].dtype == pl.Enum(
+        ["Analyst", "Engineer", "Lead Engineer", "Manager"]
+    )
+    assert_frame_equal(
+        labelled(updated),
+        labelled(full_forecast(actions, new_roster)),
+        check_dtypes=False,
+        check_exact=False,
+    )
+
+    extended, extended_actions = extend_horizon(
+        updated, new_roster, actions, date(2025, 3, 31)
+    )
+    assert extended["Title"].dtype == updated["Title"].dtype
+    assert_frame_equal(
+        labelled(extended),
+        labelled(full_forecast(extended_actions, new_roster)),
+        check_dtypes=False,
+        check_exact=False,
+    )
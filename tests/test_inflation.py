@@ -0,0 +1,131 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from forecast.inflation import inflation_grid, inflation_scaling, inflation_sweep
+from forecast.register import apply_register_steps, base_from_register
+
+# John earns above the social security cap, Jane is promoted in July
+ROWS = [
+    "1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,,160000,0.1,0",
+    "2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,06/30/24,80000,0,0.2",
+    "3,124,Jane Smith,Director,Sales,Full-time,San Francisco,07/01/24,,150000,0.2,0.1",
+    "4,126,Bo Chan,Engineer,Engineering,Full-time,New York,05/16/24,,70000,0.05,0",
+]
+
+STEPS = [
+    {
+        "type": "flat_rate",
+        "base_column": "compensation",
+        "new_column_name": "payroll_tax",
+        "applied_rate": 0.08,
+    },
+    {
+        "type": "capped_rate",
+        "base_column": "compensation",
+        "new_column_name": "ss_tax",
+        "applied_rate": 0.062,
+        "cap_base_column": "ytd_compensation",
+        "cap_amount": 168_600,
+    },
+    {
+        "type": "flat_rate",
+        "base_column": "ss_tax",
+        "new_column_name": "ss_admin",
+        "applied_rate": 0.01,
+    },
+    {
+        "type": "capped_cumulative",
+        "base_column": "payroll_tax",
+        "new_column_name": "capped_payroll",
+        "applied_rate": 0.5,
+        "cap_amount": 5_000,
+    },
+    {"type": "per_head", "new_column_name": "laptops", "amount": 50},
+    {
+        "type": "flat_rate",
+        "base_column": "Salary",
+        "new_column_name": "salary_reference",
+        "applied_rate": 0.01,
+    },
+]
+
+SCENARIOS = inflation_grid([0.02, 0.05], [date(2024, 7, 1)], [6, 12])
+
+
+@pytest.fixture
+def roster_file(write_roster_csv):
+    return write_roster_csv(ROWS)
+
+
+@pytest.fixture
+def actions(make_register):
+    return make_register(STEPS, end_date="2026-12-31", inflation_start="2025-01-01")
+
+
+def test_inflation_scaling():
+    scaling = inflation_scaling(STEPS)
+
+    assert scaling["payroll_tax"] == "linear"
+    assert scaling["ss_tax"] == "recompute"
+    assert scaling["ss_admin"] == "recompute"
+    assert scaling["capped_payroll"] == "recompute"
+    assert scaling["laptops"] == "linear"
+    assert scaling["salary_reference"] == "constant"
+
+
+def test_inflation_sweep_matches_full_replays(actions, roster):
+
+    swept = inflation_sweep(actions, roster, SCENARIOS)
+
+    assert swept["scenario"].n_unique() == len(SCENARIOS)
+    for scenario in SCENARIOS:
+        scenario_actions = dict(
+            actions,
+            base_inputs=dict(
+                actions["base_inputs"],
+                inflation_rate=scenario["infl_rate"],
+                inflation_start=scenario["infl_start"].strftime("%Y-%m-%d"),
+                inflation_freq=scenario["infl_freq"],
+            ),
+        )
+        expected = apply_register_steps(
+            base_from_register(scenario_actions, roster), STEPS
+        )
+        name = f"{scenario['infl_rate']:.2%} from 2024-07-01 every {scenario['infl_freq']} months"
+
+        assert_frame_equal(
+            swept.filter(pl.col("scenario") == name).drop("scenario"),
+            expected,
+            check_exact=False,
+        )
+
+
+def test_inflation_sweep_rollups(actions, roster):
+
+    rollups = inflation_sweep(
+        actions, roster, SCENARIOS[:2], grains=[("year", ["Department"])]
+    )
+
+    table = rollups["year_by_scenario_and_department"]
+    assert table.columns[:3] == ["year", "scenario", "Department"]
+    assert table.height == 2 * 3 * 2
+    totals = table.group_by("scenario").agg(pl.col("compensation").sum())
+    assert totals["compensation"].n_unique() == 2
+
+
+def test_inflation_sweep_reports_errors_once(actions, roster):
+    actions["added_columns"] = [dict(STEPS[1], base_column="missing")]
+    errors = []
+
+    swept = inflation_sweep(
+        actions,
+        roster,
+        SCENARIOS,
+        on_error=lambda column, err: errors.append(column["new_column_name"]),
+    )
+
+    assert errors == ["ss_tax"]
+    assert "ss_tax" not in swept.columns
@@ -1,6 +1,9 @@
 import datetime
 
-from utilities import increase_date
+import polars as pl
+import pytest
+
+from utilities import increase_date, generate_month_ranges, generate_calendar
 
 
 class TestIncrease:
@@ -33,3 +36,113 @@ class TestIncrease:
         start_date = datetime.date(year=2024, month=1, day=1)
         new_date = datetime.date(year=2025, month=7, day=1)
         assert increase_date(start_date, 18) == new_date
+
+
+class TestMonthRanges:
+    def test_month_bounds(self):
+        result = generate_month_ranges(
+            datetime.date(2024, 1, 15),
+            datetime.date(2024, 3, 1),
+            0.0,
+            datetime.date(2024, 1, 1),
+            12,
+        )
+        assert result.schema == {
+            "start_of_month": pl.Date,
+            "end_of_month": pl.Date,
+            "inflation_factor": pl.Float64,
+        }
+        assert result["start_of_month"].to_list() == [
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 2, 1),
+            datetime.date(2024, 3, 1),
+        ]
+        assert result["end_of_month"].to_list() == [
+            datetime.date(2024, 1, 31),
+            datetime.date(2024, 2, 29),
+            datetime.date(2024, 3, 31),
+        ]
+
+    def test_inflation_steps(self):
+        result = generate_month_ranges(
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 12, 31),
+            0.1,
+            datetime.date(2024, 3, 15),
+            4,
+        )
+        # Mid month inflation date applies from the following month, then every
+        # 4 months counted from the month of the inflation date
+        expected = [1.0] * 3 + [1.1] * 3 + [1.1 * 1.1] * 4 + [1.1 * 1.1 * 1.1] * 2
+        assert result["inflation_factor"].to_list() == expected
+
+    def test_inflation_date_before_start_steps_monthly_until_caught_up(self):
+        result = generate_month_ranges(
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 6, 30),
+            0.1,
+            datetime.date(2023, 11, 1),
+            3,
+        )
+        # Due dates 2023-11, 2024-02, 2024-05 each take a month of their own
+        factors = [1.1, 1.1**2, 1.1**2, 1.1**2, 1.1**3, 1.1**3]
+        result_factors = result["inflation_factor"].to_list()
+        assert [round(f, 10) for f in result_factors] == [round(f, 10) for f in factors]
+
+    def test_empty_range(self):
+        result = generate_month_ranges(
+            datetime.date(2024, 5, 1),
+            datetime.date(2024, 4, 1),
+            0.03,
+            datetime.date(2024, 1, 1),
+            12,
+        )
+        assert result.is_empty()
+        assert result.columns == ["start_of_month", "end_of_month", "inflation_factor"]
+
+    def test_inflation_frequency_must_be_positive(self):
+        for inflation_frequency in [0, -1, 1.5]:
+            with pytest.raises(ValueError, match="positive whole number"):
+                generate_month_ranges(
+                    datetime.date(2024, 1, 1),
+                    datetime.date(2024, 12, 31),
+                    0.03,
+                    datetime.date(2024, 7, 1),
+                    inflation_frequency,
+                )
+
+
+class TestCalendar:
+    def test_weekly_periods(self):
+        result = generate_calendar(
+            datetime.date(2024, 1, 3),
+            datetime.date(2024, 1, 20),
+            0.05,
+            datetime.date(2024, 1, 10),
+            1,
+            interval="1w",
+        )
+        # Weeks start on Monday
+        assert result["start_of_period"].to_list() == [
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 1, 8),
+            datetime.date(2024, 1, 15),
+        ]
+        assert result["end_of_period"].to_list() == [
+            datetime.date(2024, 1, 7),
+            datetime.date(2024, 1, 14),
+            datetime.date(2024, 1, 21),
+        ]
+        assert result["inflation_factor"].to_list() == [1.0, 1.0, 1.05]
+
+    def test_long_daily_horizon(self):
+        result = generate_calendar(
+            datetime.date(2024, 1, 1),
+            datetime.date(2073, 12, 31),
+            0.03,
+            datetime.date(2025, 1, 1),
+            12,
+            interval="1d",
+        )
+        assert result.height == 18263
+        assert result["inflation_factor"][-1] == pytest.approx(1.03**49)
@@ -0,0 +1,116 @@
+import json
+import os
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from cli.batch import run_batch, write_batch_trace
+from forecast.base import generate_forecast_base
+from forecast.profiling import profile_stage, print_trace
+from forecast.register import apply_register_steps
+
+
+def build_base(roster_file, trace=None):
+    return generate_forecast_base(
+        roster_file,
+        date(2024, 1, 1),
+        date(2024, 12, 31),
+        0.03,
+        date(2024, 7, 1),
+        12,
+        trace=trace,
+    )
+
+
+def test_profile_stage_disabled_calls_function():
+    frame = pl.DataFrame({"a": [1, 2, 3]})
+
+    assert profile_stage(None, "head", lambda frame: frame.head(2), frame).height == 2
+
+
+def test_profile_stage_records_rows_and_size():
+    trace = []
+    frame = pl.DataFrame({"a": [1, 2, 3]})
+
+    output = profile_stage(trace, "head", lambda frame: frame.head(2), frame)
+
+    (stage,) = trace
+    assert output.height == 2
+    assert stage["stage"] == "head"
+    assert stage["rows_in"] == 3
+    assert stage["rows_out"] == 2
+    assert stage["estimated_bytes"] == output.estimated_size()
+    assert stage["seconds"] >= 0
+
+    # Lazy stages only build a plan, rows are not known
+    profile_stage(trace, "lazy", lambda frame: frame.lazy(), frame)
+    assert trace[1]["rows_out"] is None
+
+
+@pytest.mark.skipif(
+    not os.access("/proc/self/clear_refs", os.W_OK), reason="peak RSS reset needs Linux"
+)
+def test_profile_stage_peak_rss_is_per_stage():
+    trace = []
+
+    def allocate(megabytes):
+        return len(b"x" * (megabytes * 1024**2))
+
+    profile_stage(trace, "large", allocate, 200)
+    profile_stage(trace, "small", allocate, 10)
+
+    large, small = [stage["peak_rss_bytes"] for stage in trace]
+    # The freed 200 MB of the first stage are not counted in the second
+    assert large - small > 100 * 1024**2
+
+
+def test_generate_forecast_base_trace(roster_file):
+    trace = []
+    base = build_base(roster_file, trace)
+
+    stages = [stage["stage"] for stage in trace]
+    assert stages[:3] == ["generate_month_ranges", "get_roster", "expand_active_months"]
+    assert stages[-1] == "calculate_ytd_compensation"
+    assert trace[-1]["rows_out"] == base.height
+    assert_frame_equal(base, build_base(roster_file))
+    print_trace(trace)
+
+
+def test_apply_register_steps_trace_matches_compiled(roster_file, register_steps):
+    base = build_base(roster_file)
+    trace = []
+
+    forecast = apply_register_steps(base, register_steps, trace=trace)
+
+    assert [stage["stage"] for stage in trace] == [
+        f"step {step['new_column_name']}" for step in register_steps
+    ]
+    assert_frame_equal(forecast, apply_register_steps(base, register_steps))
+
+
+def test_run_batch_trace(tmp_path, make_register, register_steps):
+    register = tmp_path / "taxes.json"
+    register.write_text(json.dumps(make_register(register_steps)))
+
+    results = run_batch([str(register)], str(tmp_path / "out"), cache_dir=None)
+    assert results[0]["trace"] is None
+
+    results = run_batch(
+        [str(register)], str(tmp_path / "out"), cache_dir=None, profile=True
+    )
+    write_batch_trace(results, str(tmp_path / "trace.json"))
+
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    (run,) = trace["runs"]
+    stages = [stage["stage"] for stage in run["stages"]]
+    assert run["run"] == str(register)
+    assert "add_primary_role_column" in stages
+    assert stages[-5:] == [
+        "step payroll_tax",
+        "step ss_tax",
+        "step capped_payroll",
+        "step laptops",
+        "write_forecast",
+    ]
@@ -0,0 +1,475 @@
+import polars as pl
+import pytest
+from datetime import date
+from polars.testing import assert_frame_equal
+
+from forecast.register import (
+    parse_base_inputs,
+    base_from_register,
+    apply_register_step,
+    apply_register_steps,
+    compile_register,
+    forecast_base_schema,
+    replay_register,
+    validate_register,
+)
+from forecast.utilities import get_roster
+
+
+def create_test_forecast():
+    return pl.DataFrame(
+        {
+            "Employee ID": ["E001", "E001", "E002"],
+            "start_of_month": [date(2024, 1, 1), date(2024, 1, 1), date(2024, 1, 1)],
+            "proration": [0.5, 1.0, 1.0],
+            "inflation_factor": [1.0, 1.0, 1.0],
+            "compensation": [1000.0, 2000.0, 3000.0],
+            "ytd_compensation": [1000.0, 3000.0, 3000.0],
+        }
+    )
+
+
+def test_parse_base_inputs():
+    result = parse_base_inputs(
+        {
+            "roster_file": "roster.csv",
+            "start_date": "2024-01-01",
+            "end_date": "2024-12-31",
+            "inflation_rate": 0.03,
+            "inflation_start": "2024-07-01",
+            "inflation_freq": 12,
+        }
+    )
+    assert result == {
+        "roster_path": "roster.csv",
+        "start_date": date(2024, 1, 1),
+        "end_date": date(2024, 12, 31),
+        "infl_rate": 0.03,
+        "infl_start": date(2024, 7, 1),
+        "infl_freq": 12,
+    }
+
+
+def test_parse_base_inputs_compact():
+    base_inputs = {
+        "roster_file": "roster.csv",
+        "start_date": "2024-01-01",
+        "end_date": "2024-12-31",
+        "inflation_rate": 0.03,
+        "inflation_start": "2024-07-01",
+        "inflation_freq": 12,
+    }
+    assert "compact" not in parse_base_inputs(base_inputs)
+    assert parse_base_inputs(dict(base_inputs, compact=True))["compact"] is True
+
+
+def test_apply_register_steps_all_types():
+    steps = [
+        {
+            "type": "flat_rate",
+            "base_column": "compensation",
+            "new_column_name": "taxes",
+            "applied_rate": 0.1,
+        },
+        {
+            "type": "capped_rate",
+            "base_column": "compensation",
+            "new_column_name": "ss_tax",
+            "applied_rate": 0.5,
+            "cap_base_column": "ytd_compensation",
+            "cap_amount": 2500,
+        },
+        {"type": "per_head", "new_column_name": "laptops", "amount": 100},
+        {
+            "type": "capped_cumulative",
+            "base_column": "compensation",
+            "new_column_name": "match",
+            "applied_rate": 0.5,
+            "cap_amount": 2500,
+        },
+    ]
+    forecast = create_test_forecast().with_columns(year=pl.lit(2024))
+    result = apply_register_steps(forecast, steps)
+
+    assert result["taxes"].to_list() == [100.0, 200.0, 300.0]
+    assert result["ss_tax"].to_list() == [500.0, 750.0, 1250.0]
+    assert result["laptops"].to_list() == [0.0, 100.0, 100.0]
+    assert result["match"].to_list() == [500.0, 750.0, 1250.0]
+
+
+def test_apply_register_step_unknown_type():
+    with pytest.raises(ValueError, match="Unknown column type: bogus"):
+        apply_register_step(create_test_forecast(), {"type": "bogus"})
+
+
+def test_apply_register_steps_skips_invalid_steps():
+    steps = [
+        {
+            "type": "flat_rate",
+            "base_column": "missing",
+            "new_column_name": "taxes",
+            "applied_rate": 0.1,
+        },
+        {"type": "per_head", "new_column_name": "laptops", "amount": 100},
+    ]
+    errors = []
+    result = apply_register_steps(
+        create_test_forecast(),
+        steps,
+        on_error=lambda column, err: errors.append(column["new_column_name"]),
+    )
+
+    assert errors == ["taxes"]
+    assert "taxes" not in result.columns
+    assert "laptops" in result.columns
+
+    with pytest.raises(ValueError):
+        apply_register_steps(create_test_forecast(), steps)
+
+
+def test_compile_register_batches_independent_steps():
+    steps = [
+        {
+            "type": "flat_rate",
+            "base_column": "compensation",
+            "new_column_name": "taxes",
+            "applied_rate": 0.1,
+        },
+        {"type": "per_head", "new_column_name": "laptops", "amount": 100},
+        {"type": "per_head", "new_column_name": "software", "amount": 20},
+        {
+            "type": "flat_rate",
+            "base_column": "compensation",
+            "new_column_name": "benefits",
+            "applied_rate": 0.2,
+        },
+        {
+            "type": "flat_rate",
+            "base_column": "taxes",
+            "new_column_name": "tax_admin",
+            "applied_rate": 0.01,
+        },
+    ]
+    compiled = compile_register(steps, create_test_forecast().schema)
+
+    # Independent rates and the shared per head window, then everything depending on them
+    assert [len(stage) for stage in compiled["stages"]] == [3, 3]
+    assert len(compiled["temporary"]) == 1
+    assert list(compiled["schema"])[-5:] == [
+        "taxes",
+        "laptops",
+        "software",
+        "benefits",
+        "tax_admin",
+    ]
+
+
+def test_compiled_register_matches_sequential_replay():
+    steps = [
+        {
+            "type": "flat_rate",
+            "base_column": "compensation",
+            "new_column_name": "taxes",
+            "applied_rate": 0.1,
+        },
+        {
+            "type": "capped_rate",
+            "base_column": "taxes",
+            "new_column_name": "capped",
+            "applied_rate": 0.5,
+            "cap_base_column": "ytd_compensation",
+            "cap_amount": 2500,
+        },
+        {"type": "per_head", "new_column_name": "laptops", "amount": 100},
+        # Overwrite a column that an earlier step read
+        {
+            "type": "flat_rate",
+            "base_column": "compensation",
+            "new_column_name": "taxes",
+            "applied_rate": 0.3,
+        },
+        {
+            "type": "flat_rate",
+            "base_column": "taxes",
+            "new_column_name": "tax_admin",
+            "applied_rate": 0.01,
+        },
+        # Overwrite proration so the per head window has to be rebuilt
+        {
+            "type": "flat_rate",
+            "base_column": "proration",
+            "new_column_name": "proration",
+            "applied_rate": -1.0,
+        },
+        {"type": "per_head", "new_column_name": "software", "amount": 20},
+        {
+            "type": "capped_cumulative",
+            "base_column": "compensation",
+            "new_column_name": "match",
+            "applied_rate": 0.5,
+            "cap_amount": 2500,
+        },
+        {
+            "type": "capped_cumulative",
+            "base_column": "compensation",
+            "new_column_name": "futa",
+            "applied_rate": 0.006,
+            "cap_amount": 7000,
+        },
+    ]
+
+    sequential = create_test_forecast().with_columns(year=pl.lit(2024))
+    for step in steps:
+        sequential = apply_register_step(sequential, step)
+
+    forecast = create_test_forecast().with_columns(year=pl.lit(2024))
+    compiled = apply_register_steps(forecast, steps)
+    lazy = apply_register_steps(forecast.lazy(), steps).collect()
+
+    assert compiled.equals(sequential)
+    assert lazy.equals(sequential)
+
+
+def test_compile_register_primary_role_window_breaks_ties_by_role_id():
+    forecast = create_test_forecast().with_columns(
+        pl.Series("Role ID", [2, 1, 3]), proration=pl.lit(1.0)
+    )
+    steps = [{"type": "per_head", "new_column_name": "laptops", "amount": 100}]
+
+    # Same roles as the base's primary role flag
+    assert apply_register_steps(forecast, steps)["laptops"].to_list() == [
+        0.0,
+        100.0,
+        100.0,
+    ]
+
+
+def test_compile_register_uses_primary_role():
+    forecast = create_test_forecast().with_columns(
+        primary_role=pl.Series([False, True, True])
+    )
+    steps = [
+        {"type": "per_head", "new_column_name": "laptops", "amount": 100},
+        {"type": "per_head", "new_column_name": "software", "amount": 20},
+    ]
+    compiled = compile_register(steps, forecast.schema)
+
+    assert compiled["temporary"] == []
+    assert [len(stage) for stage in compiled["stages"]] == [2]
+
+    result = apply_register_steps(forecast, steps)
+    assert result["laptops"].to_list() == [0.0, 100.0, 100.0]
+    assert result["software"].to_list() == [0.0, 20.0, 20.0]
+
+
+# Step names and amounts are part of the cache and trace assertions below
+STEPS = [
+    {
+        "type": "flat_rate",
+        "base_column": "compensation",
+        "new_column_name": "taxes",
+        "applied_rate": 0.1,
+    },
+    {
+        "type": "capped_cumulative",
+        "base_column": "compensation",
+        "new_column_name": "ss_tax",
+        "applied_rate": 0.062,
+        "cap_amount": 40000,
+    },
+    {"type": "per_head", "new_column_name": "laptops", "amount": 100},
+]
+
+
+def test_replay_register_reuses_cached_steps(tmp_path, make_register):
+    cache_dir = str(tmp_path / "cache")
+    actions = make_register(STEPS)
+    expected = apply_register_steps(
+        base_from_register(actions, get_roster(actions["base_inputs"]["roster_file"])),
+        STEPS,
+    )
+
+    first, cached_steps = replay_register(actions, cache_dir)
+    assert cached_steps == 0
+    assert_frame_equal(first, expected)
+
+    second, cached_steps = replay_register(actions, cache_dir)
+    assert cached_steps == 3
+    assert_frame_equal(second, expected)
+
+    # Editing the last step only recomputes that step
+    edited = make_register(STEPS[:2] + [dict(STEPS[2], amount=200)])
+    third, cached_steps = replay_register(edited, cache_dir)
+    assert cached_steps == 2
+    assert third["laptops"].sum() == 2 * expected["laptops"].sum()
+
+
+def test_replay_register_key_follows_roster_content(
+    tmp_path, make_register, write_roster_csv, roster_rows
+):
+    cache_dir = str(tmp_path / "cache")
+    actions = make_register(STEPS)
+    first, _ = replay_register(actions, cache_dir)
+
+    write_roster_csv([row.replace("60000", "70000") for row in roster_rows])
+    second, cached_steps = replay_register(actions, cache_dir)
+
+    assert cached_steps == 0
+    assert second["compensation"].sum() > first["compensation"].sum()
+
+
+def test_replay_register_reports_skipped_steps_every_time(tmp_path, make_register):
+    cache_dir = str(tmp_path / "cache")
+    steps = [
+        dict(STEPS[0], base_column="missing"),
+        STEPS[0],
+    ]
+    actions = make_register(steps)
+
+    for _ in range(2):
+        errors = []
+        forecast, cached_steps = replay_register(
+            actions, cache_dir, on_error=lambda column, err: errors.append(column)
+        )
+        assert errors == [steps[0]]
+        assert "taxes" in forecast.columns
+
+    assert cached_steps == 1
+    with pytest.raises(ValueError):
+        replay_register(actions, cache_dir)
+
+
+def test_replay_register_caches_final_value_of_overwritten_columns(
+    tmp_path, make_register
+):
+    cache_dir = str(tmp_path / "cache")
+    steps = [STEPS[0], dict(STEPS[0], applied_rate=0.2)]
+    actions = make_register(steps)
+
+    first, cached_steps = replay_register(actions, cache_dir)
+    assert cached_steps == 0
+
+    # Only the last write of taxes was cached, the first one is recomputed
+    second, cached_steps = replay_register(actions, cache_dir)
+    assert cached_steps == 1
+    assert_frame_equal(second, first)
+    assert second["taxes"].sum() == pytest.approx(0.2 * second["compensation"].sum())
+
+
+def test_replay_register_skips_entries_over_budget(tmp_path, make_register):
+    cache_dir = tmp_path / "cache"
+    actions = make_register(STEPS)
+
+    first, _ = replay_register(actions, str(cache_dir), max_bytes=100)
+    second, cached_steps = replay_register(actions, str(cache_dir), max_bytes=100)
+
+    # Only the parsed roster, cached under its own budget, is stored
+    assert cached_steps == 0
+    assert len(list(cache_dir.glob("*.arrow"))) == 1
+    assert_frame_equal(second, first)
+
+
+def test_replay_register_without_writable_cache(tmp_path, make_register):
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("")
+    actions = make_register(STEPS)
+
+    forecast, cached_steps = replay_register(actions, str(cache_dir))
+
+    assert cached_steps == 0
+    assert "laptops" in forecast.columns
+
+
+def test_replay_register_trace(tmp_path, make_register):
+    cache_dir = str(tmp_path / "cache")
+    actions = make_register(STEPS)
+    replay_register(actions, cache_dir)
+
+    trace = []
+    replay_register(actions, cache_dir, trace=trace)
+
+    stages = [stage["stage"] for stage in trace]
+    assert stages[0] == "read_cached_base"
+    assert stages[1:] == [f"step {step['new_column_name']} (cached)" for step in STEPS]
+
+
+def test_forecast_base_schema_matches_forecast_base(make_register, roster):
+    actions = make_register(STEPS)
+
+    assert forecast_base_schema() == base_from_register(actions, roster).schema
+    # Compact string columns are Enums of the roster's values, without any roster
+    actions["base_inputs"]["compact"] = True
+    schema = base_from_register(actions, roster).schema
+    assert forecast_base_schema(compact=True) == {
+        column: pl.Enum([]) if isinstance(dtype, pl.Enum) else dtype
+        for column, dtype in schema.items()
+    }
+
+
+def test_validate_register_reports_every_error(tmp_path, make_register):
+    assert validate_register(make_register(STEPS)) == []
+
+    actions = make_register(
+        [
+            dict(STEPS[0], base_column="Employee Name"),
+            dict(STEPS[1], base_column="missing"),
+            {"type": "bonus_pool", "new_column_name": "pool"},
+            "laptops",
+            {"type": "per_head", "new_column_name": "phones", "amount": "10"},
+            {"type": "flat_rate", "new_column_name": "no_base", "applied_rate": 0.1},
+            STEPS[2],
+            dict(STEPS[0], new_column_name="ss_tax_total", base_column="ss_tax"),
+        ],
+    )
+    actions["base_inputs"]["roster_file"] = str(tmp_path / "missing.csv")
+
+    errors = validate_register(actions)
+
+    assert len(errors) == 8
+    assert errors[0].startswith("Base inputs: roster file")
+    assert errors[1].startswith("Step 1 (taxes)") and "not a numeric" in errors[1]
+    assert errors[2].startswith("Step 2 (ss_tax)") and "not found" in errors[2]
+    assert "unknown column type: bonus_pool" in errors[3]
+    assert errors[4].startswith("Step 4: must be an object")
+    assert "must be numbers" in errors[5]
+    assert "missing ['base_column']" in errors[6]
+    # ss_tax is skipped like in a replay, so the step reading it is reported too
+    assert errors[7].startswith("Step 8 (ss_tax_total)")
+
+
+def test_validate_register_reports_every_base_input(make_register):
+    actions = make_register(STEPS)
+    del actions["base_inputs"]["roster_file"]
+    actions["base_inputs"]["end_date"] = "2024-13-01"
+    actions["base_inputs"]["inflation_start"] = None
+    actions["base_inputs"]["inflation_freq"] = "12"
+
+    errors = validate_register(actions)
+
+    assert len(errors) == 4
+    assert "'roster_file' is missing" in errors[0]
+    assert errors[1].startswith("Base inputs: end_date: time data")
+    assert errors[2].startswith("Base inputs: inflation_start")
+    assert "'inflation_freq' must be a positive whole number" in errors[3]
+
+    for inflation_freq in [0, -12, 1.5]:
+        actions["base_inputs"]["inflation_freq"] = inflation_freq
+        assert "'inflation_freq' must be a positive whole number" in (
+            validate_register(actions)[-1]
+        )
+
+    assert validate_register([]) != []
+    assert validate_register({"base_inputs": None, "added_columns": None}) == [
+        "Base inputs: must be an object of base inputs",
+        "Action register: added_columns must be a list of steps",
+    ]
+
+
+def test_validate_register_allows_overwriting_columns(make_register):
+    steps = [
+        {"type": "per_head", "new_column_name": "compensation", "amount": 10},
+        STEPS[0],
+        dict(STEPS[0], applied_rate=0.2),
+    ]
+
+    assert validate_register(make_register(steps)) == []
@@ -0,0 +1,89 @@
+import polars as pl
+import pytest
+from datetime import date
+
+from forecast.rollup import rollup_forecast, write_rollups, default_grains
+
+
+def create_test_forecast():
+    months = [date(2024, month, 1) for month in range(1, 7)]
+    return pl.DataFrame(
+        {
+            "start_of_month": months * 2,
+            "Employee ID": ["E001"] * 6 + ["E002"] * 6,
+            "Role ID": [1] * 6 + [2] * 6,
+            "Department": ["Sales"] * 6 + ["Finance"] * 6,
+            "Location": ["US-NY"] * 12,
+            "Employment type": ["Full time"] * 12,
+            "year": [2024] * 12,
+            "proration": [1.0] * 12,
+            # E002 leaves after April
+            "headcount": [1] * 6 + [1, 1, 1, 0, 0, 0],
+            "headcount_change": [0] * 6 + [0, 0, 0, -1, 0, 0],
+            "compensation": [100.0] * 6 + [50.0, 50.0, 50.0, 25.0, 0.0, 0.0],
+            "ytd_compensation": [100.0 * month for month in range(1, 7)]
+            + [50.0, 100.0, 150.0, 175.0, 175.0, 175.0],
+            "laptops": [10.0] * 12,
+        }
+    )
+
+
+def test_rollup_measures_and_stocks():
+    rollups = rollup_forecast(create_test_forecast())
+
+    assert set(rollups) == {
+        f"{period}_by_{dimension}"
+        for period in ["month", "quarter", "year"]
+        for dimension in ["department", "location", "employment_type"]
+    }
+
+    quarters = rollups["quarter_by_location"]
+    assert quarters["quarter"].to_list() == ["2024-Q1", "2024-Q2"]
+    # Headcount at the end of each quarter, flows summed over the quarter
+    assert quarters["headcount"].to_list() == [2, 1]
+    assert quarters["headcount_change"].to_list() == [0, -1]
+    assert quarters["compensation"].to_list() == [450.0, 325.0]
+    assert quarters["laptops"].to_list() == [60.0, 60.0]
+    assert "ytd_compensation" not in quarters.columns
+    assert "proration" not in quarters.columns
+
+    departments = rollups["year_by_department"]
+    assert departments.select("year", "Department", "headcount").rows() == [
+        (2024, "Finance", 0),
+        (2024, "Sales", 1),
+    ]
+    assert rollups["month_by_department"].height == 12
+
+
+def test_rollup_custom_grains_lazy():
+    rollups = rollup_forecast(
+        create_test_forecast().lazy(),
+        grains=[("year", []), ("month", ["Department", "Location"])],
+        measures=["compensation"],
+    )
+
+    assert rollups["year"].rows() == [(2024, 775.0)]
+    assert rollups["month_by_department_and_location"].columns == [
+        "month",
+        "Department",
+        "Location",
+        "compensation",
+    ]
+
+
+def test_rollup_invalid_inputs():
+    with pytest.raises(ValueError):
+        rollup_forecast(create_test_forecast(), grains=[("week", ["Department"])])
+    with pytest.raises(ValueError):
+        rollup_forecast(create_test_forecast(), grains=[("month", ["Cost Center"])])
+
+
+def test_write_rollups(tmp_path):
+    rollups = rollup_forecast(
+        create_test_forecast(), grains=default_grains(periods=["year"])
+    )
+
+    written = write_rollups(rollups, str(tmp_path / "rollups"), "parquet")
+
+    assert len(written) == 3
+    assert pl.read_parquet(written[0]).equals(rollups["year_by_department"])
@@ -1,8 +1,10 @@
+import os
 import pytest
 
 from datetime import date
 from utilities import get_roster
 
+from polars import LazyFrame
 from polars.exceptions import ComputeError, ColumnNotFoundError
 
 
@@ -29,6 +31,53 @@ def test_get_roster_basic(tmp_path):
     assert roster["end_date_complete"][0] == date.max
 
 
+def test_get_roster_lazy(tmp_path):
+    content = """Role ID,Employee ID,Employee Name,Title,Department,Employment type,Location,Start Date,End Date,Salary,Bonus,Commission
+1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,,60000,5000,2000
+2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,12/31/23,80000,7000,3000
+"""
+    csv_path = create_temp_csv(tmp_path, content)
+    roster = get_roster(csv_path, lazy=True)
+
+    assert isinstance(roster, LazyFrame)
+    assert roster.collect().equals(get_roster(csv_path))
+
+
+def test_get_roster_cached(tmp_path):
+    content = """Role ID,Employee ID,Employee Name,Title,Department,Employment type,Location,Start Date,End Date,Salary,Bonus,Commission
+1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,,60000,5000,2000
+2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,12/31/23,80000,7000,3000
+"""
+    csv_path = create_temp_csv(tmp_path, content)
+    cache_dir = tmp_path / "cache"
+
+    first = get_roster(csv_path, cache_dir=str(cache_dir))
+    assert len(os.listdir(cache_dir)) == 1
+    assert get_roster(csv_path, cache_dir=str(cache_dir)).equals(first)
+    assert first.equals(get_roster(csv_path))
+
+    # Editing the file creates a new entry instead of reusing the old one
+    csv_path.write_text(content.replace("60000", "65000"))
+    edited = get_roster(csv_path, cache_dir=str(cache_dir), lazy=True).collect()
+    assert edited["Salary"][0] == 65000
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_get_roster_cache_not_writable(tmp_path):
+    content = """Role ID,Employee ID,Employee Name,Title,Department,Employment type,Location,Start Date,End Date,Salary,Bonus,Commission
+1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,,60000,5000,2000
+2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,12/31/23,80000,7000,3000
+"""
+    csv_path = create_temp_csv(tmp_path, content)
+    # A file where the cache directory should be, so the entry cannot be written
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("")
+
+    roster = get_roster(csv_path, cache_dir=str(cache_dir))
+
+    assert roster.equals(get_roster(csv_path))
+
+
 def test_get_roster_with_invalid_dates(tmp_path):
     content = """Role ID,Employee ID,Employee Name,Title,Department,Employment type,Location,Start Date,End Date,Salary,Bonus,Commission
 1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,invalid_date,60000,5000,2000
@@ -0,0 +1,88 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from forecast.register import apply_register_steps, base_from_register
+from forecast.scenarios import apply_roster_delta, roster_scenarios, touched_employees
+
+# Jane is promoted in July, Ann is not touched by any scenario
+ROWS = [
+    "1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,,160000,0.1,0",
+    "2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,06/30/24,80000,0,0.2",
+    "3,124,Jane Smith,Director,Sales,Full-time,San Francisco,07/01/24,,150000,0.2,0.1",
+    "4,126,Bo Chan,Engineer,Engineering,Full-time,New York,05/16/24,,70000,0.05,0",
+    "5,127,Ann Lee,Analyst,Finance,Full-time,New York,02/01/22,,90000,0,0",
+]
+
+# A new employee and a later promotion of Jane
+HIRES = [
+    "10,200,New Hire,Engineer,Engineering,Full-time,New York,03/18/24,,120000,0.1,0",
+    "11,124,Jane Smith,VP,Sales,Full-time,San Francisco,01/01/25,,210000,0.2,0.1",
+]
+
+STEPS = [
+    {
+        "type": "capped_cumulative",
+        "base_column": "compensation",
+        "new_column_name": "match",
+        "applied_rate": 0.04,
+        "cap_amount": 5_000,
+    },
+    {"type": "per_head", "new_column_name": "laptops", "amount": 50},
+]
+
+
+@pytest.fixture
+def roster_file(write_roster_csv):
+    return write_roster_csv(ROWS)
+
+
+@pytest.fixture
+def actions(make_register):
+    return make_register(STEPS, end_date="2025-12-31", inflation_start="2025-01-01")
+
+
+@pytest.fixture
+def scenarios(write_roster_csv):
+    return {
+        "base": {},
+        "aggressive": {"add": write_roster_csv(HIRES, name="hires.csv")},
+        "freeze": {
+            "remove": [4],
+            "override": pl.DataFrame(
+                {"Role ID": [3], "End Date": [date(2024, 12, 31)]},
+                schema={"Role ID": pl.Int32, "End Date": pl.Date},
+            ),
+        },
+    }
+
+
+def test_apply_roster_delta(roster, scenarios):
+    freeze = apply_roster_delta(roster, scenarios["freeze"])
+
+    assert freeze["Role ID"].to_list() == [1, 2, 3, 5]
+    jane = freeze.filter(pl.col("Role ID") == 3)
+    assert jane["End Date"].item() == date(2024, 12, 31)
+    assert jane["end_date_complete"].item() == date(2024, 12, 31)
+    assert apply_roster_delta(roster, scenarios["aggressive"]).height == 7
+    assert touched_employees(
+        roster,
+        {name: apply_roster_delta(roster, delta) for name, delta in scenarios.items()},
+    ) == {"124", "126", "200"}
+
+
+def test_roster_scenarios_match_separate_replays(actions, roster, scenarios):
+    forecast = roster_scenarios(actions, roster, scenarios)
+
+    assert forecast.columns[0] == "scenario"
+    order = ["Employee ID", "start_of_month", "Role ID"]
+    for name, delta in scenarios.items():
+        expected = apply_register_steps(
+            base_from_register(actions, apply_roster_delta(roster, delta)), STEPS
+        )
+        assert_frame_equal(
+            forecast.filter(pl.col("scenario") == name).drop("scenario").sort(order),
+            expected.sort(order),
+        )
@@ -0,0 +1,70 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from forecast.base import build_forecast_base
+from forecast.register import apply_register_steps
+from forecast.rollup import rollup_forecast
+from forecast.sparse import (
+    apply_sparse_steps,
+    build_sparse_base,
+    sparse_rollups,
+    to_long,
+)
+from forecast.utilities import generate_month_ranges
+
+ORDER = ["Role ID", "start_of_month"]
+
+
+@pytest.fixture
+def inputs(synthetic_roster):
+    month_ranges = generate_month_ranges(
+        date(2023, 7, 1), date(2025, 6, 30), 0.03, date(2024, 1, 1), 12
+    )
+    return month_ranges, synthetic_roster(500, seed=3)
+
+
+def test_sparse_base_round_trip(inputs):
+    month_ranges, roster = inputs
+
+    sparse = build_sparse_base(month_ranges, roster)
+    base = build_forecast_base(month_ranges, roster)
+
+    assert sparse["roles"].height == sparse["indptr"].len() - 1
+    assert sparse["indptr"][-1] == base.height
+    assert sparse["indices"].max() < month_ranges.height
+    assert "Salary" not in sparse["values"]
+    assert_frame_equal(to_long(sparse), base.sort(ORDER))
+
+
+def test_apply_sparse_steps_matches_register(inputs, register_steps):
+    month_ranges, roster = inputs
+    errors = []
+
+    sparse = apply_sparse_steps(
+        build_sparse_base(month_ranges, roster),
+        register_steps + [{"type": "unknown", "new_column_name": "other"}],
+        on_error=lambda column, err: errors.append(column["new_column_name"]),
+    )
+    expected = apply_register_steps(
+        build_forecast_base(month_ranges, roster), register_steps
+    )
+
+    assert errors == ["other"]
+    assert_frame_equal(to_long(sparse), expected.sort(ORDER))
+
+
+def test_sparse_rollups_match_rollup_forecast(inputs, register_steps):
+    month_ranges, roster = inputs
+    grains = [("quarter", ["Department"]), ("year", []), ("month", ["Location"])]
+
+    sparse = apply_sparse_steps(build_sparse_base(month_ranges, roster), register_steps)
+    forecast = apply_register_steps(
+        build_forecast_base(month_ranges, roster), register_steps
+    )
+
+    expected = rollup_forecast(forecast, grains)
+    for name, table in sparse_rollups(sparse, grains).items():
+        assert_frame_equal(table, expected[name], check_exact=False)
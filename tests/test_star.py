@@ -0,0 +1,58 @@
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from forecast.base import build_forecast_base
+from forecast.register import apply_register_steps
+from forecast.star import build_star_forecast, join_dimensions
+
+# John is promoted mid May, so two roles of one employee share that month
+ROWS = [
+    "1,123,John Doe,Engineer,Engineering,Full-time,New York,01/01/23,05/15/24,60000,0.1,0",
+    "2,124,Jane Smith,Manager,Sales,Part-time,San Francisco,03/15/23,06/30/24,80000,0,0.2",
+    "3,123,John Doe,Lead Engineer,Engineering,Full-time,New York,05/16/24,,75000,0.1,0",
+]
+
+ORDER = ["Role ID", "start_of_month"]
+
+
+@pytest.fixture
+def roster_file(write_roster_csv):
+    return write_roster_csv(ROWS)
+
+
+def test_star_forecast_facts_are_narrow(month_ranges, roster):
+    star = build_star_forecast(month_ranges, roster)
+
+    assert star["roles"].height == roster.height
+    assert "Department" not in star["facts"].columns
+    assert "Salary" not in star["facts"].columns
+    assert (
+        star["facts"].estimated_size()
+        < build_forecast_base(month_ranges, roster).estimated_size()
+    )
+
+
+def test_join_dimensions_matches_forecast_base(month_ranges, roster):
+    star = build_star_forecast(month_ranges, roster)
+
+    joined = join_dimensions(star)
+
+    assert isinstance(joined, pl.LazyFrame)
+    assert_frame_equal(
+        joined.collect().sort(ORDER),
+        build_forecast_base(month_ranges, roster).sort(ORDER),
+    )
+
+
+def test_register_steps_on_facts(month_ranges, roster, register_steps):
+    star = build_star_forecast(month_ranges, roster, compact=True)
+
+    facts = apply_register_steps(star["facts"], register_steps)
+    joined = join_dimensions(star, facts).collect()
+
+    expected = apply_register_steps(
+        build_forecast_base(month_ranges, roster, compact=True), register_steps
+    )
+    assert joined.columns == expected.columns
+    assert_frame_equal(joined.sort(ORDER), expected.sort(ORDER))